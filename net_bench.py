@@ -0,0 +1,385 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import networkx as nx
+import numpy as np
+
+import net_formation_coauthor
+import net_formation_flow
+import net_formation_sym
+import net_games
+import net_games_coh
+from net_bootstrap import gnp_edges, ws_edges
+from net_growth import preferential_attachment
+from net_learn_obs import train_bandit
+from net_pajek import read_pajek
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HISTORY = os.path.join(HERE, "bench_history.jsonl")
+DATA = {
+    "kero": os.path.join(HERE, "data", "26KeroNetwork.txt"),
+    "imports": os.path.join(HERE, "data", "imports_manufactures.txt"),
+}
+# random families take a size, the data/ networks have their own
+RANDOM = ("gnp", "ws", "ba")
+FAMILIES = RANDOM + tuple(DATA)
+
+
+def _from_edges(n, src, dst):
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    graph.add_edges_from((u, v) for u, v in zip(src.tolist(), dst.tolist()) if u != v)
+    return graph
+
+
+def make_graph(family, size=None, seed=0):
+    """
+    Benchmark graph with nodes 0..n-1, all families at average degree about
+    4 so sizes compare across them.
+
+    :param family: one of FAMILIES; size is ignored for the data networks
+    """
+    rng = np.random.default_rng(seed)
+    if family == "gnp":
+        return _from_edges(size, *gnp_edges(size, min(4 / max(size - 1, 1), 1), rng))
+    if family == "ws":
+        return _from_edges(size, *ws_edges(size, 4, 0.1, rng))
+    if family == "ba":
+        return _from_edges(size, *preferential_attachment(size, 2, rng=rng))
+    if family in DATA:
+        network = read_pajek(DATA[family])
+        return _from_edges(network.numb_nodes, network.src, network.dst)
+    raise ValueError(f"Unknown family {family}")
+
+
+def _with_actions(graph, rng):
+    for node, action in zip(graph.nodes(), rng.integers(0, 2, len(graph)).tolist()):
+        graph.nodes[node]["action"] = action
+    return graph
+
+
+def _calc_util(graph, rng):
+    return lambda: net_formation_sym.calc_util(graph, 0.5, 0.3)
+
+
+def _truncated_util(graph, rng):
+    return lambda: net_formation_sym.truncated_util(graph, 0.5, 0.3, 0.1)
+
+
+def _analyze_sym(graph, rng):
+    return lambda: net_formation_sym.analyze_network(graph, 0.5, 0.3)
+
+
+def _flow_gains(graph, rng):
+    # each link sponsored by one of its ends at random
+    directed = nx.DiGraph()
+    directed.add_nodes_from(graph)
+    flip = rng.random(graph.number_of_edges()) < 0.5
+    directed.add_edges_from((v, u) if f else (u, v) for (u, v), f in zip(graph.edges, flip))
+    reach = net_formation_flow.Reachability(directed)
+    return lambda: net_formation_flow.link_gains(reach, 0.5)
+
+
+def _analyze_coauthor(graph, rng):
+    return lambda: net_formation_coauthor.analyze_network(graph)
+
+
+def _games(graph, rng):
+    _with_actions(graph, rng)
+    return lambda: net_games.update_utilities(graph, "comp", 2)
+
+
+def _games_coh(graph, rng):
+    _with_actions(graph, rng)
+    return lambda: net_games_coh.update_utilities(graph, 0.5)
+
+
+def _train_bandit(graph, rng):
+    params = [{"1": float(x), "2": 0.1} for x in rng.random(len(graph))]
+    return lambda: train_bandit(0.6, graph, params, 200, rng=rng)
+
+
+def _games_figure(graph, rng):
+    net_games.update_utilities(_with_actions(graph, rng), "comp", 2)
+    return lambda: net_games.plotly_network(graph)
+
+
+def _formation_figure(graph, rng):
+    stat = net_formation_sym.analyze_network(graph, 0.5, 0.3)
+    stat["graph"] = graph
+    return lambda: net_formation_sym.plotly_network(stat)
+
+
+class Case:
+    """
+    One benchmark: setup(graph, rng) prepares the inputs and returns the
+    callable that is timed. Data networks with more than max_nodes nodes
+    are skipped.
+    """
+
+    def __init__(self, name, setup, sizes, max_nodes=None):
+        self.name = name
+        self.setup = setup
+        self.sizes = sizes
+        self.max_nodes = max_nodes
+
+    def __repr__(self):
+        return f"Case({self.name!r}, sizes={self.sizes})"
+
+
+CASES = {
+    case.name: case
+    for case in [
+        Case("formation_sym.calc_util", _calc_util, (10, 20, 40), max_nodes=150),
+        Case("formation_sym.truncated_util", _truncated_util, (1000, 10000, 100000)),
+        Case("formation_sym.analyze_network", _analyze_sym, (6, 10, 14), max_nodes=20),
+        Case("formation_flow.link_gains", _flow_gains, (100, 300, 1000), max_nodes=1000),
+        Case(
+            "formation_coauthor.analyze_network",
+            _analyze_coauthor,
+            (6, 10, 14),
+            max_nodes=20,
+        ),
+        Case("games.update_utilities", _games, (100, 1000, 10000)),
+        Case("games_coh.update_utilities", _games_coh, (100, 1000, 10000)),
+        Case("learn_obs.train_bandit", _train_bandit, (10, 100, 1000)),
+        Case("games.plotly_network", _games_figure, (10, 50, 200), max_nodes=200),
+        Case(
+            "formation_sym.plotly_network", _formation_figure, (6, 10, 14), max_nodes=20
+        ),
+    ]
+}
+
+
+def select(patterns=None, families=FAMILIES, sizes=None):
+    """
+    :param patterns: shell-style patterns on case names, None for all
+    :param sizes: sizes of the random families, None for each case's own
+    :return: list of (case, family, size) to run, size None for data
+    """
+    runs = []
+    for case in CASES.values():
+        if patterns and not any(fnmatch.fnmatch(case.name, p) for p in patterns):
+            continue
+        for family in families:
+            if family not in FAMILIES:
+                raise ValueError(f"Unknown family {family}")
+            if family in DATA:
+                runs.append((case, family, None))
+            else:
+                runs.extend((case, family, size) for size in sizes or case.sizes)
+    return runs
+
+
+def measure(fn, repeat=5, warmup=1, min_time=0.0):
+    """
+    Times fn with perf_counter; each timing loops fn until min_time has
+    passed so very fast calls are not lost in the clock resolution.
+
+    :return: dict with min, median, mean and std seconds per call, repeat
+        and number (calls per timing)
+    """
+    for _ in range(warmup):
+        fn()
+    number = 1
+    if min_time > 0:
+        start = time.perf_counter()
+        fn()
+        once = time.perf_counter() - start
+        number = max(1, int(min_time / max(once, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    times = np.array(times)
+    return {
+        "min": float(times.min()),
+        "median": float(np.median(times)),
+        "mean": float(times.mean()),
+        "std": float(times.std()),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def git_commit():
+    """
+    :return: (commit hash, dirty) of the working tree, (None, None) outside
+        a git checkout
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def run(runs, repeat=5, warmup=1, min_time=0.0, seed=0, history=HISTORY, log=None):
+    """
+    Runs the selected benchmarks and appends one JSON line per run to the
+    history file, keyed by git commit.
+
+    :return: list of the records
+    """
+    commit, dirty = git_commit()
+    machine = {"host": platform.node(), "python": platform.python_version()}
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    records = []
+    for case, family, size in runs:
+        graph = make_graph(family, size, seed)
+        if case.max_nodes is not None and len(graph) > case.max_nodes:
+            continue
+        fn = case.setup(graph, np.random.default_rng(seed))
+        record = {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": stamp,
+            "case": case.name,
+            "family": family,
+            "size": size,
+            "nodes": len(graph),
+            "edges": graph.number_of_edges(),
+            **machine,
+            **measure(fn, repeat, warmup, min_time),
+        }
+        records.append(record)
+        if log:
+            log(record)
+        if history:
+            with open(history, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+    return records
+
+
+def load_history(path=HISTORY):
+    """
+    :return: list of the records in a history file, oldest first
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def _key(record):
+    return record["case"], record["family"], record["size"], record.get("host")
+
+
+def compare(records, base=None, head=None, threshold=1.1):
+    """
+    Compares the latest timing of every benchmark at commit head with the
+    latest one at commit base (default the most recent other commit that
+    ran it, on the same host).
+
+    :param threshold: median ratio above which a run counts as a regression
+    :return: list of dicts with case, family, size, base and head medians,
+        ratio and regression
+    """
+    commits = [r["commit"] for r in records]
+    if head is None:
+        head = commits[-1] if commits else None
+    latest, before = {}, {}
+    for record in records:
+        key = _key(record)
+        if record["commit"] is not None and record["commit"].startswith(head or "\0"):
+            latest[key] = record
+        elif base is None or (record["commit"] or "").startswith(base):
+            before[key] = record
+    rows = []
+    for key, new in latest.items():
+        old = before.get(key)
+        if old is None:
+            continue
+        ratio = new["median"] / old["median"] if old["median"] > 0 else float("inf")
+        rows.append(
+            {
+                "case": key[0],
+                "family": key[1],
+                "size": key[2],
+                "base": old["median"],
+                "head": new["median"],
+                "ratio": ratio,
+                "regression": ratio > threshold,
+            }
+        )
+    return rows
+
+
+def _print_record(record):
+    size = record["size"] if record["size"] is not None else "-"
+    print(
+        f"{record['case']:36} {record['family']:8} {size!s:>6} "
+        f"{record['nodes']:>6} {record['median'] * 1e3:12.3f} ms",
+        flush=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks of the network apps' hot paths"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listing = commands.add_parser("list", help="list the benchmark cases")
+    listing.add_argument("-k", "--cases", nargs="*")
+
+    running = commands.add_parser("run", help="run benchmarks, append to the history")
+    running.add_argument("-k", "--cases", nargs="*", help="shell patterns on case names")
+    running.add_argument("-f", "--families", nargs="*", default=list(FAMILIES))
+    running.add_argument("-s", "--sizes", nargs="*", type=int)
+    running.add_argument("-r", "--repeat", type=int, default=5)
+    running.add_argument("--warmup", type=int, default=1)
+    running.add_argument("--min-time", type=float, default=0.0)
+    running.add_argument("--seed", type=int, default=0)
+    running.add_argument("--history", default=HISTORY)
+    running.add_argument("--no-save", action="store_true")
+
+    comparing = commands.add_parser("compare", help="compare two commits in the history")
+    comparing.add_argument("--base")
+    comparing.add_argument("--head")
+    comparing.add_argument("--threshold", type=float, default=1.1)
+    comparing.add_argument("--history", default=HISTORY)
+
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        for case in CASES.values():
+            if not args.cases or any(fnmatch.fnmatch(case.name, p) for p in args.cases):
+                print(f"{case.name:36} sizes {list(case.sizes)}")
+        return 0
+    if args.command == "run":
+        runs = select(args.cases, args.families, args.sizes)
+        history = None if args.no_save else args.history
+        run(runs, args.repeat, args.warmup, args.min_time, args.seed, history, _print_record)
+        return 0
+
+    rows = compare(load_history(args.history), args.base, args.head, args.threshold)
+    for row in rows:
+        size = row["size"] if row["size"] is not None else "-"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['case']:36} {row['family']:8} {size!s:>6} "
+            f"{row['base'] * 1e3:10.3f} -> {row['head'] * 1e3:10.3f} ms "
+            f"x{row['ratio']:.2f}{flag}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
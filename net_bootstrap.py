@@ -0,0 +1,285 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from net_csr import from_edges
+from net_stats import GRAPH_STAT, GraphKernel
+from net_streaming import StreamSummary
+
+
+def _pair_index(k):
+    """
+    Maps linear indices over the n (n - 1) / 2 unordered pairs to (u, v),
+    u > v, in the order (1, 0), (2, 0), (2, 1), (3, 0), ...
+    """
+    k = np.asarray(k, dtype=np.int64)
+    u = ((1 + np.sqrt(1 + 8 * k.astype(float))) // 2).astype(np.int64)
+    # float rounding can be one off for very large k
+    u -= u * (u - 1) // 2 > k
+    u += (u + 1) * u // 2 <= k
+    return u, k - u * (u - 1) // 2
+
+
+def gnp_edges(n, p, rng=None):
+    """
+    G(n, p) as edge arrays by geometric skipping (Batagelj & Brandes):
+    the gaps between present pairs are geometric, so the cost is O(n + m)
+    instead of one coin per pair.
+
+    :return: (src, dst) int64 arrays, each edge once
+    """
+    rng = np.random.default_rng(rng)
+    pairs = n * (n - 1) // 2
+    if p <= 0 or pairs == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if p >= 1:
+        return _pair_index(np.arange(pairs))
+
+    expected = pairs * p
+    batch = int(expected + 5 * np.sqrt(expected) + 16)
+    found = []
+    last = -1
+    while last < pairs:
+        position = last + np.cumsum(rng.geometric(p, batch))
+        last = position[-1]
+        found.append(position[position < pairs])
+    return _pair_index(np.concatenate(found))
+
+
+def _ring_lattice(n, k):
+    src = np.tile(np.arange(n, dtype=np.int64), k // 2)
+    dst = (src + np.repeat(np.arange(1, k // 2 + 1), n)) % n
+    return src, dst
+
+
+def _complete(n):
+    return _pair_index(np.arange(n * (n - 1) // 2))
+
+
+def _edge_keys(n, u, v):
+    return np.minimum(u, v) * n + np.maximum(u, v)
+
+
+def _attach(n, rng, src, taken, max_rounds=64):
+    """
+    Draws a uniform partner w for every src, redrawing in vectorized rounds
+    when (src, w) is a self-loop, collides with a taken key or with another
+    draw of the same round.
+
+    :return: (partners, ok) with ok False where no free partner was found
+    """
+    partners = np.full(len(src), -1, dtype=np.int64)
+    pending = np.arange(len(src))
+    taken = np.unique(taken)
+    for _ in range(max_rounds):
+        if not len(pending):
+            break
+        w = rng.integers(0, n, len(pending))
+        keys = _edge_keys(n, src[pending], w)
+        free = (w != src[pending]) & ~np.isin(keys, taken, assume_unique=False)
+        _, first = np.unique(keys, return_index=True)
+        unique = np.zeros(len(keys), dtype=bool)
+        unique[first] = True
+        accept = free & unique
+        partners[pending[accept]] = w[accept]
+        taken = np.union1d(taken, keys[accept])
+        pending = pending[~accept]
+    return partners, partners >= 0
+
+
+def ws_edges(n, k, p, rng=None):
+    """
+    Watts-Strogatz small world as edge arrays: every ring lattice edge
+    (u, u + j) is rewired to (u, w) with probability p, all rewirings drawn
+    at once and conflicts (self-loops, multiple edges) redrawn in rounds.
+    Same model as nx.watts_strogatz_graph without its sequential loop.
+    """
+    if k > n:
+        raise ValueError("k>n, choose smaller k or larger n")
+    if k == n:
+        return _complete(n)
+    rng = np.random.default_rng(rng)
+    src, dst = _ring_lattice(n, k)
+    rewire = rng.random(len(src)) < p
+    kept = _edge_keys(n, src[~rewire], dst[~rewire])
+    partners, ok = _attach(n, rng, src[rewire], kept)
+    # nodes with no free partner keep their lattice edge
+    new_dst = np.where(ok, partners, dst[rewire])
+    src = np.concatenate([src[~rewire], src[rewire]])
+    dst = np.concatenate([dst[~rewire], new_dst])
+    _, first = np.unique(_edge_keys(n, src, dst), return_index=True)
+    return src[first], dst[first]
+
+
+def nws_edges(n, k, p, rng=None):
+    """
+    Newman-Watts-Strogatz small world as edge arrays: the ring lattice plus,
+    for every lattice edge (u, u + j) with probability p, a shortcut (u, w)
+    to a uniform node w that is not already a neighbor.
+    """
+    if k > n:
+        raise ValueError("k>n, choose smaller k or larger n")
+    if k == n:
+        return _complete(n)
+    rng = np.random.default_rng(rng)
+    src, dst = _ring_lattice(n, k)
+    shortcut = src[rng.random(len(src)) < p]
+    partners, ok = _attach(n, rng, shortcut, _edge_keys(n, src, dst))
+    return np.concatenate([src, shortcut[ok]]), np.concatenate([dst, partners[ok]])
+
+
+MODELS = {
+    "gnp": gnp_edges,
+    "ws": ws_edges,
+    "nws": nws_edges,
+}
+
+PARAMS = {
+    "gnp": ("n", "p"),
+    "ws": ("n", "k", "p"),
+    "nws": ("n", "k", "p"),
+}
+
+
+def instance_stats(model, params, rng=None, stats=GRAPH_STAT, path_samples=None):
+    """
+    :param params: the model's arguments after rng, (n, p) or (n, k, p)
+    :param path_samples: BFS sources sampled for the average shortest path
+        length, None for the exact value
+    :return: (len(stats),) float array for one sampled graph
+    """
+    rng = np.random.default_rng(rng)
+    src, dst = MODELS[model](*params, rng=rng)
+    kernel = GraphKernel(from_edges(params[0], src, dst), path_samples=path_samples, seed=rng)
+    return np.array([kernel.stat(name) for name in stats], dtype=float)
+
+
+def _instances(task):
+    model, params, stats, seeds, path_samples = task
+    return np.array(
+        [instance_stats(model, params, np.random.default_rng(s), stats, path_samples) for s in seeds]
+    ).reshape(len(seeds), len(stats))
+
+
+def _run(tasks, fold, processes):
+    """
+    Runs (key, task) pairs, inline or on a process pool with the same
+    bounded in-order window as replicate_bandit, calling fold(key, rows).
+    """
+    if processes == 1:
+        for key, task in tasks:
+            fold(key, _instances(task))
+        return
+    window_size = 2 * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(processes) as pool:
+        window = deque()
+        for key, task in tasks:
+            window.append((key, pool.submit(_instances, task)))
+            if len(window) >= window_size:
+                key, future = window.popleft()
+                fold(key, future.result())
+        while window:
+            key, future = window.popleft()
+            fold(key, future.result())
+
+
+def bootstrap_grid(
+    model,
+    points,
+    instances=100,
+    stats=GRAPH_STAT,
+    seed=None,
+    processes=None,
+    quantiles=(0.05, 0.5, 0.95),
+    batch=10,
+    checkpoint=None,
+    path_samples=None,
+):
+    """
+    Statistics of many random graphs for every parameter point, aggregated
+    with streaming mean and P-square quantiles so memory stays constant in
+    the number of instances.
+
+    Instances are generated as edge arrays in batches of `batch` per task
+    and spread over processes. Each point gets its own stream spawned from
+    SeedSequence(seed), so results depend only on the seed.
+
+    :param points: iterable of parameter tuples, e.g. [(50, 0.01), ...]
+    :param checkpoint: optional callable(done, total) called after every
+        folded batch
+    :param path_samples: BFS sources sampled per instance for the average
+        shortest path length, None for the exact value
+    :return: DataFrame with one row per (point, stat) and columns for the
+        parameters, stat, count, mean, std and one per quantile
+    """
+    points = [tuple(point) for point in points]
+    stats = list(stats)
+    seed_seq = np.random.SeedSequence(seed)
+    summaries = [StreamSummary((len(stats),), quantiles) for _ in points]
+    tasks = (
+        (index, (model, point, stats, children[start : start + batch], path_samples))
+        for index, (point, child) in enumerate(zip(points, seed_seq.spawn(len(points))))
+        for children in [child.spawn(instances)]
+        for start in range(0, instances, batch)
+    )
+    total = len(points) * instances
+    done = 0
+
+    def fold(index, rows):
+        nonlocal done
+        for row in rows:
+            summaries[index].update(row)
+        done += len(rows)
+        if checkpoint:
+            checkpoint(done, total)
+
+    _run(tasks, fold, processes)
+
+    names = PARAMS[model]
+    records = []
+    for point, summary in zip(points, summaries):
+        result = summary.result()
+        for s, name in enumerate(stats):
+            records.append(
+                {
+                    **dict(zip(names, point)),
+                    "stat": name,
+                    "count": result["count"],
+                    "mean": result["mean"][s],
+                    "std": result["std"][s],
+                    **{f"q{p:g}": q[s] for p, q in result["quantiles"].items()},
+                }
+            )
+    return pd.DataFrame(records)
+
+
+def bootstrap(model, params, instances=100, stats=GRAPH_STAT, **kwargs):
+    """
+    :return: DataFrame indexed by stat with count, mean, std and quantile
+        columns for a single parameter point
+    """
+    table = bootstrap_grid(model, [params], instances, stats, **kwargs)
+    return table.drop(columns=list(PARAMS[model])).set_index("stat")
+
+
+def _median(model, params, instances, kwargs):
+    kwargs.setdefault("quantiles", (0.5,))
+    return bootstrap(model, params, instances, **kwargs)["q0.5"].rename(None)
+
+
+def bootstraped_stat_random(n, p, instances=100, **kwargs):
+    """
+    Drop-in for the notebook helper: median statistics of G(n, p).
+    """
+    return _median("gnp", (n, p), instances, kwargs)
+
+
+def bootstraped_stat_ws(n, k, p, instances=100, **kwargs):
+    return _median("ws", (n, k, p), instances, kwargs)
+
+
+def bootstraped_stat_nws(n, k, p, instances=100, **kwargs):
+    return _median("nws", (n, k, p), instances, kwargs)
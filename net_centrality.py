@@ -0,0 +1,381 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+from net_csr import to_csr
+from net_pajek import PajekNetwork
+
+CENTRALITY = ("degree", "closeness", "betweenness", "eigenvector", "pagerank", "hits")
+
+_SHARED = None
+
+
+def _init(shared):
+    global _SHARED
+    _SHARED = shared
+
+
+def _call(task):
+    fn, sources = task
+    return fn(_SHARED, sources)
+
+
+def _map_sources(fn, shared, sources, processes=1, chunk_bytes=1 << 27):
+    """
+    Runs fn(shared, chunk) over chunks of sources, inline or on a process
+    pool whose workers receive shared once, and sums the results. A chunk's
+    (nodes, chunk) work arrays stay within chunk_bytes.
+    """
+    n = shared[0].shape[0]
+    processes = processes or os.cpu_count() or 1
+    step = max(1, chunk_bytes // (8 * 4 * max(n, 1)))
+    if processes > 1:
+        step = max(1, min(step, -(-len(sources) // (4 * processes))))
+    chunks = [sources[i : i + step] for i in range(0, len(sources), step)]
+    if processes == 1:
+        results = [fn(shared, chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(processes, initializer=_init, initargs=(shared,)) as pool:
+            results = list(pool.map(_call, [(fn, chunk) for chunk in chunks]))
+    return tuple(sum(parts) for parts in zip(*results))
+
+
+def _graph(graph, weight="weight", directed=None):
+    """
+    :return: (CSR adjacency with weights, node labels, directed); arrays
+        count as directed unless they are symmetric
+    """
+    if isinstance(graph, PajekNetwork):
+        matrix, nodes, is_directed = graph.matrix, graph.labels.tolist(), graph.directed
+    else:
+        matrix, nodes = to_csr(graph, weight=weight)
+        if isinstance(graph, nx.Graph):
+            is_directed = graph.is_directed()
+        else:
+            is_directed = (abs(matrix - matrix.T) > 0).nnz > 0
+    matrix = scipy.sparse.csr_array(matrix, dtype=float)
+    matrix.eliminate_zeros()
+    return matrix, nodes, is_directed if directed is None else directed
+
+
+def _pattern(matrix):
+    pattern = matrix.copy()
+    pattern.data[:] = 1.0
+    return pattern
+
+
+def degree(matrix, directed):
+    """
+    :return: dict of degree centralities, networkx convention (self-loops
+        count twice, directed graphs also get in_degree and out_degree)
+    """
+    n = matrix.shape[0]
+    pattern = _pattern(matrix)
+    out_degree = np.asarray(pattern.sum(axis=1)).ravel()
+    in_degree = np.asarray(pattern.sum(axis=0)).ravel()
+    scale = 1 / (n - 1) if n > 1 else 1
+    if directed:
+        return {
+            "degree": (in_degree + out_degree) * scale,
+            "in_degree": in_degree * scale,
+            "out_degree": out_degree * scale,
+        }
+    return {"degree": (out_degree + pattern.diagonal()) * scale}
+
+
+def _closeness_chunk(shared, sources):
+    incoming, weighted = shared
+    dist = scipy.sparse.csgraph.shortest_path(
+        incoming, directed=True, unweighted=not weighted, indices=sources
+    )
+    reached = np.isfinite(dist)
+    totals = np.where(reached, dist, 0).sum(axis=1)
+    n = incoming.shape[0]
+    result = np.zeros((2, n))
+    result[0, sources] = reached.sum(axis=1)
+    result[1, sources] = totals
+    return (result,)
+
+
+def closeness(matrix, directed, weighted=False, processes=1):
+    """
+    Closeness from one C-level BFS (Dijkstra when weighted, weights read as
+    lengths) per node, Wasserman-Faust scaled for disconnected graphs as in
+    networkx; directed graphs use distances towards the node.
+    """
+    n = matrix.shape[0]
+    incoming = scipy.sparse.csr_array(matrix.T) if directed else matrix
+    (result,) = _map_sources(_closeness_chunk, (incoming, weighted), np.arange(n), processes)
+    reached, totals = result
+    others = reached - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(totals > 0, others / totals, 0.0)
+    return value * (others / (n - 1) if n > 1 else 0)
+
+
+def _brandes_hops(shared, sources):
+    # all sources of the chunk at once: BFS levels and path counts as
+    # sparse-dense products, one column per source
+    forward, backward = shared
+    n, b = forward.shape[0], len(sources)
+    columns = np.arange(b)
+    dist = np.full((n, b), -1, dtype=np.int32)
+    dist[sources, columns] = 0
+    sigma = np.zeros((n, b))
+    sigma[sources, columns] = 1
+    frontier = sigma.copy()
+    depth = 0
+    while True:
+        reach = backward @ frontier
+        new = (reach > 0) & (dist < 0)
+        if not new.any():
+            break
+        depth += 1
+        dist[new] = depth
+        frontier = np.where(new, reach, 0)
+        sigma += frontier
+
+    delta = np.zeros((n, b))
+    for level in range(depth, 0, -1):
+        at = dist == level
+        coef = np.where(at, (1 + delta) / np.where(at, sigma, 1), 0)
+        delta += np.where(dist == level - 1, sigma * (forward @ coef), 0)
+    delta[sources, columns] = 0
+    return delta.sum(axis=1), (delta**2).sum(axis=1)
+
+
+def _brandes_lengths(shared, sources):
+    # per source: Dijkstra, then path counts and dependencies as triangular
+    # solves over the shortest path DAG in distance order
+    forward, _ = shared
+    n = forward.shape[0]
+    coo = forward.tocoo()
+    total, squares = np.zeros(n), np.zeros(n)
+    for s in sources:
+        dist = scipy.sparse.csgraph.dijkstra(forward, directed=True, indices=s)
+        reach = np.flatnonzero(np.isfinite(dist))
+        order = reach[np.argsort(dist[reach], kind="stable")]
+        position = np.full(n, -1)
+        position[order] = np.arange(len(order))
+        row, col = position[coo.row], position[coo.col]
+        tight = (row >= 0) & (col >= 0)
+        tight[tight] = np.isclose(
+            dist[coo.row[tight]] + coo.data[tight], dist[coo.col[tight]], rtol=1e-12, atol=0
+        )
+        size = len(order)
+        dag = scipy.sparse.csr_array(
+            (np.ones(tight.sum()), (row[tight], col[tight])), shape=(size, size)
+        )
+        eye = scipy.sparse.eye_array(size, format="csr")
+        start = np.zeros(size)
+        start[0] = 1
+        sigma = scipy.sparse.linalg.spsolve_triangular(
+            (eye - dag.T).tocsr(), start, lower=True
+        )
+        share = scipy.sparse.diags_array(sigma) @ dag @ scipy.sparse.diags_array(1 / sigma)
+        dep = scipy.sparse.linalg.spsolve_triangular(
+            (eye - share).tocsr(), share @ np.ones(size), lower=False
+        )
+        dep[0] = 0
+        total[order] += dep
+        squares[order] += dep**2
+    return total, squares
+
+
+def betweenness(
+    matrix,
+    directed,
+    weighted=False,
+    normalized=True,
+    samples=None,
+    confidence=0.95,
+    seed=None,
+    processes=1,
+):
+    """
+    Brandes betweenness: the dependencies of every source are accumulated
+    over the shortest paths from it, chunks of sources in parallel.
+    Unweighted chunks run all their BFS at once as sparse-dense products;
+    weighted ones (weights read as lengths, which must be positive) solve
+    the path counts and dependencies on each source's shortest path DAG.
+
+    With samples < n only that many sources, drawn without replacement, are
+    swept and the sums scaled as in networkx's k-sample estimate.
+
+    :return: dict with values, stderr (per node standard error, zeros when
+        exact) and bound, the half width holding for every node at once
+        with probability confidence (Hoeffding with a union bound)
+    """
+    n = matrix.shape[0]
+    if n < 3:
+        zeros = np.zeros(n)
+        return {"values": zeros, "stderr": zeros, "bound": 0.0}
+    if weighted and (matrix.data <= 0).any():
+        raise ValueError("Lengths must be positive")
+    exact = samples is None or samples >= n
+    if exact:
+        sources = np.arange(n)
+    elif samples < 2:
+        raise ValueError("Sampling needs at least 2 sources")
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, samples, replace=False))
+
+    forward = matrix if weighted else _pattern(matrix)
+    shared = (forward, scipy.sparse.csr_array(forward.T))
+    fn = _brandes_lengths if weighted else _brandes_hops
+    total, squares = _map_sources(fn, shared, sources, processes)
+
+    # sources other than v out of the n - 1 that can have v on a path
+    population = n - 1
+    counts = np.full(n, float(len(sources)))
+    counts[sources] -= 1
+    scale = 1 / (n - 2) if normalized else 1.0 if directed else 0.5
+    values = total / counts * scale
+    if exact:
+        stderr = np.zeros(n)
+        bound = 0.0
+    else:
+        mean = total / counts
+        variance = np.maximum(squares - counts * mean**2, 0) / np.maximum(counts - 1, 1)
+        correction = (population - counts) / (population - 1)
+        stderr = np.sqrt(variance / counts * correction) * scale
+        # one source contributes at most n - 2 to a node's dependency
+        bound = np.sqrt(np.log(2 * n / (1 - confidence)) / (2 * counts.min()))
+        bound *= (n - 2) * scale
+    if not normalized:
+        values, stderr, bound = values * population, stderr * population, bound * population
+    return {"values": values, "stderr": stderr, "bound": float(bound)}
+
+
+def _converged(name, max_iter):
+    return ValueError(f"{name} did not converge in {max_iter} iterations")
+
+
+def eigenvector(matrix, max_iter=100, tol=1e-6):
+    """
+    Eigenvector centrality by power iteration on A^T + I, as in networkx
+    (incoming links for directed graphs), unit Euclidean norm.
+    """
+    n = matrix.shape[0]
+    incoming = scipy.sparse.csr_array(matrix.T)
+    x = np.full(n, 1 / n)
+    for _ in range(max_iter):
+        last = x
+        x = last + incoming @ last
+        norm = np.linalg.norm(x)
+        if norm == 0:
+            raise ValueError("Eigenvector centrality is undefined for graphs without edges")
+        x = x / norm
+        if np.abs(x - last).sum() < n * tol:
+            return x
+    raise _converged("Eigenvector centrality", max_iter)
+
+
+def pagerank(matrix, alpha=0.85, max_iter=100, tol=1e-6):
+    """
+    PageRank by power iteration, networkx convention: weights split the
+    rank of a node over its out-links and dangling nodes jump uniformly.
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    strength = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = strength == 0
+    inverse = np.divide(1.0, strength, out=np.zeros(n), where=~dangling)
+    transition = scipy.sparse.csr_array((scipy.sparse.diags_array(inverse) @ matrix).T)
+    x = np.full(n, 1 / n)
+    for _ in range(max_iter):
+        last = x
+        x = alpha * (transition @ last + last[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(x - last).sum() < n * tol:
+            return x
+    raise _converged("PageRank", max_iter)
+
+
+def hits(matrix, max_iter=100, tol=1e-8):
+    """
+    HITS hubs and authorities by alternating power iteration, each
+    normalized to sum 1.
+
+    :return: (hubs, authorities)
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0), np.zeros(0)
+    incoming = scipy.sparse.csr_array(matrix.T)
+    hub = np.full(n, 1 / n)
+    for _ in range(max_iter):
+        last = hub
+        authority = incoming @ last
+        hub = matrix @ authority
+        top = hub.max()
+        if top == 0:
+            return np.zeros(n), np.zeros(n)
+        hub = hub / top
+        if np.abs(hub - last).sum() < tol:
+            authority = incoming @ hub
+            return hub / hub.sum(), authority / authority.sum()
+    raise _converged("HITS", max_iter)
+
+
+def centrality_table(
+    graph,
+    measures=CENTRALITY,
+    weight="weight",
+    distance=None,
+    directed=None,
+    samples=None,
+    seed=None,
+    processes=1,
+    max_iter=100,
+):
+    """
+    The weekend1a centralities_df as one table computed on CSR: degree,
+    closeness, betweenness, eigenvector, PageRank and HITS.
+
+    :param graph: networkx graph, PajekNetwork, sparse or dense adjacency
+    :param weight: edge attribute weighting eigenvector, PageRank and HITS,
+        None for unweighted
+    :param distance: edge attribute read as the length of an edge for
+        closeness and betweenness, True to use the weights, None for hops
+    :param samples: sources sampled for betweenness, None for exact; adds
+        a betweenness_stderr column and the uniform bound in
+        table.attrs["betweenness_bound"]
+    :return: DataFrame indexed by node with one column per centrality
+    """
+    matrix, nodes, directed = _graph(graph, weight, directed)
+    lengths = matrix
+    if isinstance(distance, str) and distance != weight:
+        lengths = _graph(graph, distance, directed)[0]
+    weighted = distance is not None
+
+    columns = {}
+    measures = list(measures)
+    if "degree" in measures:
+        columns.update(degree(matrix, directed))
+    if "closeness" in measures:
+        columns["closeness"] = closeness(lengths, directed, weighted, processes)
+    if "betweenness" in measures:
+        result = betweenness(
+            lengths, directed, weighted, samples=samples, seed=seed, processes=processes
+        )
+        columns["betweenness"] = result["values"]
+        if samples is not None and samples < len(nodes):
+            columns["betweenness_stderr"] = result["stderr"]
+    if "eigenvector" in measures:
+        columns["eigenvector"] = eigenvector(matrix, max_iter)
+    if "pagerank" in measures:
+        columns["pagerank"] = pagerank(matrix, max_iter=max_iter)
+    if "hits" in measures:
+        columns["hub"], columns["authority"] = hits(matrix, max_iter)
+
+    table = pd.DataFrame(columns, index=pd.Index(nodes, name="node"))
+    if "betweenness_stderr" in columns:
+        table.attrs["betweenness_bound"] = result["bound"]
+    return table
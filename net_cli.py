@@ -0,0 +1,416 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import scipy.sparse
+
+import net_formation_coauthor
+import net_formation_sym
+import net_games
+import net_games_coh
+from net_bootstrap import MODELS, PARAMS
+from net_csr import from_edges
+from net_growth import preferential_attachment, uniform_attachment
+from net_learn_obs import simulate_bandit
+from net_pajek import read_edge_list, read_pajek
+from net_stats import GRAPH_STAT, STATISTICS, GraphKernel
+
+# generator specs: model -> (edge array function, parameter names)
+GENERATORS = {
+    **{model: (MODELS[model], names) for model, names in PARAMS.items()},
+    "ba": (preferential_attachment, ("n", "m")),
+    "ua": (uniform_attachment, ("n", "m")),
+}
+TASKS = ("stats", "formation", "coauthor", "games", "bandit")
+GAMES = ("comp", "sub", "coh")
+
+COMMON = {
+    "input": "string",
+    "instance": "int64",
+    "task": "string",
+    "nodes": "int64",
+    "edges": "int64",
+}
+FORMATION = {
+    "total_util": "float64",
+    "pairwise_stable": "bool",
+    "unstable_links": "int64",
+    "blocking_links": "int64",
+    "improving_links": "int64",
+    "best_link": "string",
+}
+COLUMNS = {
+    "formation": {"delta": "float64", "cost": "float64", **FORMATION},
+    "coauthor": FORMATION,
+    "games": {
+        "game": "string",
+        "threshold": "float64",
+        "actions": "string",
+        "playing_1": "int64",
+        "optimal": "int64",
+        "equilibrium": "bool",
+    },
+    "bandit": {
+        "prob": "float64",
+        "episodes": "int64",
+        "share_b": "float64",
+        "mean_prob": "float64",
+    },
+}
+
+
+def parse_spec(spec):
+    """
+    Generator spec "model:key=value,..." with the model's parameters (see
+    GENERATORS) plus optional count (instances, default 1) and seed.
+
+    :return: (model, params tuple, count, seed)
+    """
+    model, _, options = spec.partition(":")
+    if model not in GENERATORS:
+        raise ValueError(f"Unknown generator {model}")
+    _, names = GENERATORS[model]
+    values = dict(item.split("=", 1) for item in options.split(",") if item)
+    unknown = set(values) - set(names) - {"count", "seed"}
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)} for {model}")
+    missing = [name for name in names if name not in values]
+    if missing:
+        raise ValueError(f"Missing parameters {missing} for {model}")
+    params = tuple(float(values[name]) if name == "p" else int(values[name]) for name in names)
+    seed = int(values["seed"]) if "seed" in values else None
+    return model, params, int(values.get("count", 1)), seed
+
+
+def _is_pajek(path):
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if line.strip():
+                return line.lstrip().startswith("*")
+    return False
+
+
+def is_spec(source):
+    return not os.path.exists(source) and source.split(":", 1)[0] in GENERATORS
+
+
+def jobs(sources, seed=None):
+    """
+    :return: iterator of (source, instance, SeedSequence) jobs, one per
+        file and count per generator spec
+    """
+    seed_seq = np.random.SeedSequence(seed)
+    for source, child in zip(sources, seed_seq.spawn(len(sources))):
+        count = parse_spec(source)[2] if is_spec(source) else 1
+        for instance, instance_seed in enumerate(child.spawn(count)):
+            yield source, instance, instance_seed
+
+
+def load_graph(source, instance_seed):
+    """
+    :return: CSR adjacency of a Pajek file, an edge list or one instance of
+        a generator spec (seeded by its own seed, else instance_seed)
+    """
+    if is_spec(source):
+        model, params, _, seed = parse_spec(source)
+        fn, _ = GENERATORS[model]
+        if seed is not None:
+            # instances of a seeded spec reproduce across runs and batches
+            instance_seed = np.random.SeedSequence([seed, *instance_seed.spawn_key])
+        src, dst = fn(*params, rng=np.random.default_rng(instance_seed))
+        return from_edges(params[0], src, dst)
+    if _is_pajek(source):
+        return read_pajek(source).matrix
+    return read_edge_list(source)[0]
+
+
+def _formation_row(stat):
+    exist, added = stat["exist_edges"], stat["added_edges"]
+    unstable = sum(not v["pair_supported"] for v in exist.values())
+    blocking = sum(v["pair_supported"] for v in added.values())
+    best = stat["added_edge_net_improve"]
+    return {
+        "total_util": float(sum(stat["current_util"].values())),
+        "pairwise_stable": unstable == 0 and blocking == 0,
+        "unstable_links": unstable,
+        "blocking_links": blocking,
+        "improving_links": sum(v["net_supported"] for v in added.values()),
+        "best_link": None if best is None else f"{best[0]}, {best[1]}",
+    }
+
+
+def _actions(graph, actions, rng):
+    if actions == "random":
+        values = rng.integers(0, 2, len(graph))
+    else:
+        values = np.full(len(graph), int(actions == "ones"))
+    for node, action in zip(graph.nodes(), values.tolist()):
+        graph.nodes[node]["action"] = action
+
+
+def _games_row(graph, game, threshold, actions, rng):
+    _actions(graph, actions, rng)
+    if game == "coh":
+        net_games_coh.update_utilities(graph, threshold)
+    else:
+        net_games.update_utilities(graph, game, threshold)
+    optimal = sum(bool(data["optimal"]) for _, data in graph.nodes(data=True))
+    return {
+        "game": game,
+        "threshold": float(threshold),
+        "actions": actions,
+        "playing_1": sum(data["action"] for _, data in graph.nodes(data=True)),
+        "optimal": optimal,
+        # every node already plays its best response
+        "equilibrium": optimal == len(graph),
+    }
+
+
+def _bandit_row(matrix, prob, options, rng):
+    n = matrix.shape[0]
+    observe = ((matrix != 0).astype(float) + scipy.sparse.identity(n)).tocsr()
+    result = simulate_bandit(
+        prob,
+        observe,
+        np.full(n, options["belief"]),
+        np.full(n, options["greedy"]),
+        options["episodes"],
+        rng,
+    )
+    return {
+        "prob": float(prob),
+        "episodes": options["episodes"],
+        "share_b": float(result["actions"][:, -1].mean()) if n else float("nan"),
+        "mean_prob": float(result["probs"][:, -1].mean()) if n else float("nan"),
+    }
+
+
+def analyze(job, options):
+    """
+    Runs the selected tasks on one graph.
+
+    :param job: (source, instance, SeedSequence) from jobs()
+    :param options: dict of the analysis options (see main)
+    :return: list of flat row dicts
+    """
+    source, instance, seed = job
+    rng = np.random.default_rng(seed)
+    matrix = load_graph(source, seed)
+    kernel = GraphKernel(matrix, path_samples=options["path_samples"], seed=rng)
+    base = {
+        "input": source,
+        "instance": instance,
+        "nodes": kernel.numb_nodes,
+        "edges": kernel.number_of_edges,
+    }
+    graph = None
+    rows = []
+    for task in options["tasks"]:
+        if task == "stats":
+            values = {name: float(kernel.stat(name)) for name in options["stats"]}
+            rows.append({**base, "task": task, **values})
+            continue
+        if graph is None and task != "bandit":
+            graph = nx.from_scipy_sparse_array(matrix)
+        if task == "formation":
+            for delta, cost in itertools.product(options["delta"], options["cost"]):
+                stat = net_formation_sym.analyze_network(graph, delta, cost)
+                rows.append({**base, "task": task, "delta": delta, "cost": cost, **_formation_row(stat)})
+        elif task == "coauthor":
+            stat = net_formation_coauthor.analyze_network(graph)
+            rows.append({**base, "task": task, **_formation_row(stat)})
+        elif task == "games":
+            for game, threshold in itertools.product(options["games"], options["threshold"]):
+                row = _games_row(graph, game, threshold, options["actions"], rng)
+                rows.append({**base, "task": task, **row})
+        elif task == "bandit":
+            for prob in options["prob"]:
+                rows.append({**base, "task": task, **_bandit_row(matrix, prob, options, rng)})
+    return rows
+
+
+def run(jobs, options, processes=1):
+    """
+    Yields the rows of every job in job order. With processes > 1 the jobs
+    run on a pool with the bounded in-order window of net_bootstrap, so
+    only a few jobs' rows are held at a time however long the batch.
+    """
+    if processes == 1:
+        for job in jobs:
+            yield from analyze(job, options)
+        return
+    window_size = 2 * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(processes or None) as pool:
+        window = deque()
+        for job in jobs:
+            window.append(pool.submit(analyze, job, options))
+            if len(window) >= window_size:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def columns(options):
+    """
+    :return: dict {column: type} of every row field for these options
+    """
+    schema = dict(COMMON)
+    for task in options["tasks"]:
+        if task == "stats":
+            schema.update({name: "float64" for name in options["stats"]})
+        else:
+            schema.update(COLUMNS[task])
+    return schema
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class JSONLinesWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, row):
+        self.file.write(json.dumps({k: _json_value(v) for k, v in row.items()}) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter:
+    """
+    Writes rows to a Parquet file one row group of batch rows at a time,
+    all with the same schema. Needs pyarrow.
+    """
+
+    def __init__(self, path, schema, batch=1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Parquet output needs pyarrow") from error
+        self._pa = pa
+        self.schema = pa.schema([(name, pa.type_for_alias(kind)) for name, kind in schema.items()])
+        self.batch = batch
+        self._rows = []
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            table = self._pa.Table.from_pylist(self._rows, schema=self.schema)
+            self._writer.write_table(table)
+            self._rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+
+def _read_sources(args):
+    sources = list(args.inputs)
+    if args.inputs_from:
+        with open(args.inputs_from, encoding="utf-8") as file:
+            sources.extend(line.strip() for line in file if line.strip() and not line.startswith("#"))
+    for source in sources:
+        if not os.path.exists(source) and not is_spec(source):
+            raise ValueError(f"{source} is neither a file nor a generator spec")
+        if is_spec(source):
+            parse_spec(source)
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m net_cli",
+        description="Batch network analysis without the Dash apps",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    analyze_parser = commands.add_parser(
+        "analyze",
+        help="analyze edge lists, Pajek files or generated graphs",
+        description=(
+            "Inputs are edge list or Pajek files, or generator specs such as "
+            "gnp:n=1000,p=0.01,count=100,seed=1 "
+            f"(models: {', '.join(GENERATORS)})."
+        ),
+    )
+    analyze_parser.add_argument("inputs", nargs="*")
+    analyze_parser.add_argument("--inputs-from", help="file with one input per line")
+    analyze_parser.add_argument("-t", "--tasks", nargs="+", choices=TASKS, default=["stats"])
+    analyze_parser.add_argument("-o", "--output", help="output file, default stdout")
+    analyze_parser.add_argument("--format", choices=("jsonl", "parquet"))
+    analyze_parser.add_argument("--batch", type=int, default=1000, help="Parquet rows per row group")
+    analyze_parser.add_argument("-j", "--processes", type=int, default=1, help="0 for all CPUs")
+    analyze_parser.add_argument("--seed", type=int)
+    analyze_parser.add_argument("--stats", nargs="+", choices=STATISTICS, default=list(GRAPH_STAT))
+    analyze_parser.add_argument("--path-samples", type=int)
+    analyze_parser.add_argument("--delta", nargs="+", type=float, default=[0.5])
+    analyze_parser.add_argument("--cost", nargs="+", type=float, default=[0.3])
+    analyze_parser.add_argument("--games", nargs="+", choices=GAMES, default=["comp"])
+    analyze_parser.add_argument("--threshold", nargs="+", type=float, default=[2.0])
+    analyze_parser.add_argument("--actions", choices=("ones", "zeros", "random"), default="ones")
+    analyze_parser.add_argument("--prob", nargs="+", type=float, default=[0.6])
+    analyze_parser.add_argument("--episodes", type=int, default=1000)
+    analyze_parser.add_argument("--belief", type=float, default=0.0)
+    analyze_parser.add_argument("--greedy", type=float, default=0.05)
+
+    args = parser.parse_args(argv)
+    if args.processes < 0:
+        parser.error("--processes must be 0 (all CPUs) or more")
+    try:
+        sources = _read_sources(args)
+    except ValueError as error:
+        parser.error(str(error))
+    options = {
+        "tasks": args.tasks,
+        "stats": args.stats,
+        "path_samples": args.path_samples,
+        "delta": args.delta,
+        "cost": args.cost,
+        "games": args.games,
+        "threshold": args.threshold,
+        "actions": args.actions,
+        "prob": args.prob,
+        "episodes": args.episodes,
+        "belief": args.belief,
+        "greedy": args.greedy,
+    }
+    output_format = args.format or (
+        "parquet" if args.output and args.output.endswith(".parquet") else "jsonl"
+    )
+    if output_format == "parquet":
+        if not args.output:
+            parser.error("Parquet output needs --output")
+        try:
+            writer = ParquetWriter(args.output, columns(options), args.batch)
+        except ImportError as error:
+            parser.error(str(error))
+    else:
+        writer = JSONLinesWriter(open(args.output, "w", encoding="utf-8") if args.output else sys.stdout)
+    try:
+        for row in run(jobs(sources, args.seed), options, args.processes):
+            writer.write(row)
+    finally:
+        writer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
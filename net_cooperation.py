@@ -0,0 +1,236 @@
+import networkx as nx
+import numpy as np
+
+from net_ddf import degree_sequence
+
+PARAMETERS = ("delta", "cost", "value", "prob")
+
+
+def favor_benefit(delta, cost, value, prob):
+    """
+    Discounted value of one relationship in the favor exchange game,
+    delta * prob * (value - cost) / (1 - delta), broadcasting over the
+    parameters; inf at delta = 1 when favors are worth more than they cost.
+    """
+    delta, cost, value, prob = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (delta, cost, value, prob))
+    )
+    gain = delta * prob * (value - cost)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        benefit = np.where(delta < 1, gain / (1 - delta), np.sign(gain) * np.inf)
+    return benefit
+
+
+def favor_utility(degree, delta, cost, value, prob):
+    """
+    Utility of a node with the given degree, degree * benefit - cost for
+    connected nodes (net_games_repeat.analyze_network), broadcasting the
+    degrees against the parameters.
+    """
+    degree = np.asarray(degree)
+    benefit = favor_benefit(delta, cost, value, prob)
+    with np.errstate(invalid="ignore"):
+        utility = degree * benefit - np.asarray(cost, dtype=float) * (degree > 0)
+    # isolated nodes neither give nor receive favors
+    return np.where(degree > 0, utility, 0.0)
+
+
+def critical_delta(degree, cost, value, prob):
+    """
+    Smallest discount factor at which a node of the given degree sustains
+    cooperation (nonnegative utility):
+
+        delta >= cost / (cost + degree * prob * (value - cost))
+
+    0 for isolated nodes and free favors, inf where no delta < 1 works.
+    """
+    degree, cost, value, prob = np.broadcast_arrays(
+        np.asarray(degree, dtype=float),
+        *(np.asarray(x, dtype=float) for x in (cost, value, prob)),
+    )
+    stake = degree * prob * (value - cost)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        threshold = np.where(stake > 0, cost / (cost + stake), np.inf)
+    return np.where((degree == 0) | (cost <= 0), 0.0, threshold)
+
+
+def min_sustaining_degree(delta, cost, value, prob):
+    """
+    Smallest degree >= 1 at which a connected node sustains cooperation,
+    broadcasting over the parameters; inf when no degree does. Connected
+    nodes sustain cooperation exactly when their degree reaches it, as the
+    utility grows linearly in the degree.
+    """
+    cost = np.asarray(cost, dtype=float)
+    if (cost < 0).any():
+        raise ValueError("Costs must be nonnegative")
+    benefit = favor_benefit(delta, cost, value, prob)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        degree = np.where(benefit > 0, np.maximum(np.ceil(cost / benefit), 1), np.inf)
+        # settle rounding so the rule agrees with degree * benefit >= cost
+        lower = np.maximum(degree - 1, 1)
+        degree = np.where((degree > 1) & (lower * benefit - cost >= 0), lower, degree)
+        degree = np.where(np.isfinite(degree) & (degree * benefit - cost < 0), degree + 1, degree)
+    return np.where((benefit == 0) & (cost == 0), 1.0, degree)
+
+
+def cooperation_sweep(graph, delta, cost, value, prob):
+    """
+    Which nodes sustain cooperation (nonnegative utility) over a full 4-D
+    parameter grid. The utility only depends on the degree and grows with
+    it, so every grid point is summarized by its minimal sustaining degree
+    and the node shares follow from the cumulative degree counts; memory
+    stays at the size of the grid, whatever the graph.
+
+    :param graph: networkx graph, adjacency or degree sequence
+    :param delta, cost, value, prob: 1-D arrays (or scalars) spanning the
+        grid axes, in this order
+    :return: dict with the parameter axes, node degrees, min_degree per grid
+        point (isolated nodes always sustain, connected ones from this
+        degree on), share of nodes sustaining and all (every node does)
+    """
+    axes = [np.atleast_1d(np.asarray(x, dtype=float)) for x in (delta, cost, value, prob)]
+    if any(axis.ndim != 1 for axis in axes):
+        raise ValueError("Parameters must be scalars or 1-D arrays")
+    node_degrees = degree_sequence(graph)
+    degrees, counts = np.unique(node_degrees, return_counts=True)
+    min_degree = min_sustaining_degree(*np.ix_(*axes))
+    # nodes of degree >= min_degree, plus the isolated ones
+    at_least = np.concatenate([np.cumsum(counts[::-1])[::-1], [0]])
+    sustaining = at_least[np.searchsorted(degrees, min_degree)] + counts[degrees == 0].sum()
+    numb_nodes = len(node_degrees)
+    return {
+        **dict(zip(PARAMETERS, axes)),
+        "degrees": node_degrees,
+        "min_degree": min_degree,
+        "share": sustaining / max(numb_nodes, 1),
+        "all": sustaining == numb_nodes,
+    }
+
+
+def node_sustains(sweep, index):
+    """
+    :param index: grid index (delta, cost, value, prob) of one point
+    :return: (nodes,) bool, True where the node sustains cooperation
+    """
+    degrees = sweep["degrees"]
+    return (degrees == 0) | (degrees >= sweep["min_degree"][tuple(index)])
+
+
+def degree_thresholds(degrees, cost, value, prob):
+    """
+    :return: (degrees, cost, value, prob) critical deltas, the closed-form
+        phase boundary of every degree
+    """
+    axes = [np.atleast_1d(np.asarray(x, dtype=float)) for x in (degrees, cost, value, prob)]
+    return critical_delta(*np.ix_(*axes))
+
+
+def utilities(graph, delta, cost, value, prob):
+    """
+    :return: dict {node: utility} for one parameter point
+    """
+    degree = dict(nx.degree(graph))
+    values = np.fromiter(degree.values(), dtype=float, count=len(degree))
+    return dict(zip(degree, favor_utility(values, delta, cost, value, prob).tolist()))
+
+
+def havel_hakimi(degrees):
+    """
+    Havel-Hakimi realization: the node with the largest remaining degree
+    links to the nodes with the next largest ones, until all are used.
+
+    :return: (src, dst) edge arrays of a simple graph with these degrees
+    :raises ValueError: when the sequence is not graphical
+    """
+    remaining = np.asarray(degrees, dtype=np.int64).copy()
+    if (remaining < 0).any() or remaining.sum() % 2:
+        raise ValueError("Degree sequence is not graphical")
+    src, dst = [], []
+    while True:
+        order = np.argsort(-remaining, kind="stable")
+        node, need = order[0], remaining[order[0]]
+        if need == 0:
+            break
+        targets = order[1 : need + 1]
+        if len(targets) < need or remaining[targets[-1]] == 0:
+            raise ValueError("Degree sequence is not graphical")
+        src.append(np.full(need, node))
+        dst.append(targets)
+        remaining[node] = 0
+        remaining[targets] -= 1
+    if not src:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(src), np.concatenate(dst)
+
+
+def optimal_networks(n, delta, cost, value, prob, max_edges=None, max_degree=None):
+    """
+    Networks on n nodes with the largest total utility in which every node
+    sustains cooperation, optionally with at most max_edges links and
+    max_degree links per node.
+
+    The total utility, benefit * 2 * links - cost * connected nodes, only
+    depends on the degrees: for s connected nodes it is largest with as
+    many links as the caps allow, spread near-regularly (degrees r and
+    r + 1, always graphical for an even sum), and every connected node
+    needs at least min_sustaining_degree links. So each s is one closed
+    form candidate, no edge subsets are enumerated.
+
+    :return: dict with utility, min_degree and degrees, one (n,) degree
+        sequence per optimal number of connected nodes (isolated nodes
+        last); realize them with havel_hakimi
+    """
+    benefit = float(favor_benefit(delta, cost, value, prob))
+    lower = float(min_sustaining_degree(delta, cost, value, prob))
+    connected = np.arange(n + 1)
+    cap = connected - 1 if max_degree is None else np.minimum(connected - 1, max_degree)
+    total = connected * np.maximum(cap, 0)
+    if max_edges is not None:
+        total = np.minimum(total, 2 * max_edges)
+    total -= total % 2
+    with np.errstate(invalid="ignore"):
+        feasible = (connected == 0) | ((cap >= lower) & (total >= connected * lower))
+        utility = np.where(connected > 0, benefit * total - float(cost) * connected, 0.0)
+    utility = np.where(feasible, utility, -np.inf)
+    best = utility.max()
+    sequences = []
+    for s in np.flatnonzero(np.isclose(utility, best, rtol=1e-12, atol=1e-12)):
+        degrees = np.zeros(n, dtype=np.int64)
+        if s:
+            base, extra = divmod(int(total[s]), int(s))
+            degrees[:s] = base
+            degrees[:extra] += 1
+        sequences.append(degrees)
+    return {"utility": float(best), "min_degree": lower, "degrees": sequences}
+
+
+def exhaustive_optimum(n, delta, cost, value, prob, max_edges=None, max_degree=None):
+    """
+    Reference for optimal_networks by enumerating all 2^(n (n - 1) / 2)
+    graphs on n nodes, small n only.
+
+    :return: dict with utility and degrees, the sorted degree sequences of
+        the optimal graphs
+    """
+    pairs = np.array([(u, v) for u in range(n) for v in range(u + 1, n)], dtype=np.int64)
+    if len(pairs) > 21:
+        raise ValueError("Too many graphs to enumerate")
+    masks = np.arange(1 << len(pairs), dtype=np.int64)
+    present = (masks[:, None] >> np.arange(len(pairs))) & 1
+    incidence = np.zeros((len(pairs), n), dtype=np.int64)
+    if len(pairs):
+        incidence[np.arange(len(pairs)), pairs[:, 0]] = 1
+        incidence[np.arange(len(pairs)), pairs[:, 1]] = 1
+    degrees = present @ incidence
+    utility = favor_utility(degrees, delta, cost, value, prob)
+    feasible = (utility >= 0).all(axis=1)
+    if max_edges is not None:
+        feasible &= present.sum(axis=1) <= max_edges
+    if max_degree is not None:
+        feasible &= (degrees <= max_degree).all(axis=1)
+    totals = np.where(feasible, utility.sum(axis=1), -np.inf)
+    best = totals.max()
+    optimal = np.isclose(totals, best, rtol=1e-12, atol=1e-12)
+    sequences = np.unique(-np.sort(-degrees[optimal], axis=1), axis=0)
+    return {"utility": float(best), "degrees": list(sequences)}
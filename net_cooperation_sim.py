@@ -0,0 +1,150 @@
+import numpy as np
+
+from net_cooperation import min_sustaining_degree
+from net_csr import to_csr, to_edges
+
+STRATEGIES = ("grim", "cooperate", "defect")
+CONTAGION = ("link", "node")
+
+
+def _links(graph):
+    matrix, nodes = to_csr(graph, weight=None)
+    src, dst, _ = to_edges(matrix + matrix.T)
+    keep = src != dst
+    return len(nodes), src[keep].astype(np.int64), dst[keep].astype(np.int64), nodes
+
+
+def _per_node(value, n, name, dtype=float):
+    value = np.asarray(value)
+    if value.ndim == 0:
+        return np.full(n, value, dtype=dtype)
+    if value.shape != (n,):
+        raise ValueError(f"{name} must be a scalar or one value per node")
+    return value.astype(dtype)
+
+
+def simulate_favors(
+    graph,
+    delta,
+    cost,
+    value,
+    prob,
+    periods=100,
+    replications=1,
+    strategy="grim",
+    deviate=0.0,
+    contagion="node",
+    shock=0.0,
+    shock_at=0,
+    seed=None,
+):
+    """
+    Monte Carlo favor exchange on a network, all replications at once as
+    the first axis of (replications, links) and (replications, nodes)
+    state arrays.
+
+    Every period each live link gets an opportunity with probability prob,
+    one endpoint at random asks and the other performs the favor (cost to
+    the giver, value to the asker) or refuses. A refusal ends the link for
+    good (grim trigger) and the refusing node defects from then on; with
+    contagion "node" the refused node also turns defector, so defection
+    spreads along links. Grim trigger players refuse once in defection or
+    once their live degree no longer sustains cooperation
+    (net_cooperation.min_sustaining_degree), "cooperate" players never
+    refuse, "defect" players always do; deviate adds a per-node chance of
+    refusing anyway.
+
+    :param strategy: one of STRATEGIES, or one per node
+    :param deviate: probability of a spontaneous refusal, scalar or per node
+    :param shock: share of nodes (or an array of node indices) forced into
+        defection at period shock_at
+    :return: dict with links (periods + 1, replications) share of live
+        links, defectors (periods + 1, replications) share of defecting
+        nodes, favors (periods, replications) favors done, payoff
+        (replications, nodes) discounted payoffs, and the final live
+        (replications, links) and defecting (replications, nodes) states
+        with src, dst and nodes
+    """
+    if contagion not in CONTAGION:
+        raise ValueError(f"Unknown contagion {contagion}")
+    rng = np.random.default_rng(seed)
+    n, src, dst, nodes = _links(graph)
+    reps, numb_links = replications, len(src)
+    codes = np.array([STRATEGIES.index(s) for s in np.broadcast_to(strategy, (n,))])
+    deviate = _per_node(deviate, n, "deviate")
+    threshold = float(min_sustaining_degree(delta, cost, value, prob))
+
+    live = np.ones((reps, numb_links), dtype=bool)
+    defecting = np.broadcast_to(codes == STRATEGIES.index("defect"), (reps, n)).copy()
+    payoff = np.zeros((reps, n))
+    links = np.empty((periods + 1, reps))
+    defectors = np.empty((periods + 1, reps))
+    favors = np.zeros((periods, reps), dtype=np.int64)
+    cooperator = codes == STRATEGIES.index("cooperate")
+    grim = codes == STRATEGIES.index("grim")
+    # live degrees, flat over (replication, node)
+    degree = np.tile(np.bincount(np.r_[src, dst], minlength=n), reps)
+
+    for period in range(periods + 1):
+        if period == shock_at:
+            if np.ndim(shock) == 0:
+                hit = rng.random((reps, n)) < shock
+            else:
+                hit = np.zeros((reps, n), dtype=bool)
+                hit[:, np.asarray(shock, dtype=np.int64)] = True
+            defecting |= hit & ~cooperator
+        links[period] = live.mean(axis=1) if numb_links else 1.0
+        defectors[period] = defecting.mean(axis=1) if n else 0.0
+        if period == periods:
+            break
+
+        # grim trigger players whose live degree no longer pays defect
+        current = degree.reshape(reps, n)
+        defecting |= grim & (current > 0) & (current < threshold)
+
+        # only the links asked for a favor this period are processed
+        rep, link = np.nonzero(live & (rng.random((reps, numb_links)) < prob))
+        src_asks = rng.random(len(link)) < 0.5
+        giver = np.where(src_asks, dst[link], src[link])
+        asker = np.where(src_asks, src[link], dst[link])
+        refuses = defecting[rep, giver] | (rng.random(len(link)) < deviate[giver])
+        refuses &= ~cooperator[giver]
+
+        flat_giver, flat_asker = rep * n + giver, rep * n + asker
+        done = ~refuses
+        gain = np.bincount(flat_asker[done], minlength=reps * n) * value
+        loss = np.bincount(flat_giver[done], minlength=reps * n) * cost
+        payoff += delta**period * (gain - loss).reshape(reps, n)
+        favors[period] = np.bincount(rep[done], minlength=reps)
+
+        live[rep[refuses], link[refuses]] = False
+        ends = np.r_[flat_giver[refuses], flat_asker[refuses]]
+        degree -= np.bincount(ends, minlength=reps * n)
+        trigger = np.zeros(reps * n, dtype=bool)
+        trigger[flat_giver[refuses]] = True
+        if contagion == "node":
+            trigger[flat_asker[refuses]] = True
+        defecting |= trigger.reshape(reps, n) & ~cooperator
+
+    return {
+        "links": links,
+        "defectors": defectors,
+        "favors": favors,
+        "payoff": payoff,
+        "live": live,
+        "defecting": defecting,
+        "src": src,
+        "dst": dst,
+        "nodes": nodes,
+    }
+
+
+def unraveling_time(result, level=0.5, series="links"):
+    """
+    :return: (replications,) first period at which the share of live links
+        (or with series="defectors", 1 - share of defectors) falls below
+        level, -1 where it never does
+    """
+    share = result[series] if series == "links" else 1 - result[series]
+    below = share < level
+    return np.where(below.any(axis=0), below.argmax(axis=0), -1)
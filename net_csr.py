@@ -0,0 +1,116 @@
+import itertools
+
+import numpy as np
+import scipy.sparse
+import networkx as nx
+
+
+def from_edges(numb_nodes, src, dst, weights=None, directed=False):
+    """
+    :return: CSR adjacency (scipy csr_array) built from edge arrays;
+        undirected edges are mirrored, duplicate edges summed
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    if weights is None:
+        weights = np.ones(len(src))
+    weights = np.asarray(weights, dtype=float)
+    if not directed:
+        loops = src == dst
+        src, dst = np.concatenate([src, dst[~loops]]), np.concatenate([dst, src[~loops]])
+        weights = np.concatenate([weights, weights[~loops]])
+    matrix = scipy.sparse.coo_array(
+        (weights, (src, dst)), shape=(numb_nodes, numb_nodes)
+    ).tocsr()
+    matrix.sum_duplicates()
+    return matrix
+
+
+def _pattern_csr(graph, nodes):
+    # the rows straight from the neighbor dicts: one entry per neighbor,
+    # so each undirected edge twice and a self-loop once, as from_edges
+    size = len(nodes)
+    degree = np.fromiter(
+        (len(neighbors) for _, neighbors in graph.adjacency()), dtype=np.int64, count=size
+    )
+    neighbors = itertools.chain.from_iterable(row for _, row in graph.adjacency())
+    if nodes != list(range(size)):
+        index = {node: i for i, node in enumerate(nodes)}
+        neighbors = (index[node] for node in neighbors)
+    indices = np.fromiter(neighbors, dtype=np.int64, count=int(degree.sum()))
+    indptr = np.concatenate([[0], np.cumsum(degree)])
+    matrix = scipy.sparse.csr_array(
+        (np.ones(len(indices)), indices, indptr), shape=(size, size)
+    )
+    matrix.sort_indices()
+    return matrix
+
+
+def to_csr(graph, weight="weight", nodelist=None):
+    """
+    Accepts a networkx graph, a scipy sparse matrix or a dense array.
+
+    :return: (csr adjacency, node labels in row order)
+    """
+    if isinstance(graph, nx.Graph):
+        nodes = list(graph.nodes) if nodelist is None else list(nodelist)
+        if graph.is_multigraph() or nodelist is not None:
+            matrix = nx.to_scipy_sparse_array(
+                graph, nodelist=nodes, weight=weight, format="csr"
+            )
+            return matrix.astype(float), nodes
+        if weight is None:
+            return _pattern_csr(graph, nodes), nodes
+        # edge arrays straight from the adjacency dicts, much faster than
+        # networkx's own conversion on large graphs
+        index = {node: i for i, node in enumerate(nodes)}
+        count = graph.number_of_edges()
+        ends = np.fromiter(
+            (index[node] for edge in graph.edges() for node in edge),
+            dtype=np.int64,
+            count=2 * count,
+        ).reshape(count, 2)
+        weights = None
+        if weight is not None:
+            weights = np.fromiter(
+                (data.get(weight, 1) for _, _, data in graph.edges(data=True)),
+                dtype=float,
+                count=count,
+            )
+        matrix = from_edges(
+            len(nodes), ends[:, 0], ends[:, 1], weights, directed=graph.is_directed()
+        )
+        return matrix, nodes
+    if scipy.sparse.issparse(graph):
+        matrix = scipy.sparse.csr_array(graph, dtype=float)
+    else:
+        matrix = scipy.sparse.csr_array(np.asarray(graph, dtype=float))
+    if matrix.shape[0] != matrix.shape[1]:
+        raise ValueError("Adjacency matrix must be square")
+    return matrix, list(range(matrix.shape[0])) if nodelist is None else list(nodelist)
+
+
+def to_edges(matrix, upper=True):
+    """
+    :return: (src, dst, weights) arrays of a CSR adjacency; with upper only
+        src <= dst entries, i.e. each undirected edge once
+    """
+    coo = scipy.sparse.coo_array(matrix)
+    mask = coo.row <= coo.col if upper else slice(None)
+    return coo.row[mask], coo.col[mask], coo.data[mask]
+
+
+def symmetrize(matrix):
+    """
+    :return: unweighted undirected CSR adjacency with no self-loops
+    """
+    coo = scipy.sparse.coo_array(matrix)
+    keep = (coo.row != coo.col) & (coo.data != 0)
+    row, col = coo.row[keep], coo.col[keep]
+    pattern = scipy.sparse.coo_array(
+        (np.ones(2 * len(row), dtype=np.int8), (np.r_[row, col], np.r_[col, row])),
+        shape=coo.shape,
+    ).tocsr()
+    pattern.sum_duplicates()
+    pattern.data[:] = 1
+    return pattern
@@ -0,0 +1,214 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.optimize
+
+from net_stats import GraphKernel
+
+ALPHA_BOUNDS = (0.0, 0.99)
+
+
+def degree_sequence(graph):
+    """
+    :param graph: networkx graph, sparse/dense adjacency or a degree sequence
+    :return: int array of degrees (networkx convention, self-loops twice)
+    """
+    if isinstance(graph, nx.Graph):
+        return np.fromiter((d for _, d in graph.degree()), dtype=np.int64, count=len(graph))
+    array = np.asarray(graph) if not hasattr(graph, "tocsr") else None
+    if array is not None and array.ndim == 1:
+        return array.astype(np.int64)
+    return GraphKernel(graph).nx_degree
+
+
+def degree_df(graph):
+    """
+    The notebook's degree_df: distinct degrees with their frequency and
+    cumulative frequency.
+    """
+    values, counts = np.unique(degree_sequence(graph), return_counts=True)
+    total_counts = np.sum(counts)
+    return {
+        "degree": values,
+        "freq": counts / total_counts,
+        "cum_freq": np.cumsum(counts) / total_counts,
+    }
+
+
+def hybrid_ddf(alpha, d, m):
+    """
+    Degree distribution of the hybrid growing network, broadcasting over
+    alpha, d and m; alpha = 1 is the exponential limit.
+    """
+    alpha, d, m = np.broadcast_arrays(
+        np.asarray(alpha, dtype=float), np.asarray(d, dtype=float), np.asarray(m, dtype=float)
+    )
+    exponential = alpha == 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = 2 / (1 - alpha)
+        amx = alpha * m * x
+        power = 1 - ((m + amx) / (d + amx)) ** x
+    value = np.where(exponential, 1 - np.exp(-(d - m) / m), power)
+    return np.maximum(value, 0)
+
+
+def _losses(alpha, degree, cum_freq, m, problem, offsets):
+    """
+    :param alpha: (problems, k) candidate alphas per problem
+    :return: (problems, k) sums of squared ddf errors; the points of all
+        problems are listed flat, grouped by problem, starting at offsets
+    """
+    error = cum_freq[:, None] - hybrid_ddf(alpha[problem], degree[:, None], m[:, None])
+    return np.add.reduceat(error**2, offsets, axis=0)
+
+
+def _fit_chunk(task):
+    degree, cum_freq, m, problem, grid, starts, steps, tol = task
+    offsets = np.flatnonzero(np.r_[True, problem[1:] != problem[:-1]])
+    numb = len(offsets)
+    lower, upper = ALPHA_BOUNDS
+    alphas = np.linspace(lower, upper, grid)
+    loss = _losses(np.broadcast_to(alphas, (numb, grid)), degree, cum_freq, m, problem, offsets)
+
+    # the best grid points that are local minima seed the refinement
+    padded = np.pad(loss, ((0, 0), (1, 1)), constant_values=np.inf)
+    local = (loss <= padded[:, :-2]) & (loss <= padded[:, 2:])
+    rank = np.where(local, loss, np.inf)
+    best = np.argsort(rank, axis=1, kind="stable")[:, :starts]
+    alpha = alphas[best]
+    current = np.take_along_axis(loss, best, axis=1)
+    start = alpha.copy()
+
+    # projected Newton steps on finite differences, with step halving when
+    # the loss does not decrease
+    h = 1e-5
+    iterations = np.zeros(alpha.shape, dtype=np.int64)
+    active = np.isfinite(current)
+    for _ in range(steps):
+        if not active.any():
+            break
+        plus = _losses(np.minimum(alpha + h, upper), degree, cum_freq, m, problem, offsets)
+        minus = _losses(np.maximum(alpha - h, lower), degree, cum_freq, m, problem, offsets)
+        width = np.minimum(alpha + h, upper) - np.maximum(alpha - h, lower)
+        grad = (plus - minus) / width
+        curv = (plus - 2 * current + minus) / h**2
+        step = np.where(curv > 0, grad / np.where(curv > 0, curv, 1), grad)
+        scale = np.ones(alpha.shape)
+        moved = np.zeros(alpha.shape, dtype=bool)
+        # the improvement of every start, from whichever scale moved it
+        change = np.zeros(alpha.shape)
+        for _ in range(20):
+            trial = np.clip(alpha - scale * step, lower, upper)
+            trial_loss = _losses(trial, degree, cum_freq, m, problem, offsets)
+            better = active & ~moved & (trial_loss < current)
+            alpha = np.where(better, trial, alpha)
+            change = np.where(better, current - trial_loss, change)
+            current = np.where(better, trial_loss, current)
+            moved |= better
+            if (moved | ~active).all():
+                break
+            scale *= 0.5
+        iterations += active
+        active &= moved & (change > tol)
+
+    pick = np.argmin(current, axis=1)
+    rows = np.arange(numb)
+    return {
+        "alpha": alpha[rows, pick],
+        "loss": current[rows, pick],
+        "start": start[rows, pick],
+        "iterations": iterations[rows, pick],
+    }
+
+
+def fit_hybrid(
+    graphs,
+    ms,
+    names=None,
+    grid=100,
+    starts=3,
+    steps=50,
+    tol=1e-12,
+    processes=1,
+    chunk=256,
+):
+    """
+    Fits hybrid_ddf to the cumulative degree distribution of every input for
+    every m: the loss is evaluated on an (alpha x degree) grid, the best
+    local minima start vectorized Newton refinements within ALPHA_BOUNDS and
+    the best refined start wins.
+
+    :param graphs: iterable of graphs or degree sequences
+    :param ms: candidate m values, all tried on every input
+    :param names: optional labels of the inputs, default their position
+    :param processes: worker processes, chunks of inputs are fitted in
+        parallel; None uses every core
+    :return: DataFrame with columns name, m, alpha, loss, start, iterations
+    """
+    ddfs = [degree_df(graph) for graph in graphs]
+    if any(not len(ddf["degree"]) for ddf in ddfs):
+        raise ValueError("Cannot fit a graph without nodes")
+    names = list(range(len(ddfs))) if names is None else list(names)
+    ms = np.atleast_1d(np.asarray(ms, dtype=float))
+
+    tasks = []
+    for begin in range(0, len(ddfs), chunk):
+        part = ddfs[begin : begin + chunk]
+        sizes = np.array([len(ddf["degree"]) for ddf in part])
+        degree = np.concatenate([ddf["degree"] for ddf in part]).astype(float)
+        cum_freq = np.concatenate([ddf["cum_freq"] for ddf in part])
+        owner = np.repeat(np.arange(len(part)), sizes)
+        # one problem per (input, m), points repeated for every m and
+        # grouped by problem
+        problem = (owner[None, :] * len(ms) + np.arange(len(ms))[:, None]).ravel()
+        order = np.argsort(problem, kind="stable")
+        tasks.append(
+            (
+                np.tile(degree, len(ms))[order],
+                np.tile(cum_freq, len(ms))[order],
+                np.repeat(ms, len(degree))[order],
+                problem[order],
+                grid,
+                starts,
+                steps,
+                tol,
+            )
+        )
+
+    if processes == 1:
+        results = [_fit_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(processes or os.cpu_count()) as pool:
+            results = list(pool.map(_fit_chunk, tasks))
+
+    frames = []
+    for index, result in enumerate(results):
+        part = names[index * chunk : (index + 1) * chunk]
+        frames.append(
+            pd.DataFrame(
+                {
+                    "name": np.repeat(np.array(part, dtype=object), len(ms)),
+                    "m": np.tile(ms, len(part)),
+                    **result,
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=["name", "m", "alpha", "loss", "start", "iterations"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def fit_hybrid_model(graph, m):
+    """
+    Drop-in for the notebook helper, returning a scipy OptimizeResult.
+    """
+    row = fit_hybrid([graph], [m]).iloc[0]
+    return scipy.optimize.OptimizeResult(
+        x=np.array([row["alpha"]]),
+        fun=row["loss"],
+        nit=int(row["iterations"]),
+        success=True,
+    )
@@ -0,0 +1,297 @@
+import inspect
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+import plotly.graph_objects as go
+
+from net_csr import to_csr
+
+
+def stochastic_matrix(graph, weight="weight"):
+    """
+    Row-normalized listening matrix, T[i, j] the weight i puts on j. Agents
+    listening to nobody keep their own belief.
+
+    :param graph: networkx graph, sparse or dense matrix
+    :return: CSR row-stochastic matrix
+    """
+    matrix, _ = to_csr(graph, weight=weight)
+    row_sum = np.asarray(matrix.sum(axis=1)).ravel()
+    if (matrix.data < 0).any():
+        raise ValueError("Negative weights")
+    silent = row_sum == 0
+    scale = np.divide(1.0, row_sum, out=np.zeros_like(row_sum), where=~silent)
+    matrix = scipy.sparse.diags_array(scale) @ matrix
+    if silent.any():
+        matrix = matrix + scipy.sparse.diags_array(silent.astype(float))
+    return scipy.sparse.csr_array(matrix)
+
+
+def degroot(trans_matrix, beliefs, max_steps=10_000, tol=1e-10, trace=False):
+    """
+    Iterates b(t+1) = T b(t) with sparse mat-vecs until the largest change
+    drops below tol.
+
+    :param beliefs: (n,) vector or (n, k) matrix of k belief vectors updated
+        together
+    :param trace: keep every step (only for small networks)
+    :return: dict with beliefs, steps, converged and, with trace, history as
+        a (steps + 1, n[, k]) array
+    """
+    trans_matrix = scipy.sparse.csr_array(trans_matrix)
+    beliefs = np.asarray(beliefs, dtype=float)
+    history = [beliefs] if trace else None
+    converged = False
+    steps = 0
+    while steps < max_steps:
+        updated = trans_matrix @ beliefs
+        steps += 1
+        if trace:
+            history.append(updated)
+        change = np.max(np.abs(updated - beliefs)) if beliefs.size else 0.0
+        beliefs = updated
+        if change < tol:
+            converged = True
+            break
+
+    return {
+        "beliefs": beliefs,
+        "steps": steps,
+        "converged": converged,
+        "history": np.array(history) if trace else None,
+    }
+
+
+# bicgstab's relative tolerance was renamed from tol to rtol in scipy 1.12
+_RTOL = (
+    "rtol"
+    if "rtol" in inspect.signature(scipy.sparse.linalg.bicgstab).parameters
+    else "tol"
+)
+
+
+def _solve(system, rhs, direct_limit, tol):
+    """
+    Solves a sparse M-matrix system: sparse LU up to direct_limit unknowns,
+    BiCGSTAB beyond, column by column for 2-D right-hand sides.
+    """
+    if system.shape[0] <= direct_limit:
+        return scipy.sparse.linalg.splu(scipy.sparse.csc_array(system)).solve(rhs)
+    system = scipy.sparse.csr_array(system)
+    columns = rhs.reshape(len(rhs), -1)
+    result = np.empty_like(columns)
+    for k in range(columns.shape[1]):
+        result[:, k], info = scipy.sparse.linalg.bicgstab(
+            system, columns[:, k], x0=columns[:, k], atol=0.0, **{_RTOL: tol}
+        )
+        if info != 0:
+            raise ValueError("Iterative solver did not converge")
+    return result.reshape(rhs.shape)
+
+
+def _periods(trans_matrix, labels, classes):
+    """
+    Period of each listed class from one BFS: a virtual source feeds one
+    root per class, and the period is the gcd of level[u] + 1 - level[v]
+    over the class's internal edges.
+    """
+    size = trans_matrix.shape[0]
+    coo = trans_matrix.tocoo()
+    member = np.zeros(labels.max() + 1, dtype=bool)
+    member[classes] = True
+    inside = (labels[coo.row] == labels[coo.col]) & member[labels[coo.row]] & (coo.data > 0)
+    row, col = coo.row[inside], coo.col[inside]
+
+    roots = np.full(labels.max() + 1, -1)
+    roots[labels[::-1]] = np.arange(size)[::-1]
+    roots = roots[classes]
+    graph = scipy.sparse.csr_array(
+        (
+            np.ones(len(row) + len(roots)),
+            (np.r_[row, np.full(len(roots), size)], np.r_[col, roots]),
+        ),
+        shape=(size + 1, size + 1),
+    )
+    level = scipy.sparse.csgraph.shortest_path(
+        graph, unweighted=True, indices=size, directed=True
+    )
+    gap = np.abs(level[row] + 1 - level[col]).astype(np.int64)
+
+    edge_class = labels[row]
+    order = np.argsort(edge_class, kind="stable")
+    edge_class, gap = edge_class[order], gap[order]
+    starts = np.flatnonzero(np.r_[True, edge_class[1:] != edge_class[:-1]]) if len(gap) else []
+    period = dict.fromkeys(classes.tolist(), 0)
+    if len(gap):
+        period.update(
+            zip(edge_class[starts].tolist(), np.gcd.reduceat(gap, starts).tolist())
+        )
+    return period
+
+
+def structure(trans_matrix):
+    """
+    Strongly connected classes of the listening graph (i -> j when i listens
+    to j), which of them are closed (listen to nobody outside) and their
+    periods.
+
+    :return: dict with labels (class of each agent), closed (indices of
+        closed classes), period ({closed class: period}) and aperiodic
+        (every closed class has period 1)
+    """
+    trans_matrix = scipy.sparse.csr_array(trans_matrix)
+    numb, labels = scipy.sparse.csgraph.connected_components(
+        trans_matrix, directed=True, connection="strong"
+    )
+    coo = trans_matrix.tocoo()
+    leaving = (labels[coo.row] != labels[coo.col]) & (coo.data > 0)
+    is_open = np.zeros(numb, dtype=bool)
+    is_open[labels[coo.row[leaving]]] = True
+    closed = np.flatnonzero(~is_open)
+    period = _periods(trans_matrix, labels, closed)
+
+    return {
+        "labels": labels,
+        "closed": closed,
+        "period": period,
+        "aperiodic": all(p == 1 for p in period.values()),
+    }
+
+
+def _stationary(sub, method="eigs", tol=1e-12):
+    size = sub.shape[0]
+    if size == 1:
+        return np.ones(1)
+    if method == "eigs" and size > 2:
+        value, vector = scipy.sparse.linalg.eigs(sub.T, k=1, which="LM", tol=tol)
+        # periodic classes have several unit-modulus eigenvalues
+        if abs(value[0] - 1) < 1e-8:
+            vector = np.abs(vector[:, 0].real)
+            return vector / vector.sum()
+    # s (I - T) = 0 with one equation replaced by sum(s) = 1
+    system = scipy.sparse.lil_array(scipy.sparse.identity(size) - sub.T)
+    system[0, :] = 1
+    rhs = np.zeros(size)
+    rhs[0] = 1
+    vector = np.clip(
+        scipy.sparse.linalg.spsolve(scipy.sparse.csc_array(system), rhs), 0, None
+    )
+    return vector / vector.sum()
+
+
+def influence(trans_matrix, method="eigs", net_structure=None):
+    """
+    Consensus weights of every closed class without iterating: the left
+    unit eigenvector s_C of T restricted to class C, zero elsewhere. Agents
+    of an aperiodic closed class C all reach s_C . b(0).
+
+    :param method: "eigs" (ARPACK) or "solve" (sparse linear system)
+    :return: dict with weights ((closed, n) sparse, one row per closed
+        class), member_of (row of each agent's closed class, -1 for the
+        rest) and the structure
+    """
+    trans_matrix = scipy.sparse.csr_array(trans_matrix)
+    net_structure = net_structure or structure(trans_matrix)
+    labels = net_structure["labels"]
+    closed = net_structure["closed"]
+    size = trans_matrix.shape[0]
+
+    position = np.full(labels.max() + 1, -1)
+    position[closed] = np.arange(len(closed))
+    rows = position[labels]
+    in_closed = np.flatnonzero(rows >= 0)
+    vals = np.ones(len(in_closed))
+    # singleton classes (stubborn agents) weigh themselves with 1
+    order = np.argsort(rows[in_closed], kind="stable")
+    counts = np.bincount(rows[in_closed], minlength=len(closed))
+    groups = np.split(order, np.cumsum(counts)[:-1])
+    for k in np.flatnonzero(counts > 1):
+        members = in_closed[groups[k]]
+        vals[groups[k]] = _stationary(trans_matrix[members][:, members], method)
+
+    weights = scipy.sparse.csr_array(
+        (vals, (rows[in_closed], in_closed)), shape=(len(closed), size)
+    )
+    return {
+        "weights": weights,
+        "member_of": rows,
+        "structure": net_structure,
+    }
+
+
+def consensus(trans_matrix, beliefs, method="eigs", direct_limit=50_000, tol=1e-10):
+    """
+    Closed-form limit of DeGroot learning. Closed classes take their
+    consensus s_C . b(0); the remaining agents average the closed classes
+    they listen to, solved as (I - Q) x = R x_closed with Q and R the
+    transient-to-transient and transient-to-closed blocks of T.
+
+    :param direct_limit: largest transient block factored with sparse LU,
+        larger ones are solved with BiCGSTAB
+    :return: dict with limit beliefs (same shape as beliefs), converges
+        (every closed class is aperiodic) and influence (the consensus
+        weights when there is a single closed class, else None)
+    """
+    trans_matrix = scipy.sparse.csr_array(trans_matrix)
+    result = influence(trans_matrix, method)
+    weights = result["weights"]
+    beliefs = np.asarray(beliefs, dtype=float)
+
+    class_values = weights @ beliefs
+    rows = result["member_of"]
+    covered = rows >= 0
+    limit = np.zeros_like(beliefs)
+    limit[covered] = class_values[rows[covered]]
+
+    transient = np.flatnonzero(~covered)
+    if len(transient):
+        sub = trans_matrix[transient]
+        q = sub[:, transient]
+        rhs = sub[:, np.flatnonzero(covered)] @ limit[covered]
+        system = scipy.sparse.identity(len(transient), format="csr") - q
+        limit[transient] = _solve(system, rhs, direct_limit, tol)
+
+    single = len(result["structure"]["closed"]) == 1
+    return {
+        "beliefs": limit,
+        "converges": result["structure"]["aperiodic"],
+        "influence": weights.toarray()[0] if single else None,
+    }
+
+
+def friedkin_johnsen(trans_matrix, beliefs, stubbornness, direct_limit=50_000, tol=1e-10):
+    """
+    Equilibrium of x = (I - L) T x + L x(0), L = diag(stubbornness), found
+    as the sparse linear system (I - (I - L) T) x = L x(0).
+
+    :param stubbornness: scalar or (n,) weight agents keep on their initial
+        belief
+    :param direct_limit: largest network factored with sparse LU, larger
+        ones are solved with BiCGSTAB
+    :return: (n,) or (n, k) equilibrium beliefs
+    """
+    trans_matrix = scipy.sparse.csr_array(trans_matrix)
+    size = trans_matrix.shape[0]
+    beliefs = np.asarray(beliefs, dtype=float)
+    stubbornness = np.broadcast_to(np.asarray(stubbornness, dtype=float), (size,))
+    if (stubbornness < 0).any() or (stubbornness > 1).any():
+        raise ValueError("Invalid stubbornness")
+    anchor = stubbornness.reshape((size,) + (1,) * (beliefs.ndim - 1)) * beliefs
+    listen = scipy.sparse.diags_array(1 - stubbornness) @ trans_matrix
+    system = scipy.sparse.identity(size, format="csr") - listen
+    return _solve(system, anchor, direct_limit, tol)
+
+
+def plotly_beliefs(history):
+    data = [
+        go.Scatter(
+            x=list(range(len(history))),
+            y=y,
+            mode="lines",
+        )
+        for y in np.asarray(history).reshape(len(history), -1).T
+    ]
+    return go.Figure(data=data)
@@ -0,0 +1,177 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse.csgraph
+import scipy.stats
+
+_GRAPH = None
+
+
+def _init(adjacency):
+    global _GRAPH
+    _GRAPH = adjacency
+
+
+def _sweep_on(adjacency, sources):
+    dist = scipy.sparse.csgraph.shortest_path(
+        adjacency, unweighted=True, directed=False, indices=sources
+    )
+    return dist.max(axis=1), dist.sum(axis=1)
+
+
+def _sweep(sources):
+    return _sweep_on(_GRAPH, sources)
+
+
+class BFSSweeper:
+    """
+    C-level BFS from many sources of one connected undirected CSR graph,
+    chunked so a chunk's distance rows stay within chunk_bytes. With
+    processes > 1 the chunks run on a pool whose workers receive the graph
+    once, when they start.
+
+    Use as a context manager so the pool is shut down.
+    """
+
+    def __init__(self, adjacency, processes=1, chunk_bytes=1 << 27):
+        self.adjacency = adjacency
+        self.size = adjacency.shape[0]
+        self.step = max(1, chunk_bytes // (8 * max(self.size, 1)))
+        self.processes = processes or os.cpu_count() or 1
+        self._pool = None
+
+    def __enter__(self):
+        if self.processes != 1:
+            self._pool = ProcessPoolExecutor(
+                self.processes, initializer=_init, initargs=(self.adjacency,)
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def run(self, sources):
+        """
+        :return: (eccentricity, distance sum) arrays, one entry per source
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        if not len(sources):
+            return np.zeros(0), np.zeros(0)
+        # enough chunks to keep every worker busy
+        step = self.step
+        if self._pool is not None:
+            step = max(1, min(step, -(-len(sources) // (4 * self.processes))))
+        chunks = [sources[i : i + step] for i in range(0, len(sources), step)]
+        if self._pool is None:
+            results = [_sweep_on(self.adjacency, chunk) for chunk in chunks]
+        else:
+            results = list(self._pool.map(_sweep, chunks))
+        return (
+            np.concatenate([r[0] for r in results]),
+            np.concatenate([r[1] for r in results]),
+        )
+
+
+def _farthest(dist):
+    return int(np.argmax(dist)), int(dist.max())
+
+
+def diameter(adjacency, processes=1, chunk_bytes=1 << 27, start=None):
+    """
+    Exact diameter of a connected undirected graph with iFUB (Crescenzi et
+    al.): a double sweep gives a lower bound and a central node u; the
+    nodes are then swept by decreasing distance from u, and once the
+    largest eccentricity found exceeds twice the distance of the next
+    level no farther node can improve it. Usually only a small fraction of
+    the nodes is swept.
+
+    :param start: node of the first sweep, default the highest degree
+    :return: (diameter, number of BFS sweeps run)
+    """
+    size = adjacency.shape[0]
+    if size < 2:
+        return 0, 0
+    if start is None:
+        start = int(np.argmax(np.diff(adjacency.indptr)))
+
+    def bfs(source):
+        return scipy.sparse.csgraph.shortest_path(
+            adjacency, unweighted=True, directed=False, indices=[source]
+        )[0]
+
+    a, _ = _farthest(bfs(start))
+    _, parent = scipy.sparse.csgraph.breadth_first_order(
+        adjacency, a, directed=False, return_predecessors=True
+    )
+    dist_a = bfs(a)
+    b, lower = _farthest(dist_a)
+    # middle of the a-b path found by the sweep
+    center = b
+    for _ in range(lower // 2):
+        center = parent[center]
+    dist_u = bfs(center)
+    eccentricity = int(dist_u.max())
+    lower = max(lower, eccentricity)
+    sweeps = 3
+
+    levels = dist_u.astype(np.int64)
+    by_level = np.argsort(levels, kind="stable")
+    bounds = np.searchsorted(levels[by_level], np.arange(eccentricity + 2))
+    with BFSSweeper(adjacency, processes, chunk_bytes) as sweeper:
+        for level in range(eccentricity, 0, -1):
+            if lower >= 2 * level:
+                break
+            fringe = by_level[bounds[level] : bounds[level + 1]]
+            found, _ = sweeper.run(fringe)
+            sweeps += len(fringe)
+            lower = max(lower, int(found.max()))
+            if lower > 2 * (level - 1):
+                break
+    return lower, sweeps
+
+
+def average_path_length(
+    adjacency, samples=None, confidence=0.95, rng=None, processes=1, chunk_bytes=1 << 27
+):
+    """
+    Average shortest path length of a connected undirected graph, the mean
+    over sources of each source's mean distance to the other nodes. With
+    samples below the number of nodes, only that many sources drawn without
+    replacement are swept and the normal confidence interval includes the
+    finite population correction.
+
+    :param samples: number of sources, None for all (exact)
+    :return: dict with estimate, std_error, lower, upper, samples, exact
+    """
+    size = adjacency.shape[0]
+    exact = samples is None or samples >= size
+    if size < 2:
+        sources, means = np.arange(size), np.zeros(1)
+    elif exact:
+        sources = np.arange(size)
+    elif samples < 2:
+        raise ValueError("Sampling needs at least 2 sources")
+    else:
+        sources = np.random.default_rng(rng).choice(size, samples, replace=False)
+    if size >= 2:
+        with BFSSweeper(adjacency, processes, chunk_bytes) as sweeper:
+            _, totals = sweeper.run(sources)
+        means = totals / (size - 1)
+    estimate = float(means.mean())
+    if exact:
+        std_error = 0.0
+    else:
+        k = len(sources)
+        std_error = float(means.std(ddof=1) / np.sqrt(k) * np.sqrt((size - k) / (size - 1)))
+    z = scipy.stats.norm.ppf((1 + confidence) / 2)
+    return {
+        "estimate": estimate,
+        "std_error": std_error,
+        "lower": float(estimate - z * std_error),
+        "upper": float(estimate + z * std_error),
+        "samples": len(sources),
+        "exact": exact,
+    }
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+def point_budget(n_series, max_bytes=1_000_000, bytes_per_point=24, bytes_per_series=256):
+    """
+    :return: points per series keeping a figure of n_series traces, each
+        also costing bytes_per_series, under max_bytes of payload; below 3
+        the series do not fit one trace each and must be aggregated
+    """
+    per_series = max_bytes / max(n_series, 1) - bytes_per_series
+    return max(int(per_series / bytes_per_point), 0)
+
+
+def data_window(x_range, length):
+    """
+    :return: (start, stop) slice bounds of a [x0, x1] axis range over an
+        episode axis of the given length
+    """
+    if not x_range:
+        return 0, length
+    start = max(int(np.floor(min(x_range))), 0)
+    stop = min(int(np.ceil(max(x_range))) + 1, length)
+    if stop <= start:
+        return 0, length
+    return start, stop
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection, run for all rows of y at once.
+
+    :param x: (n,) increasing coordinates
+    :param y: (rows, n) or (n,) values
+    :return: (rows, n_out) or (n_out,) sorted indices into x
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    squeeze = y.ndim == 1
+    y = np.atleast_2d(y)
+    rows, n = y.shape
+    if n_out >= n or n_out < 3:
+        idx = np.broadcast_to(np.arange(n), (rows, n))
+        return idx[0] if squeeze else idx
+
+    row_ids = np.arange(rows)
+    idx = np.empty((rows, n_out), dtype=np.int64)
+    idx[:, 0] = 0
+    idx[:, -1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    a = np.zeros(rows, dtype=np.int64)
+    for i in range(n_out - 2):
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_stop = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_stop].mean()
+        avg_y = y[:, avg_start:avg_stop].mean(axis=1)
+
+        start = int(np.floor(i * every)) + 1
+        stop = int(np.floor((i + 1) * every)) + 1
+        ax, ay = x[a], y[row_ids, a]
+        area = np.abs(
+            (ax - avg_x)[:, None] * (y[:, start:stop] - ay[:, None])
+            - (ax[:, None] - x[start:stop]) * (avg_y - ay)[:, None]
+        )
+        a = start + area.argmax(axis=1)
+        idx[:, i + 1] = a
+
+    return idx[0] if squeeze else idx
+
+
+def bucket_envelope(y, n_out, upper=True):
+    """
+    Per bucket maximum (upper) or minimum of y, placed at bucket starts.
+
+    :return: (x, values), x the bucket start indices
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    rows, n = y.shape
+    if n <= n_out:
+        return np.arange(n), y
+    bounds = np.linspace(0, n, n_out + 1).astype(np.int64)[:-1]
+    reduce = np.maximum if upper else np.minimum
+    return bounds, reduce.reduceat(y, bounds, axis=1)
@@ -0,0 +1,352 @@
+import base64
+import functools
+import io
+import threading
+
+import dash
+import networkx as nx
+import numpy as np
+from dash import ctx, dash_table, dcc, html
+from dash.dependencies import Input, Output, State
+
+from net_bootstrap import _pair_index
+from net_csr import to_edges
+from net_pajek import parse_pajek, read_edge_list
+
+MODES = ("all", "present", "missing")
+
+
+def pair_keys(u, v):
+    """
+    :return: int64 keys of the unordered pairs (u, v), hi (hi - 1) / 2 + lo,
+        the linear order of net_bootstrap._pair_index
+    """
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    lo, hi = np.minimum(u, v), np.maximum(u, v)
+    return hi * (hi - 1) // 2 + lo
+
+
+def key_pairs(keys):
+    """
+    :return: (lo, hi) node arrays of pair keys, lo < hi
+    """
+    hi, lo = _pair_index(keys)
+    return lo, hi
+
+
+def normalize(n, u, v):
+    """
+    :return: sorted unique keys of the edges among nodes 0..n-1, self-loops
+        dropped
+    """
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    keep = (u != v) & (u >= 0) & (v >= 0) & (u < n) & (v < n)
+    return np.unique(pair_keys(u[keep], v[keep]))
+
+
+def encode(n, keys):
+    """
+    :return: edge store data, the node count and the edge keys as base64
+        int64, one number per edge instead of a "u, v" string
+    """
+    raw = np.ascontiguousarray(keys, dtype="<i8").tobytes()
+    return {"n": int(n), "keys": base64.b64encode(raw).decode("ascii")}
+
+
+def decode(data):
+    """
+    :return: (n, keys) from edge store data, (0, empty) for no data
+    """
+    if not data:
+        return 0, np.zeros(0, dtype=np.int64)
+    raw = base64.b64decode(data["keys"])
+    return data["n"], np.frombuffer(raw, dtype="<i8").astype(np.int64)
+
+
+def store_graph(data):
+    """
+    :return: nx.Graph on nodes 0..n-1 with the stored edges as (lo, hi)
+    """
+    n, keys = decode(data)
+    graph = nx.empty_graph(n)
+    lo, hi = key_pairs(keys)
+    graph.add_edges_from(zip(lo.tolist(), hi.tolist()))
+    return graph
+
+
+def store_cache(maxsize=16):
+    """
+    lru_cache for the analysis of an edge store, single-flight: the
+    callbacks one store change fires run in parallel threads, and those
+    asking for the same arguments wait for the first one to compute them
+    instead of each computing them again.
+    """
+
+    def decorate(function):
+        cached = functools.lru_cache(maxsize=maxsize)(function)
+        guard = threading.Lock()
+        # arguments -> [lock, number of callers holding or waiting for it]
+        locks = {}
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            with guard:
+                entry = locks.setdefault(args, [threading.Lock(), 0])
+                entry[1] += 1
+            try:
+                with entry[0]:
+                    return cached(*args)
+            finally:
+                with guard:
+                    entry[1] -= 1
+                    if not entry[1]:
+                        del locks[args]
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+
+    return decorate
+
+
+def parse_edges(text):
+    """
+    Reads a Pajek network or an edge list / CSV. Nodes keep their numbers
+    when every label is a nonnegative integer below twice the number of
+    labels (Pajek vertices count from 1 and are shifted to 0); larger
+    numbers are ranked in numeric order and other labels numbered in
+    order of appearance.
+
+    :raises ValueError: for a Pajek *Vertices count far above the lines
+
+    :return: (n, keys)
+    """
+    lines = text.splitlines()
+    first = next((line for line in lines if line.strip()), "")
+    if first.lstrip().startswith("*"):
+        _check_vertices(lines)
+        network = parse_pajek(lines)
+        n, src, dst = network.numb_nodes, network.src, network.dst
+    else:
+        matrix, labels = read_edge_list(io.StringIO(text))
+        src, dst, _ = to_edges(matrix)
+        n = len(labels)
+        if labels and all(label.isdigit() for label in labels):
+            numbers = np.array([int(label) for label in labels], dtype=np.int64)
+            if numbers.max() < 2 * len(labels):
+                src, dst, n = numbers[src], numbers[dst], int(numbers.max()) + 1
+            else:
+                # sparse numbers like 1000000000 would make that many nodes
+                _, rank = np.unique(numbers, return_inverse=True)
+                src, dst = rank[src], rank[dst]
+    return n, normalize(n, src, dst)
+
+
+def _check_vertices(lines):
+    # a *Vertices count far above anything the file could mention would
+    # make that many nodes
+    declared, tokens = 0, 0
+    for line in lines:
+        line = line.strip()
+        if line.lower().startswith("*vertices"):
+            parts = line.split()
+            declared = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        elif line and not line.startswith(("*", "%")):
+            tokens += len(line.split())
+    if declared > 2 * tokens + 1:
+        raise ValueError(f"*Vertices {declared} is far more than the file lists")
+
+
+def parse_upload(contents):
+    """
+    :param contents: dcc.Upload contents, a base64 data URL
+    :return: (n, keys)
+    """
+    _, _, payload = contents.partition(",")
+    return parse_edges(base64.b64decode(payload).decode("utf-8", errors="replace"))
+
+
+def parse_query(text):
+    """
+    :return: () for no filter, (node,) for the pairs of one node or
+        (u, v) for a single pair, from text like "", "3" or "3, 5"
+    :raises ValueError: for anything else
+    """
+    tokens = (text or "").replace(",", " ").replace("-", " ").split()
+    if len(tokens) > 2 or not all(token.isdigit() for token in tokens):
+        raise ValueError("Search a node (3) or a pair (3, 5)")
+    return tuple(int(token) for token in tokens)
+
+
+def _missing_page(keys, start, size, total_pairs):
+    # rank select: the pair key with start pairs missing below it
+    index = start
+    while True:
+        moved = start + np.searchsorted(keys, index, side="right")
+        if moved == index:
+            break
+        index = moved
+    found = []
+    while size > 0 and index < total_pairs:
+        stop = min(index + 2 * size + 64, total_pairs)
+        candidates = np.arange(index, stop, dtype=np.int64)
+        inside = keys[np.searchsorted(keys, index) : np.searchsorted(keys, stop)]
+        candidates = candidates[~np.isin(candidates, inside)]
+        found.append(candidates[:size])
+        size -= len(found[-1])
+        index = stop
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+def list_pairs(n, keys, query=(), mode="all", start=0, size=10):
+    """
+    One page of node pairs without enumerating all n (n - 1) / 2 of them.
+
+    :param query: from parse_query
+    :param mode: one of MODES, which pairs to list
+    :return: (keys of the page, present flags, total number of matches)
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode}")
+    total_pairs = n * (n - 1) // 2
+    if query:
+        if any(node >= n for node in query):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), 0
+        if len(query) == 2:
+            candidates = normalize(n, [query[0]], [query[1]])
+        else:
+            others = np.delete(np.arange(n, dtype=np.int64), query[0])
+            candidates = pair_keys(query[0], others)
+        present = np.isin(candidates, keys)
+        if mode != "all":
+            candidates = candidates[present == (mode == "present")]
+        page = candidates[start : start + size]
+        return page, np.isin(page, keys), len(candidates)
+    if mode == "present":
+        page = keys[start : start + size]
+        return page, np.ones(len(page), dtype=bool), len(keys)
+    if mode == "missing":
+        page = _missing_page(keys, start, size, total_pairs)
+        return page, np.zeros(len(page), dtype=bool), total_pairs - len(keys)
+    page = np.arange(start, min(start + size, total_pairs), dtype=np.int64)
+    return page, np.isin(page, keys), total_pairs
+
+
+def edge_editor(page_size=10):
+    """
+    :return: list of the edge editing controls: file upload, pair search,
+        paginated pair table with a toggle button and the edge store
+    """
+    return [
+        html.P("Edges"),
+        dcc.Upload(
+            id="edge-upload",
+            children=html.Div(
+                ["Drop or ", html.A("select"), " an edge list, CSV or Pajek file"]
+            ),
+            style={"borderWidth": "1px", "borderStyle": "dashed", "padding": "5px"},
+        ),
+        html.Br(),
+        dcc.Input(
+            id="edge-search",
+            type="text",
+            placeholder="node or pair, e.g. 3 or 3, 5",
+            debounce=True,
+        ),
+        dcc.RadioItems(id="edge-mode", options=list(MODES), value="all", inline=True),
+        dash_table.DataTable(
+            id="edge-table",
+            columns=[{"name": "Pair", "id": "pair"}, {"name": "Link", "id": "status"}],
+            page_action="custom",
+            page_current=0,
+            page_size=page_size,
+            row_selectable="multi",
+            selected_rows=[],
+        ),
+        html.Button("Add / remove selected", id="edge-toggle", n_clicks=0),
+        html.P(id="edge-status"),
+        dcc.Store(id="edge-store"),
+    ]
+
+
+def register_edge_editor(app):
+    """
+    Callbacks of edge_editor. The store only changes when the node count
+    or the edge set really changes, so the analysis hanging off it is not
+    rerun otherwise. The "nodes" input follows uploaded networks; it should
+    be debounced, as lowering it drops the links of the nodes past it.
+    """
+
+    @app.callback(
+        [
+            Output("edge-store", "data"),
+            Output("nodes", "value"),
+            Output("edge-status", "children"),
+        ],
+        [
+            Input("nodes", "value"),
+            Input("edge-upload", "contents"),
+            Input("edge-toggle", "n_clicks"),
+        ],
+        [
+            State("edge-table", "selected_rows"),
+            State("edge-table", "data"),
+            State("edge-store", "data"),
+        ],
+    )
+    def update_edges(numb_nodes, contents, n_clicks, selected_rows, rows, data):
+        n, keys = decode(data)
+        ctx_id = ctx.triggered_id
+        if ctx_id == "edge-upload" and contents:
+            try:
+                new_n, new_keys = parse_upload(contents)
+            except (ValueError, UnicodeDecodeError) as error:
+                return dash.no_update, dash.no_update, f"Could not read the file: {error}"
+            return encode(new_n, new_keys), new_n, f"{len(new_keys)} links loaded"
+        if ctx_id == "edge-toggle":
+            if not selected_rows:
+                return dash.no_update, dash.no_update, "Select pairs in the table first"
+            picked = np.array([rows[i]["key"] for i in selected_rows], dtype=np.int64)
+            return encode(n, np.setxor1d(keys, picked)), dash.no_update, ""
+
+        # a cleared or partial entry must not drop the links of the nodes
+        # beyond it
+        if not isinstance(numb_nodes, int) or numb_nodes < 1:
+            return dash.no_update, dash.no_update, dash.no_update
+        if data and numb_nodes == n:
+            return dash.no_update, dash.no_update, dash.no_update
+        _, hi = key_pairs(keys)
+        return encode(numb_nodes, keys[hi < numb_nodes]), dash.no_update, ""
+
+    @app.callback(
+        [
+            Output("edge-table", "data"),
+            Output("edge-table", "page_count"),
+            Output("edge-table", "selected_rows"),
+        ],
+        [
+            Input("edge-search", "value"),
+            Input("edge-mode", "value"),
+            Input("edge-table", "page_current"),
+            Input("edge-table", "page_size"),
+            Input("edge-store", "data"),
+        ],
+    )
+    def update_edge_table(search, mode, page_current, page_size, data):
+        n, keys = decode(data)
+        try:
+            query = parse_query(search)
+        except ValueError:
+            return [], 0, []
+        page_current, page_size = page_current or 0, page_size or 10
+        page, present, total = list_pairs(
+            n, keys, query, mode or "all", page_current * page_size, page_size
+        )
+        lo, hi = key_pairs(page)
+        rows = [
+            {"key": key, "pair": f"({u}, {v})", "status": "linked" if linked else ""}
+            for key, u, v, linked in zip(
+                page.tolist(), lo.tolist(), hi.tolist(), present.tolist()
+            )
+        ]
+        return rows, max(-(-total // page_size), 1), []
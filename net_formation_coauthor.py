@@ -3,10 +3,15 @@ import dash
 from dash import dcc
 from dash import html
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
 import networkx as nx
 
 import plotly.graph_objects as go
 
+from net_edges import edge_editor, register_edge_editor, store_cache, store_graph
+from net_links import link_table, register_link_tables
+from net_metrics import instrument_from_env, phase
+
 
 def plotly_network(graph_stat, pos=None, color_mode=None):
 
@@ -68,9 +73,8 @@ def plotly_network(graph_stat, pos=None, color_mode=None):
             size=20,
             colorbar=dict(
                 thickness=15,
-                title="Node utility",
+                title=dict(text="Node utility", side="right"),
                 xanchor="left",
-                titleside="right",
             ),
             line_width=2,
         ),
@@ -171,6 +175,28 @@ def analyze_network(graph):
 pos = {}
 
 
+def node_positions(numb_nodes):
+    """
+    :return: layout of the nodes, redrawn only when their number changes
+    """
+    global pos
+    if len(pos) != numb_nodes:
+        pos = nx.spring_layout(nx.empty_graph(numb_nodes))
+    return pos
+
+
+@store_cache(maxsize=16)
+def cached_analysis(numb_nodes, keys):
+    """
+    analyze_network of an edge store (net_edges), shared by the callbacks
+    and only recomputed when the edges or parameters change.
+    """
+    with phase("graph"):
+        graph = store_graph({"n": numb_nodes, "keys": keys})
+    with phase("analysis"):
+        return analyze_network(graph)
+
+
 def description_card():
     """
     :return: A Div containing dashboard title & descriptions.
@@ -196,7 +222,7 @@ def generate_control_card():
         id="control-card",
         children=[
             html.P("Number of nodes"),
-            dcc.Input(id="nodes", type="number", min=1, step=1, value=4),
+            dcc.Input(id="nodes", type="number", min=1, step=1, value=4, debounce=True),
             html.Br(),
             html.P("Color mode"),
             dcc.RadioItems(
@@ -207,12 +233,8 @@ def generate_control_card():
             ),
             html.Br(),
             html.Br(),
-            html.P("Select edges"),
-            dcc.Dropdown(
-                id="edges-select",
-                multi=True,
-            ),
-        ],
+        ]
+        + edge_editor(),
     )
 
 
@@ -254,14 +276,14 @@ def create_net_formation_app(app):
                     html.Div(
                         children=[
                             html.H5("Active links"),
-                            html.Div(id="activelinks", children=[]),
+                            link_table("activelinks"),
                             html.Br(),
                         ]
                     ),
                     html.Div(
                         children=[
                             html.H5("Possible links"),
-                            html.P(id="newlinks", children="Possible links"),
+                            link_table("newlinks"),
                             html.Br(),
                         ]
                     ),
@@ -270,81 +292,42 @@ def create_net_formation_app(app):
         ],
     )
 
-    @app.callback(
-        Output("edges-select", "options"),
-        [
-            Input("nodes", "value"),
-        ],
-    )
-    def update_node_number(numb_nodes):
-        graph = nx.empty_graph(numb_nodes)
-        global pos
-        pos = nx.spring_layout(graph)
-
-        return [
-            {"label": f"({x[0]}, {x[1]})", "value": f"{x[0]}, {x[1]}"}
-            for x in itertools.combinations(graph.nodes, 2)
-        ]
+    register_edge_editor(app)
+    register_link_tables(app, cached_analysis)
 
     @app.callback(
         Output("network", "figure"),
         [
-            Input("nodes", "value"),
-            Input("edges-select", "value"),
+            Input("edge-store", "data"),
             Input("color", "value"),
         ],
     )
-    def update_chart(numb_nodes, edges, color):
-        graph = nx.empty_graph(numb_nodes)
-        if edges:
-            edges_list = [(int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]]
-            graph.add_edges_from(edges_list)
-        graph_stat = analyze_network(graph)
-
-        return plotly_network(
-            graph_stat,
-            pos,
-            "pair_supported" if color == "Pairwise stable" else "net_supported",
-        )
+    def update_chart(edges, color):
+        if not edges:
+            raise PreventUpdate
+        graph_stat = cached_analysis(edges["n"], edges["keys"])
+
+        with phase("figure"):
+            return plotly_network(
+                graph_stat,
+                node_positions(edges["n"]),
+                "pair_supported" if color == "Pairwise stable" else "net_supported",
+            )
 
     @app.callback(
+        Output("totalutil", "children"),
         [
-            Output("activelinks", "children"),
-            Output("newlinks", "children"),
-            Output("totalutil", "children"),
-        ],
-        [
-            Input("nodes", "value"),
-            Input("edges-select", "value"),
+            Input("edge-store", "data"),
         ],
     )
-    def update_text(numb_nodes, edges):
-        graph = nx.empty_graph(numb_nodes)
-        if edges:
-            edges_list = [(int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]]
-            graph.add_edges_from(edges_list)
-        graph_stat = analyze_network(graph)
-        active_links = html.Div(
-            [
-                html.P(
-                    f"({x[0]}, {x[1]}) -> net utility diff = {graph_stat['exist_edges'][x]['total_diff']:.2f}, node {x[0]} diff = {graph_stat['exist_edges'][x]['nodes_diff'][x[0]]:.2f}, node {x[1]} diff  = {graph_stat['exist_edges'][x]['nodes_diff'][x[1]]:.2f}"
-                )
-                for x in graph_stat["exist_edges"]
-            ]
-        )
-
-        new_links = html.Div(
-            [
-                html.P(
-                    f"({x[0]}, {x[1]}) -> net utility diff = {graph_stat['added_edges'][x]['total_diff']:.2f}, node {x[0]} diff = {graph_stat['added_edges'][x]['nodes_diff'][x[0]]:.2f}, node {x[1]} diff  = {graph_stat['added_edges'][x]['nodes_diff'][x[1]]:.2f}"
-                )
-                for x in graph_stat["added_edges"]
-            ]
-        )
+    def update_text(edges):
+        if not edges:
+            raise PreventUpdate
+        graph_stat = cached_analysis(edges["n"], edges["keys"])
 
-        total_util = f"{sum(calc_util(graph).values()):.2f}"
+        total_util = f"{sum(graph_stat['current_util'].values()):.2f}"
 
-        return active_links, new_links, total_util
+        return total_util
 
 
 # Run the server
@@ -355,5 +338,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_formation_app(app)
     app.run_server(debug=True)
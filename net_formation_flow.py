@@ -0,0 +1,313 @@
+import numbers
+
+import numpy as np
+import scipy.sparse
+from scipy.sparse.csgraph import connected_components
+
+from net_csr import to_csr
+
+WORD = 64
+
+
+def _popcount(bits):
+    # set bits per row of a packed uint64 array
+    return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+
+
+def _unpack(bits, numb_nodes):
+    # packed rows to a bool matrix, bit j of a row is column j
+    raw = np.ascontiguousarray(bits).view(np.uint8)
+    return np.unpackbits(raw, axis=-1, bitorder="little")[..., :numb_nodes].astype(bool)
+
+
+def self_bits(numb_nodes, nodes=None):
+    """
+    :return: packed rows, row k with only the bit of nodes[k] set
+        (default node k)
+    """
+    nodes = np.arange(numb_nodes) if nodes is None else np.asarray(nodes)
+    bits = np.zeros((len(nodes), max(-(-numb_nodes // WORD), 1)), dtype=np.uint64)
+    bits[np.arange(len(nodes)), nodes // WORD] = np.left_shift(
+        np.uint64(1), (nodes % WORD).astype(np.uint64)
+    )
+    return bits
+
+
+def _ranges(starts, stops):
+    # concatenated aranges starts[k]..stops[k]
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def closure(adjacency, seeds):
+    """
+    Word-parallel transitive closure: the strongly connected components
+    share one bitset, and the condensation is swept from its sinks up, a
+    component ORing the finished bitsets of its successors level by level.
+
+    :param adjacency: directed CSR adjacency, i -> j when row i has column j
+    :param seeds: packed bitsets of the nodes, one row per node, usually
+        self_bits
+    :return: packed rows, the OR of the seeds of every node each node reaches
+    """
+    numb_comps, labels = connected_components(
+        adjacency, directed=True, connection="strong"
+    )
+    bits = np.zeros((numb_comps, seeds.shape[1]), dtype=np.uint64)
+    np.bitwise_or.at(bits, labels, seeds)
+
+    coo = scipy.sparse.coo_array(adjacency)
+    src, dst = labels[coo.row], labels[coo.col]
+    # condensation edges, sorted by source
+    pairs = np.unique(src[src != dst] * numb_comps + dst[src != dst])
+    src, dst = pairs // numb_comps, pairs % numb_comps
+    src_starts = np.searchsorted(src, np.arange(numb_comps + 1))
+    by_dst = np.argsort(dst, kind="stable")
+    dst_starts = np.searchsorted(dst[by_dst], np.arange(numb_comps + 1))
+    out_degree = np.diff(src_starts)
+
+    level = np.flatnonzero(out_degree == 0)
+    while len(level):
+        before = by_dst[_ranges(dst_starts[level], dst_starts[level + 1])]
+        out_degree -= np.bincount(src[before], minlength=numb_comps)
+        ready = np.unique(src[before])
+        level = ready[out_degree[ready] == 0]
+        if not len(level):
+            break
+        # every successor of the new level is finished
+        edges = _ranges(src_starts[level], src_starts[level + 1])
+        first = np.concatenate([[0], np.cumsum(np.diff(src_starts)[level])[:-1]])
+        bits[level] |= np.bitwise_or.reduceat(bits[dst[edges]], first, axis=0)
+    return bits[labels]
+
+
+class Reachability:
+    """
+    Reachability of a directed graph as packed bitsets: bits[i] has the
+    bit of node j set when i reaches j, itself included. Toggling one link
+    only rebuilds the rows of the nodes reaching its sponsor.
+    """
+
+    def __init__(self, graph):
+        """
+        :param graph: nx.DiGraph, i -> j when i sponsors a link to j
+        """
+        matrix, self.nodes = to_csr(graph, weight=None)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.size = len(self.nodes)
+        coo = scipy.sparse.coo_array(matrix)
+        keep = coo.row != coo.col
+        self.adjacency = scipy.sparse.csr_array(
+            (np.ones(keep.sum(), dtype=np.int8), (coo.row[keep], coo.col[keep])),
+            shape=matrix.shape,
+        )
+        self.bits = closure(self.adjacency, self_bits(self.size))
+
+    def counts(self):
+        """
+        :return: number of nodes each node reaches, itself excluded
+        """
+        return _popcount(self.bits) - 1
+
+    def _has_bit(self, rows, j):
+        return (self.bits[rows, j // WORD] >> np.uint64(j % WORD)) & np.uint64(1) == 1
+
+    def reaching(self, i):
+        """
+        :return: bool mask of the nodes reaching node index i, i included
+        """
+        return self._has_bit(slice(None), i)
+
+    def has_link(self, i, j):
+        return self.adjacency[i, j] != 0
+
+    def _set_link(self, i, j, value):
+        toggle = scipy.sparse.csr_array(
+            (np.array([value], dtype=np.int8), ([i], [j])), shape=self.adjacency.shape
+        )
+        self.adjacency = self.adjacency + toggle
+        self.adjacency.eliminate_zeros()
+
+    def add(self, i, j):
+        """
+        Adds the link i -> j: whoever reaches i now also reaches what j
+        reaches.
+
+        :return: indices of the rows that may have changed
+        """
+        if i == j or self.has_link(i, j):
+            raise ValueError(f"Cannot add the link {i} -> {j}")
+        self._set_link(i, j, 1)
+        rows = np.flatnonzero(self.reaching(i))
+        self.bits[rows] |= self.bits[j]
+        return rows
+
+    def without(self, i, j):
+        """
+        Reachability once the link i -> j is removed, leaving self as it
+        is. Only the nodes reaching i can lose anything; their closure is
+        recomputed on the subgraph they span, seeded with the unchanged
+        rows of the nodes they link to outside it.
+
+        :return: (indices of the rows that may change, their new rows)
+        """
+        if not self.has_link(i, j):
+            raise ValueError(f"No link {i} -> {j}")
+        rows = np.flatnonzero(self.reaching(i))
+        # another successor of i reaching j without passing through i
+        # keeps everything as it is
+        indptr = self.adjacency.indptr
+        others = self.adjacency.indices[indptr[i] : indptr[i + 1]]
+        others = others[others != j]
+        if (self._has_bit(others, j) & ~self._has_bit(others, i)).any():
+            return rows, self.bits[rows]
+        inside = np.zeros(self.size, dtype=bool)
+        inside[rows] = True
+        sub = self.adjacency[rows]
+        start, stop = sub.indptr[np.searchsorted(rows, i) : np.searchsorted(rows, i) + 2]
+        sub.data[start + np.flatnonzero(sub.indices[start:stop] == j)] = 0
+        sub.eliminate_zeros()
+        seeds = self_bits(self.size, rows)
+        coo = scipy.sparse.coo_array(sub[:, ~inside])
+        if coo.nnz:
+            outside = np.flatnonzero(~inside)[coo.col]
+            np.bitwise_or.at(seeds, coo.row, self.bits[outside])
+        return rows, closure(sub[:, rows], seeds)
+
+    def remove(self, i, j):
+        """
+        Removes the link i -> j, see without.
+
+        :return: indices of the rows that may have changed
+        """
+        rows, bits = self.without(i, j)
+        self._set_link(i, j, -1)
+        self.bits[rows] = bits
+        return rows
+
+
+def calc_util(graph, cost, value=1):
+    """
+    One-way flow connections model (Bala and Goyal): a node gets value
+    from every node it reaches along the links and pays cost for each
+    link it sponsors.
+
+    :param graph: nx.DiGraph, or a Reachability of one
+    :return: dict {node: utility}
+    """
+    reach = graph if isinstance(graph, Reachability) else Reachability(graph)
+    util = value * reach.counts().astype(float)
+    if isinstance(cost, numbers.Number):
+        util -= cost * np.diff(reach.adjacency.indptr)
+    return dict(zip(reach.nodes, util.tolist()))
+
+
+def link_gains(reach, cost, value=1):
+    """
+    Utility changes of toggling every ordered pair at once.
+
+    Adding i -> j gives i the nodes j reaches that i does not, and the same
+    to every node reaching i. Summed over those nodes this is, with C the
+    matrix of common ancestors (C[i, y] = nodes reaching both i and y),
+    sum over y reached by j of C[i, i] - C[i, y], two matrix products of
+    the unpacked reachability. Removals are evaluated one by one with
+    Reachability.without.
+
+    :return: dict of n x n arrays: linked (i -> j exists), sponsor_diff
+        (i's utility with the link minus without) and total_diff (the
+        same for the sum of all utilities)
+    """
+    size = reach.size
+    linked = reach.adjacency.toarray() != 0
+    # counts up to n^2 stay exact in float32 below 4096 nodes
+    reached = _unpack(reach.bits, size).astype(np.float32 if size <= 4096 else float)
+    common = reached.T @ reached
+    total = ((np.diag(common)[:, None] - common) @ reached.T).astype(float)
+    sponsor = np.empty((size, size))
+    for i in range(size):
+        sponsor[i] = _popcount(reach.bits & ~reach.bits[i])
+    sponsor *= value
+    total *= value
+    counts = reach.counts()
+    for i, j in zip(*np.nonzero(linked)):
+        rows, bits = reach.without(i, j)
+        lost = counts[rows] - _popcount(bits) + 1
+        sponsor[i, j] = value * lost[rows == i].sum()
+        total[i, j] = value * lost.sum()
+    if isinstance(cost, numbers.Number):
+        sponsor -= cost
+        total -= cost
+    np.fill_diagonal(sponsor, 0.0)
+    np.fill_diagonal(total, 0.0)
+    return {"linked": linked, "sponsor_diff": sponsor, "total_diff": total}
+
+
+def analyze_network(graph, cost, value=1):
+    """
+    analyze_network of the one-way flow model, in the layout of
+    net_formation_sym's with ordered pairs (sponsor, target). A link only
+    needs its sponsor's consent, so pair_supported is the sponsor's gain
+    being nonnegative. Only the sponsor's and the target's changes are
+    kept in nodes_diff, and the stats hold no graph copies, so thousands
+    of nodes stay manageable; Reachability.add / remove give every node's
+    change for one toggle, and link_gains the same numbers as arrays.
+
+    :param graph: nx.DiGraph
+    """
+    reach = Reachability(graph)
+    current_util = calc_util(reach, cost, value)
+    gains = link_gains(reach, cost, value)
+    total_util = sum(current_util.values())
+    nodes = reach.nodes
+
+    def stat(i, j, sign):
+        # sign 1 compares with the link to without it, -1 the other way
+        sponsor_diff = float(gains["sponsor_diff"][i, j])
+        total_diff = float(gains["total_diff"][i, j])
+        # the target never gains or loses by its own incoming link
+        target_diff = 0.0
+        return {
+            "nodes_diff": {nodes[i]: sponsor_diff, nodes[j]: target_diff},
+            "total_util": total_util - sign * total_diff,
+            "total_diff": total_diff,
+            "pair_supported": sponsor_diff >= 0,
+            "net_supported": total_diff >= 0,
+        }
+
+    linked = gains["linked"]
+    missing = ~linked
+    np.fill_diagonal(missing, False)
+    exist_edges = {
+        (nodes[i], nodes[j]): stat(i, j, 1) for i, j in zip(*np.nonzero(linked))
+    }
+    added_edges = {
+        (nodes[i], nodes[j]): stat(i, j, -1) for i, j in zip(*np.nonzero(missing))
+    }
+    added_edge_net_improve = None
+    improve = np.where(missing, gains["total_diff"], -np.inf)
+    if missing.any() and improve.max() >= 0:
+        i, j = np.unravel_index(np.argmax(improve), improve.shape)
+        added_edge_net_improve = (nodes[i], nodes[j])
+
+    return {
+        "graph": graph,
+        "current_util": current_util,
+        "exist_edges": exist_edges,
+        "added_edges": added_edges,
+        "added_edge_net_improve": added_edge_net_improve,
+    }
+
+
+def stable(graph, cost, value=1):
+    """
+    :return: True when no node gains by dropping one of its links or
+        sponsoring a new one (pairwise, one link at a time)
+    """
+    gains = link_gains(Reachability(graph), cost, value)
+    missing = ~gains["linked"]
+    np.fill_diagonal(missing, False)
+    return not (
+        (gains["sponsor_diff"][gains["linked"]] < 0).any()
+        or (gains["sponsor_diff"][missing] > 0).any()
+    )
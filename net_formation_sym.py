@@ -1,13 +1,23 @@
 import itertools
+import math
 import numbers
 import dash
 from dash import dcc
 from dash import html
 from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
 import networkx as nx
+import numpy as np
+import scipy.sparse
+from scipy.sparse.csgraph import connected_components
 
 import plotly.graph_objects as go
 
+from net_csr import symmetrize, to_csr
+from net_edges import edge_editor, register_edge_editor, store_cache, store_graph
+from net_links import link_table, register_link_tables
+from net_metrics import instrument_from_env, phase
+
 
 def plotly_network(graph_stat, pos=None, color_mode=None):
 
@@ -69,9 +79,8 @@ def plotly_network(graph_stat, pos=None, color_mode=None):
             size=20,
             colorbar=dict(
                 thickness=15,
-                title="Node utility",
+                title=dict(text="Node utility", side="right"),
                 xanchor="left",
-                titleside="right",
             ),
             line_width=2,
         ),
@@ -91,7 +100,14 @@ def plotly_network(graph_stat, pos=None, color_mode=None):
     return fig
 
 
-def calc_util(graph, delta, cost):
+def calc_util(graph, delta, cost, tol=None):
+    """
+    :param tol: None for the exact utilities, otherwise those of
+        truncated_util, which ignores nodes farther than delta^d >= tol
+    :return: dict {node: utility}
+    """
+    if tol is not None:
+        return truncated_util(graph, delta, cost, tol)["util"]
     util = {x: 0 for x in graph}
     for src, dst in itertools.combinations(graph.nodes, 2):
         paths = nx.shortest_simple_paths(graph, src, dst)
@@ -109,7 +125,245 @@ def calc_util(graph, delta, cost):
     return util
 
 
-def analyze_network(graph, delta, cost):
+def horizon(delta, tol, numb_nodes):
+    """
+    :return: the largest distance d with delta^d >= tol, capped at
+        numb_nodes - 1 where the BFS reaches every node anyway
+    """
+    if tol <= 0 or delta < 0:
+        raise ValueError("The approximation needs tol > 0 and delta >= 0")
+    cap = max(numb_nodes - 1, 0)
+    if delta >= 1:
+        return cap
+    if delta == 0 or delta < tol:
+        return 0
+    depth = int(math.log(tol) / math.log(delta))
+    while depth > 0 and delta**depth < tol:
+        depth -= 1
+    while delta ** (depth + 1) >= tol and depth < cap:
+        depth += 1
+    return min(depth, cap)
+
+
+def _ball_benefit(adjacency, sources, depth, delta, batch=1024):
+    # depth-limited BFS from a batch of sources at once, one sparse product
+    # per level: rows are sources, columns the nodes seen so far
+    numb_nodes = adjacency.shape[0]
+    benefit = np.zeros(len(sources))
+    reached = np.zeros(len(sources), dtype=np.int64)
+    for begin in range(0, len(sources), batch):
+        chunk = sources[begin : begin + batch]
+        rows = np.arange(len(chunk))
+        seen = scipy.sparse.csr_array(
+            (np.ones(len(chunk)), (rows, chunk)), shape=(len(chunk), numb_nodes)
+        )
+        frontier = seen
+        for d in range(1, depth + 1):
+            step = frontier @ adjacency
+            step.data[:] = 1
+            step = step - step.multiply(seen)
+            step.eliminate_zeros()
+            if step.nnz == 0:
+                break
+            counts = np.diff(step.indptr)
+            benefit[begin : begin + len(chunk)] += counts * delta**d
+            reached[begin : begin + len(chunk)] += counts
+            seen = seen + step
+            frontier = step
+    return benefit, reached
+
+
+def truncated_util(graph, delta, cost, tol, batch=1024):
+    """
+    Utilities of the connections model counting only the nodes within
+    distance depth = horizon(delta, tol, n) of each node, so the cost per
+    node follows the size of its neighbourhood instead of n.
+
+    Every node of the same component left out is at distance depth + 1 or
+    more, so the exact utility lies in [util, util + error] with error =
+    (component size - 1 - nodes reached) * delta^(depth + 1).
+
+    :param graph: undirected nx.Graph
+    :param batch: number of BFS run together
+    :return: dict with util and error ({node: value}), depth, and the
+        arrays link_change reuses
+    """
+    matrix, nodes = to_csr(graph, weight=None)
+    adjacency = symmetrize(matrix).astype(float)
+    depth = horizon(delta, tol, len(nodes))
+    benefit, reached = _ball_benefit(
+        adjacency, np.arange(len(nodes)), depth, delta, batch
+    )
+    degree = np.diff(matrix.indptr)
+    _, component = connected_components(adjacency, directed=False)
+    component_size = np.bincount(component)
+    min_reached = np.full(len(component_size), len(nodes), dtype=np.int64)
+    np.minimum.at(min_reached, component, reached)
+    error = (component_size[component] - 1 - reached) * delta ** (depth + 1)
+    util = benefit.copy()
+    if isinstance(cost, numbers.Number):
+        util -= cost * degree
+    return {
+        "util": dict(zip(nodes, util.tolist())),
+        "error": dict(zip(nodes, error.tolist())),
+        "depth": depth,
+        "nodes": nodes,
+        "index": {node: i for i, node in enumerate(nodes)},
+        "adjacency": adjacency,
+        "benefit": benefit,
+        "reached": reached,
+        "component": component,
+        "component_size": component_size,
+        "min_reached": min_reached,
+        "bound": error,
+        "bound_order": np.argsort(-error, kind="stable"),
+        "bound_total": float(error.sum()),
+    }
+
+
+def _ball(adjacency, sources, radius):
+    # nodes within radius of the sources, touching only those
+    seen = np.unique(sources)
+    frontier = seen
+    for _ in range(radius):
+        neighbours = np.unique(adjacency[frontier].indices)
+        frontier = np.setdiff1d(neighbours, seen, assume_unique=True)
+        if not len(frontier):
+            break
+        seen = np.union1d(seen, frontier)
+    return seen
+
+
+def _split(adjacency, u, v):
+    # BFS from both ends of the removed link u - v, growing the smaller
+    # frontier: None once they meet, otherwise the side that ran out first
+    seen = [np.array([u]), np.array([v])]
+    frontier = [seen[0], seen[1]]
+    while True:
+        side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+        rows = adjacency[frontier[side]]
+        starts = np.repeat(frontier[side], np.diff(rows.indptr))
+        ends = rows.indices
+        link = ((starts == u) & (ends == v)) | ((starts == v) & (ends == u))
+        neighbours = np.unique(ends[~link])
+        if np.isin(neighbours, seen[1 - side]).any():
+            return None
+        new = np.setdiff1d(neighbours, seen[side], assume_unique=True)
+        if not len(new):
+            return seen[side]
+        seen[side] = np.union1d(seen[side], new)
+        frontier[side] = new
+
+
+def link_change(graph, edge, delta, cost, tol, base=None, batch=1024):
+    """
+    Effect of adding or removing one link under truncated_util without
+    recomputing the whole graph. Only the nodes within depth - 1 of the
+    link's ends can see it inside their horizon, so only their
+    neighbourhoods are searched again, on the subgraph within 2 depth - 1
+    of the ends. Every other node keeps its truncated utility and only
+    its error bound moves with the size of its component, which is
+    updated from base: a link between two components merges them, and a
+    removed link splits its component when a BFS from both ends runs out
+    on one side before they meet.
+
+    The work follows the size of those neighbourhoods, plus, for a
+    removal, that BFS, which may cover the whole component when the ends
+    are only joined by a long detour.
+
+    nodes_diff is the utility after the toggle minus before. The exact
+    change of node i lies within nodes_error[i] = max(error before, error
+    after) of nodes_diff[i], total_error bounds the sum.
+
+    :param edge: (u, v), added when missing, removed when present
+    :param base: truncated_util(graph, delta, cost, tol), reused over many
+        toggles of the same graph
+    :return: dict with added, nodes_diff and nodes_error of the searched
+        nodes, other_error bounding the change of all the others,
+        total_diff and total_error
+    """
+    if base is None:
+        base = truncated_util(graph, delta, cost, tol, batch)
+    adjacency, depth, index = base["adjacency"], base["depth"], base["index"]
+    u, v = index[edge[0]], index[edge[1]]
+    if u == v:
+        raise ValueError("A link needs two different nodes")
+    added = adjacency[u, v] == 0
+
+    # the ends are both sources, so the balls are the same with or
+    # without the link
+    searched = _ball(adjacency, [u, v], max(depth - 1, 0))
+    local = _ball(adjacency, [u, v], max(2 * depth - 1, 0))
+    sub = adjacency[local][:, local]
+    ends = np.searchsorted(local, [u, v])
+    toggle = scipy.sparse.csr_array(
+        ([1.0, 1.0], (ends, ends[::-1])), shape=sub.shape
+    )
+    sub = sub + toggle if added else sub - toggle
+    sub.eliminate_zeros()
+    benefit, reached = _ball_benefit(
+        sub, np.searchsorted(local, searched), depth, delta, batch
+    )
+
+    component, component_size = base["component"], base["component_size"]
+    size = component_size[component[searched]]
+    old_size = component_size[component[[u, v]]]
+    tail = delta ** (depth + 1)
+    # bound on the error after the toggle of the nodes not searched
+    other_after = 0.0
+    moved = 0
+    if added and component[u] != component[v]:
+        size = np.full(len(searched), old_size.sum())
+        low = base["min_reached"][component[[u, v]]].min()
+        other_after = (old_size.sum() - 1 - low) * tail
+        moved = 2 * old_size[0] * old_size[1]
+    elif not added:
+        side = _split(adjacency, u, v)
+        if side is not None:
+            size = np.where(
+                np.isin(searched, side), len(side), old_size[0] - len(side)
+            )
+            moved = -2 * len(side) * (old_size[0] - len(side))
+
+    error_before = base["bound"][searched]
+    error_after = (size - 1 - reached) * tail
+    total_after = base["bound_total"] + (
+        moved - (reached - base["reached"][searched]).sum()
+    ) * tail
+    # largest error before the toggle outside the searched nodes
+    top = base["bound_order"][: len(searched) + 1]
+    top = top[~np.isin(top, searched)]
+    other_before = base["bound"][top[0]] if len(top) else 0.0
+
+    diff = benefit - base["benefit"][searched]
+    if isinstance(cost, numbers.Number):
+        sign = 1 if added else -1
+        diff[np.isin(searched, [u, v])] -= sign * cost
+    nodes = base["nodes"]
+    labels = [nodes[i] for i in searched.tolist()]
+    return {
+        "added": bool(added),
+        "nodes_diff": dict(zip(labels, diff.tolist())),
+        "nodes_error": dict(
+            zip(labels, np.maximum(error_before, error_after).tolist())
+        ),
+        "other_error": float(max(other_before, other_after)),
+        "total_diff": float(diff.sum()),
+        "total_error": float(max(base["bound_total"], total_after)),
+    }
+
+
+def analyze_network(graph, delta, cost, tol=None):
+    """
+    :param tol: None for exact utilities, otherwise truncated_util's, each
+        link evaluated by link_change. Those stats hold no graph copy nor
+        nodes_util, and nodes_diff only has the nodes within reach of the
+        link, every other node changing by at most other_error;
+        nodes_error and total_error bound how far the exact changes can
+        be from the reported ones.
+    """
+    if tol is not None:
+        return _analyze_truncated(graph, delta, cost, tol)
     current_util = calc_util(graph, delta, cost)
 
     def new_edge_stat(edge):
@@ -176,6 +430,46 @@ def analyze_network(graph, delta, cost):
     }
 
 
+def _analyze_truncated(graph, delta, cost, tol):
+    current = truncated_util(graph, delta, cost, tol)
+    current_total = sum(current["util"].values())
+
+    def edge_stat(edge, sign):
+        # sign 1 for a new link (after minus before), -1 for an existing one
+        change = link_change(graph, edge, delta, cost, tol, base=current)
+        nodes_diff = {node: sign * diff for node, diff in change["nodes_diff"].items()}
+        total_diff = sign * change["total_diff"]
+        return {
+            "nodes_diff": nodes_diff,
+            "nodes_error": change["nodes_error"],
+            "other_error": change["other_error"],
+            "total_util": current_total + change["total_diff"],
+            "total_diff": total_diff,
+            "total_error": change["total_error"],
+            "pair_supported": (nodes_diff[edge[0]] >= 0) and (nodes_diff[edge[1]] >= 0),
+            "net_supported": total_diff >= 0,
+        }
+
+    remaining_edges = set(itertools.combinations(graph.nodes, 2)) - set(graph.edges)
+    added_edges = {edge: edge_stat(edge, 1) for edge in remaining_edges}
+    exist_edges = {edge: edge_stat(edge, -1) for edge in graph.edges}
+    added_edges_improve = {k: v for k, v in added_edges.items() if v["net_supported"]}
+    added_edge_net_improve = None
+    if added_edges_improve:
+        added_edge_net_improve = max(
+            added_edges_improve, key=lambda x: added_edges[x]["total_diff"]
+        )
+
+    return {
+        "graph": graph,
+        "current_util": current["util"],
+        "util_error": current["error"],
+        "exist_edges": exist_edges,
+        "added_edges": added_edges,
+        "added_edge_net_improve": added_edge_net_improve,
+    }
+
+
 def calc_max_util(numb, delta, cost):
     if cost < delta * (1 - delta):
         return (numb - 1) * numb * (delta - cost)
@@ -187,6 +481,28 @@ def calc_max_util(numb, delta, cost):
 pos = {}
 
 
+def node_positions(numb_nodes):
+    """
+    :return: layout of the nodes, redrawn only when their number changes
+    """
+    global pos
+    if len(pos) != numb_nodes:
+        pos = nx.spring_layout(nx.empty_graph(numb_nodes))
+    return pos
+
+
+@store_cache(maxsize=16)
+def cached_analysis(numb_nodes, keys, delta, cost):
+    """
+    analyze_network of an edge store (net_edges), shared by the callbacks
+    and only recomputed when the edges or parameters change.
+    """
+    with phase("graph"):
+        graph = store_graph({"n": numb_nodes, "keys": keys})
+    with phase("analysis"):
+        return analyze_network(graph, delta, cost)
+
+
 def description_card():
     """
     :return: A Div containing dashboard title & descriptions.
@@ -212,7 +528,7 @@ def generate_control_card():
         id="control-card",
         children=[
             html.P("Number of nodes"),
-            dcc.Input(id="nodes", type="number", min=1, step=1, value=4),
+            dcc.Input(id="nodes", type="number", min=1, step=1, value=4, debounce=True),
             html.Br(),
             html.P("Benefit parameter"),
             dcc.Input(id="delta", type="number", min=0, max=1, step=0.1, value=0.5),
@@ -230,12 +546,8 @@ def generate_control_card():
             ),
             html.Br(),
             html.Br(),
-            html.P("Select edges"),
-            dcc.Dropdown(
-                id="edges-select",
-                multi=True,
-            ),
-        ],
+        ]
+        + edge_editor(),
     )
 
 
@@ -277,14 +589,14 @@ def create_net_formation_app(app):
                     html.Div(
                         children=[
                             html.H5("Active links"),
-                            html.Div(id="activelinks", children=[]),
+                            link_table("activelinks"),
                             html.Br(),
                         ]
                     ),
                     html.Div(
                         children=[
                             html.H5("Possible links"),
-                            html.P(id="newlinks", children="Possible links"),
+                            link_table("newlinks"),
                             html.Br(),
                         ]
                     ),
@@ -293,88 +605,53 @@ def create_net_formation_app(app):
         ],
     )
 
-    @app.callback(
-        Output("edges-select", "options"),
-        [
-            Input("nodes", "value"),
-        ],
+    register_edge_editor(app)
+    register_link_tables(
+        app, cached_analysis, [Input("delta", "value"), Input("cost", "value")]
     )
-    def update_node_number(numb_nodes):
-        graph = nx.empty_graph(numb_nodes)
-        global pos
-        pos = nx.spring_layout(graph)
-
-        return [
-            {"label": f"({x[0]}, {x[1]})", "value": f"{x[0]}, {x[1]}"}
-            for x in itertools.combinations(graph.nodes, 2)
-        ]
 
     @app.callback(
         Output("network", "figure"),
         [
-            Input("nodes", "value"),
-            Input("edges-select", "value"),
+            Input("edge-store", "data"),
             Input("delta", "value"),
             Input("cost", "value"),
             Input("color", "value"),
         ],
     )
-    def update_chart(numb_nodes, edges, delta, cost, color):
-        graph = nx.empty_graph(numb_nodes)
-        if edges:
-            edges_list = [(int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]]
-            graph.add_edges_from(edges_list)
-        graph_stat = analyze_network(graph, delta, cost)
-
-        return plotly_network(
-            graph_stat,
-            pos,
-            "pair_supported" if color == "Pairwise stable" else "net_supported",
-        )
+    def update_chart(edges, delta, cost, color):
+        if not edges:
+            raise PreventUpdate
+        graph_stat = cached_analysis(edges["n"], edges["keys"], delta, cost)
+
+        with phase("figure"):
+            return plotly_network(
+                graph_stat,
+                node_positions(edges["n"]),
+                "pair_supported" if color == "Pairwise stable" else "net_supported",
+            )
 
     @app.callback(
         [
-            Output("activelinks", "children"),
-            Output("newlinks", "children"),
             Output("totalutil", "children"),
             Output("maxutil", "children"),
         ],
         [
-            Input("nodes", "value"),
-            Input("edges-select", "value"),
+            Input("edge-store", "data"),
             Input("delta", "value"),
             Input("cost", "value"),
         ],
     )
-    def update_text(numb_nodes, edges, delta, cost):
-        graph = nx.empty_graph(numb_nodes)
-        if edges:
-            edges_list = [(int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]]
-            graph.add_edges_from(edges_list)
-        graph_stat = analyze_network(graph, delta, cost)
-        active_links = html.Div(
-            [
-                html.P(
-                    f"({x[0]}, {x[1]}) -> net utility diff = {graph_stat['exist_edges'][x]['total_diff']:.2f}, node {x[0]} diff = {graph_stat['exist_edges'][x]['nodes_diff'][x[0]]:.2f}, node {x[1]} diff  = {graph_stat['exist_edges'][x]['nodes_diff'][x[1]]:.2f}"
-                )
-                for x in graph_stat["exist_edges"]
-            ]
-        )
-
-        new_links = html.Div(
-            [
-                html.P(
-                    f"({x[0]}, {x[1]}) -> net utility diff = {graph_stat['added_edges'][x]['total_diff']:.2f}, node {x[0]} diff = {graph_stat['added_edges'][x]['nodes_diff'][x[0]]:.2f}, node {x[1]} diff  = {graph_stat['added_edges'][x]['nodes_diff'][x[1]]:.2f}"
-                )
-                for x in graph_stat["added_edges"]
-            ]
-        )
+    def update_text(edges, delta, cost):
+        if not edges:
+            raise PreventUpdate
+        graph_stat = cached_analysis(edges["n"], edges["keys"], delta, cost)
 
-        total_util = f"{sum(calc_util(graph, delta, cost).values()):.2f}"
+        total_util = f"{sum(graph_stat['current_util'].values()):.2f}"
 
-        maxutil = f"Max utility:  {calc_max_util(numb_nodes, delta, cost):.2f}"
+        maxutil = f"Max utility:  {calc_max_util(edges['n'], delta, cost):.2f}"
 
-        return active_links, new_links, total_util, maxutil
+        return total_util, maxutil
 
 
 # Run the server
@@ -385,5 +662,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_formation_app(app)
     app.run_server(debug=True)
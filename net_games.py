@@ -7,6 +7,8 @@ from dash.dependencies import Input, Output, State
 
 import plotly.graph_objects as go
 
+from net_metrics import instrument_from_env, phase
+
 
 def plotly_network(graph):
     pos = nx.spring_layout(graph, seed=42)
@@ -128,6 +130,32 @@ def create_graph_coh():
     return create_graph(edge_list_coh)
 
 
+def update_utilities(graph, sim_type, threshold):
+    """
+    Sets util_0, util_1 and optimal on every node from its neighbors'
+    actions, for the coordination ("comp") or substitutes ("sub") game.
+    """
+    for node in graph.nodes():
+        neighbors = graph.neighbors(node)
+        numb_nghbr_1 = sum(
+            [1 for node in neighbors if graph.nodes[node]["action"] == 1]
+        )
+        if sim_type == "comp":
+            graph.nodes[node]["util_0"] = 0
+            graph.nodes[node]["util_1"] = numb_nghbr_1 - threshold + 0.5
+        elif sim_type == "sub":
+            graph.nodes[node]["util_0"] = min(numb_nghbr_1, 1)
+            graph.nodes[node]["util_1"] = 1 - 0.5
+
+        graph.nodes[node]["optimal"] = (
+            (graph.nodes[node]["action"] == 1)
+            and (graph.nodes[node]["util_1"] > graph.nodes[node]["util_0"])
+        ) or (
+            (graph.nodes[node]["action"] == 0)
+            and (graph.nodes[node]["util_1"] < graph.nodes[node]["util_0"])
+        )
+
+
 def description_card():
     """
     :return: A Div containing dashboard title & descriptions.
@@ -233,8 +261,10 @@ def create_net_games_app(app):
         ],
     )
     def update_network(data):
-        graph = nx.node_link_graph(data)
-        return plotly_network(graph)
+        with phase("graph"):
+            graph = nx.node_link_graph(data)
+        with phase("figure"):
+            return plotly_network(graph)
 
     @app.callback(
         Output("graph", "data"),
@@ -249,40 +279,24 @@ def create_net_games_app(app):
     def update_graph(sim_net, sim_type, click_data, threshold, data):
         graph = None
         ctx_id = ctx.triggered_id
-        if ctx_id == "sim-net":
-            if sim_net == "net11":
-                graph = create_graph11()
-            elif sim_net == "net6":
-                graph = create_graph6()
-            elif sim_net == "net_coh":
-                graph = create_graph_coh()
-        elif ctx_id == "network":
-            node_id = click_data["points"][0]["pointNumber"]
-            graph = nx.node_link_graph(data)
-            graph.nodes[node_id]["action"] = 1 - graph.nodes[node_id]["action"]
-        elif ctx_id in ["comp-thresh-input", "sim-type"]:
-            graph = nx.node_link_graph(data)
+        with phase("graph"):
+            if ctx_id == "sim-net":
+                if sim_net == "net11":
+                    graph = create_graph11()
+                elif sim_net == "net6":
+                    graph = create_graph6()
+                elif sim_net == "net_coh":
+                    graph = create_graph_coh()
+            elif ctx_id == "network":
+                node_id = click_data["points"][0]["pointNumber"]
+                graph = nx.node_link_graph(data)
+                graph.nodes[node_id]["action"] = 1 - graph.nodes[node_id]["action"]
+            elif ctx_id in ["comp-thresh-input", "sim-type"]:
+                graph = nx.node_link_graph(data)
 
         if graph:
-            for node in graph.nodes():
-                neighbors = graph.neighbors(node)
-                numb_nghbr_1 = sum(
-                    [1 for node in neighbors if graph.nodes[node]["action"] == 1]
-                )
-                if sim_type == "comp":
-                    graph.nodes[node]["util_0"] = 0
-                    graph.nodes[node]["util_1"] = numb_nghbr_1 - threshold + 0.5
-                elif sim_type == "sub":
-                    graph.nodes[node]["util_0"] = min(numb_nghbr_1, 1)
-                    graph.nodes[node]["util_1"] = 1 - 0.5
-
-                graph.nodes[node]["optimal"] = (
-                    (graph.nodes[node]["action"] == 1)
-                    and (graph.nodes[node]["util_1"] > graph.nodes[node]["util_0"])
-                ) or (
-                    (graph.nodes[node]["action"] == 0)
-                    and (graph.nodes[node]["util_1"] < graph.nodes[node]["util_0"])
-                )
+            with phase("analysis"):
+                update_utilities(graph, sim_type, threshold)
 
         return nx.node_link_data(graph)
 
@@ -295,5 +309,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_games_app(app)
     app.run_server(debug=True)
@@ -7,6 +7,8 @@ from dash.dependencies import Input, Output, State
 
 import plotly.graph_objects as go
 
+from net_metrics import instrument_from_env, phase
+
 
 def plotly_network(graph):
     pos = nx.spring_layout(graph, seed=42)
@@ -105,6 +107,29 @@ def create_graph_coh():
     return create_graph(edge_list_coh)
 
 
+def update_utilities(graph, threshold):
+    """
+    Sets util_0, util_1 and optimal on every node: action 1 pays 1 when
+    more than threshold of the neighbors play 1, -1 otherwise.
+    """
+    for node in graph.nodes():
+        neighbors = list(graph.neighbors(node))
+        numb_nghbr_1 = sum([1 for x in neighbors if graph.nodes[x]["action"] == 1])
+        numb_nghbr_all = sum([1 for _ in neighbors])
+        graph.nodes[node]["util_0"] = 0
+        graph.nodes[node]["util_1"] = (
+            1 if numb_nghbr_1 > threshold * numb_nghbr_all else -1
+        )
+
+        graph.nodes[node]["optimal"] = (
+            (graph.nodes[node]["action"] == 1)
+            and (graph.nodes[node]["util_1"] > graph.nodes[node]["util_0"])
+        ) or (
+            (graph.nodes[node]["action"] == 0)
+            and (graph.nodes[node]["util_1"] < graph.nodes[node]["util_0"])
+        )
+
+
 def description_card():
     """
     :return: A Div containing dashboard title & descriptions.
@@ -173,8 +198,10 @@ def create_net_games_coh_app(app):
         ],
     )
     def update_network(data):
-        graph = nx.node_link_graph(data)
-        return plotly_network(graph)
+        with phase("graph"):
+            graph = nx.node_link_graph(data)
+        with phase("figure"):
+            return plotly_network(graph)
 
     @app.callback(
         Output("graph", "data"),
@@ -186,31 +213,18 @@ def create_net_games_coh_app(app):
     )
     def update_graph(click_data, threshold, data):
         ctx_id = ctx.triggered_id
-        if ctx_id == "network":
-            node_id = click_data["points"][0]["pointNumber"]
-            graph = nx.node_link_graph(data)
-            graph.nodes[node_id]["action"] = 1 - graph.nodes[node_id]["action"]
-        elif ctx_id in ["coor-thresh"]:
-            graph = nx.node_link_graph(data)
-        else:
-            graph = create_graph_coh()
-
-        for node in graph.nodes():
-            neighbors = list(graph.neighbors(node))
-            numb_nghbr_1 = sum([1 for x in neighbors if graph.nodes[x]["action"] == 1])
-            numb_nghbr_all = sum([1 for _ in neighbors])
-            graph.nodes[node]["util_0"] = 0
-            graph.nodes[node]["util_1"] = (
-                1 if numb_nghbr_1 > threshold * numb_nghbr_all else -1
-            )
-
-            graph.nodes[node]["optimal"] = (
-                (graph.nodes[node]["action"] == 1)
-                and (graph.nodes[node]["util_1"] > graph.nodes[node]["util_0"])
-            ) or (
-                (graph.nodes[node]["action"] == 0)
-                and (graph.nodes[node]["util_1"] < graph.nodes[node]["util_0"])
-            )
+        with phase("graph"):
+            if ctx_id == "network":
+                node_id = click_data["points"][0]["pointNumber"]
+                graph = nx.node_link_graph(data)
+                graph.nodes[node_id]["action"] = 1 - graph.nodes[node_id]["action"]
+            elif ctx_id in ["coor-thresh"]:
+                graph = nx.node_link_graph(data)
+            else:
+                graph = create_graph_coh()
+
+        with phase("analysis"):
+            update_utilities(graph, threshold)
 
         return nx.node_link_data(graph)
 
@@ -223,5 +237,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_games_coh_app(app)
     app.run_server(debug=True)
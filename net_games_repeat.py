@@ -7,6 +7,9 @@ import networkx as nx
 
 import plotly.graph_objects as go
 
+from net_cooperation import utilities
+from net_metrics import instrument_from_env, phase
+
 
 def plotly_network(graph_stat, pos=None, color_mode=None):
     if color_mode not in ["pair_supported", "net_supported"]:
@@ -110,15 +113,9 @@ def calc_util(graph, delta, cost):
 
 
 def analyze_network(graph, delta, cost, value, prob):
-    benefit_1 = delta * prob * (value - cost) / (1 - delta)
-    current_util = {
-        node: degree * benefit_1 - cost * (degree > 0)
-        for node, degree in dict(nx.degree(graph)).items()
-    }
-
     return {
         "graph": graph,
-        "current_util": current_util,
+        "current_util": utilities(graph, delta, cost, value, prob),
     }
 
 
@@ -227,13 +224,18 @@ def create_net_games_repeat_app(app):
         ],
     )
     def update_chart(edges, delta, cost, value, prob):
-        graph = nx.empty_graph(7)
-        if edges:
-            edges_list = [(int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]]
-            graph.add_edges_from(edges_list)
-        graph_stat = analyze_network(graph, delta, cost, value, prob)
-
-        return plotly_network(graph_stat, pos)
+        with phase("graph"):
+            graph = nx.empty_graph(7)
+            if edges:
+                edges_list = [
+                    (int(y[0]), int(y[1])) for y in [x.split(",") for x in edges]
+                ]
+                graph.add_edges_from(edges_list)
+        with phase("analysis"):
+            graph_stat = analyze_network(graph, delta, cost, value, prob)
+
+        with phase("figure"):
+            return plotly_network(graph_stat, pos)
 
     @app.callback(
         Output("edges-select", "value"),
@@ -277,5 +279,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_games_repeat_app(app)
     app.run_server(debug=True)
@@ -0,0 +1,223 @@
+import networkx as nx
+import numpy as np
+
+from net_bootstrap import _complete
+
+
+def _check(n, m, start):
+    if m < 1 or m >= n:
+        raise ValueError(f"Growing networks need 1 <= m < n, got m = {m}, n = {n}")
+    if n <= start:
+        raise ValueError(f"n must exceed the {start} nodes of the initial graph")
+
+
+def _seed_edges(src, dst, size):
+    return (
+        np.broadcast_to(src, (size, len(src))),
+        np.broadcast_to(dst, (size, len(dst))),
+    )
+
+
+def _finish(src, dst, squeeze):
+    src, dst = np.ascontiguousarray(src), np.ascontiguousarray(dst)
+    return (src[0], dst[0]) if squeeze else (src, dst)
+
+
+def uniform_attachment(n, m, size=None, rng=None):
+    """
+    Growing random network with uniform attachment (the notebook's
+    grn_uniform): a complete graph on m nodes, then node s links to m
+    distinct nodes drawn uniformly from 0..s-1.
+
+    The m-subsets of all steps and replicates are drawn at once with
+    Floyd's algorithm, m vectorized passes in total.
+
+    :param size: number of replicates, None for a single network
+    :return: (src, dst) arrays, src the newborn node; shape (edges,) or
+        (size, edges). Nodes are numbered by birth time.
+    """
+    _check(n, m, m)
+    rng = np.random.default_rng(rng)
+    squeeze = size is None
+    size = 1 if squeeze else size
+    seed_dst, seed_src = _complete(m)
+
+    born = np.arange(m, n, dtype=np.int64)
+    chosen = np.empty((size, len(born), m), dtype=np.int64)
+    for k in range(m):
+        top = born - m + k
+        draw = np.floor(rng.random((size, len(born))) * (top + 1)).astype(np.int64)
+        taken = (chosen[:, :, :k] == draw[:, :, None]).any(axis=2)
+        chosen[:, :, k] = np.where(taken, top, draw)
+
+    seed_src, seed_dst = _seed_edges(seed_src, seed_dst, size)
+    src = np.concatenate([seed_src, np.broadcast_to(np.repeat(born, m), (size, len(born) * m))], axis=1)
+    dst = np.concatenate([seed_dst, chosen.reshape(size, -1)], axis=1)
+    return _finish(src, dst, squeeze)
+
+
+def hybrid_attachment(n, m, alpha, size=None, rng=None, max_rounds=1000):
+    """
+    Hybrid growing network behind hybrid_ddf: starting from a star on m + 1
+    nodes, node s forms m distinct links, each one with probability alpha
+    to a uniformly drawn existing node and otherwise preferentially, to a
+    node drawn with probability proportional to its degree. alpha = 0 is
+    nx.barabasi_albert_graph.
+
+    Preferential draws are uniform positions in the repeated-nodes list
+    (every node listed once per link end). The list is never built: a
+    position written by an earlier link points back to that link, so the
+    candidate draws of all steps are made at once and resolved against the
+    current targets. Each step keeps its first m distinct candidates, like
+    the rejection loop of networkx, and blocks of steps are iterated to a
+    fixed point in time order; steps short of distinct candidates get more
+    draws.
+
+    :param size: number of replicates, None for a single network
+    :return: (src, dst) arrays, src the newborn node; shape (edges,) or
+        (size, edges). Nodes are numbered by birth time.
+    """
+    _check(n, m, m + 1)
+    if not 0 <= alpha <= 1:
+        raise ValueError("Invalid alpha")
+    rng = np.random.default_rng(rng)
+    squeeze = size is None
+    size = 1 if squeeze else size
+
+    # star: center 0 linked to 1..m; its repeated-nodes list
+    seed_src = np.zeros(m, dtype=np.int64)
+    seed_dst = np.arange(1, m + 1, dtype=np.int64)
+    seed_list = np.concatenate([seed_src, seed_dst])
+    base = len(seed_list)
+    first = m + 1
+    steps = n - first
+    slots = steps * m
+    source = first + np.arange(slots) // m
+
+    def draw(row):
+        # one candidate target for each (replicate, step) row: a node id, or
+        # -(slot + 1) when the position holds the target of an earlier slot
+        replicate, step = np.divmod(row, steps)
+        born = first + step
+        uniform = rng.random(len(row)) < alpha
+        node = np.floor(rng.random(len(row)) * born).astype(np.int64)
+        position = np.floor(rng.random(len(row)) * (base + 2 * step * m)).astype(np.int64)
+        offset = position - base
+        # new entries come in (source, target) pairs, one pair per slot
+        slot = replicate * slots + np.maximum(offset, 0) // 2
+        ref = np.where(
+            offset < 0,
+            seed_list[np.minimum(position, base - 1)],
+            np.where(offset % 2 == 0, source[slot % slots], -slot - 1),
+        )
+        return np.where(uniform, node, ref)
+
+    target = np.zeros(size * slots, dtype=np.int64)
+    start = 0
+    while start < steps:
+        # blocks of steps growing with time keep the share of draws landing
+        # inside the block (the part still being settled) small
+        stop = min(steps, start + max(1, (first + start) // 8))
+        row = (np.arange(size)[:, None] * steps + np.arange(start, stop)).ravel()
+        block = (
+            ((row // steps) * slots + (row % steps) * m)[:, None] + np.arange(m)
+        ).ravel()
+        local = np.repeat(np.arange(len(row)), m + 2)
+        cand_ref = draw(row[local])
+        for _ in range(max_rounds):
+            value = cand_ref.copy()
+            pointer = value < 0
+            value[pointer] = target[-value[pointer] - 1]
+            # the targets of a step are its first m distinct candidates, as
+            # in the rejection loop of networkx
+            order = np.argsort(local * n + value, kind="stable")
+            fresh = np.ones(len(value), dtype=bool)
+            fresh[order[1:]] = (local[order[1:]] != local[order[:-1]]) | (
+                value[order[1:]] != value[order[:-1]]
+            )
+            distinct = np.bincount(local[fresh], minlength=len(row))
+            short = np.flatnonzero(distinct < m)
+            if len(short):
+                more = np.repeat(short, m)
+                local = np.concatenate([local, more])
+                cand_ref = np.concatenate([cand_ref, draw(row[more])])
+                order = np.argsort(local, kind="stable")
+                local, cand_ref = local[order], cand_ref[order]
+                continue
+            starts = np.concatenate([[0], np.cumsum(distinct)[:-1]])
+            rank = np.arange(fresh.sum()) - np.repeat(starts, distinct)
+            updated = value[fresh][rank < m]
+            if np.array_equal(updated, target[block]):
+                break
+            # earlier steps settle first, so this reaches a fixed point
+            target[block] = updated
+        else:
+            raise RuntimeError("Could not draw distinct targets")
+        start = stop
+
+    seed_src, seed_dst = _seed_edges(seed_src, seed_dst, size)
+    src = np.concatenate([seed_src, np.broadcast_to(source, (size, slots))], axis=1)
+    dst = np.concatenate([seed_dst, target.reshape(size, slots)], axis=1)
+    return _finish(src, dst, squeeze)
+
+
+def preferential_attachment(n, m, size=None, rng=None):
+    """
+    Barabasi-Albert network, same model as nx.barabasi_albert_graph.
+    """
+    return hybrid_attachment(n, m, 0.0, size, rng)
+
+
+def generate(model, n, m, alpha=None, size=None, rng=None):
+    """
+    :param model: "uniform", "preferential" or "hybrid" (needs alpha)
+    """
+    if model == "uniform":
+        return uniform_attachment(n, m, size, rng)
+    if model == "preferential":
+        return preferential_attachment(n, m, size, rng)
+    if model == "hybrid":
+        return hybrid_attachment(n, m, alpha, size, rng)
+    raise ValueError(f"Unknown model {model}")
+
+
+def degrees(n, src, dst):
+    """
+    :return: degree of every node from edge arrays, (n,) or (size, n) for
+        replicated (size, edges) arrays; index = birth time
+    """
+    squeeze = np.ndim(src) == 1
+    src, dst = np.atleast_2d(src), np.atleast_2d(dst)
+    offset = (np.arange(len(src)) * n)[:, None]
+    count = np.bincount((src + offset).ravel(), minlength=len(src) * n)
+    count += np.bincount((dst + offset).ravel(), minlength=len(src) * n)
+    count = count.reshape(len(src), n)
+    return count[0] if squeeze else count
+
+
+def degree_by_birth(model, n, m, alpha=None, replicates=1000, rng=None, batch=100):
+    """
+    Degree of every node by birth time over many replicates, generated in
+    batches to bound memory.
+
+    :param model: "uniform", "preferential" or "hybrid" (needs alpha)
+    :return: (replicates, n) int array; e.g. np.median(..., axis=0) is the
+        notebook's median degree by birth time plot
+    """
+    rng = np.random.default_rng(rng)
+    result = np.empty((replicates, n), dtype=np.int64)
+    for start in range(0, replicates, batch):
+        size = min(batch, replicates - start)
+        src, dst = generate(model, n, m, alpha, size, rng)
+        result[start : start + size] = degrees(n, src, dst)
+    return result
+
+
+def grn_uniform(n, m, rng=None):
+    """
+    Drop-in for the notebook helper, as a networkx graph.
+    """
+    src, dst = uniform_attachment(n, m, rng=rng)
+    graph = nx.empty_graph(n)
+    graph.add_edges_from(zip(src.tolist(), dst.tolist()))
+    return graph
@@ -0,0 +1,136 @@
+import json
+import os
+from collections.abc import Sequence
+
+import numpy as np
+
+ACTIONS = ("A", "B")
+
+
+class CodedView(Sequence):
+    """
+    Read-only sequence view decoding small integer codes into labels, so
+    an int8 column reads like the list of "A"/"B" strings it replaces.
+    """
+
+    def __init__(self, codes, labels=ACTIONS):
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CodedView(self.codes[index], self.labels)
+        return self.labels[self.codes[index]]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.codes, dtype=dtype)
+
+    def __repr__(self):
+        return f"CodedView({list(self[:10])}{'...' if len(self) > 10 else ''})"
+
+
+class BanditHistory:
+    """
+    Compact (nodes, episodes) store of a learning run: actions (0 = "A",
+    1 = "B") and outcomes as int8, probs as float32.
+
+    With a path the arrays are memory-mapped .npy files in that directory,
+    so runs larger than memory live on disk and can be re-opened and sliced
+    without loading them whole. Episodes are buffered in chunks so the disk
+    sees contiguous row segments instead of one strided column per episode.
+    """
+
+    files = {"actions": np.int8, "outcomes": np.int8, "probs": np.float32}
+
+    def __init__(self, numb_nodes, episodes, path=None, chunk=1024):
+        self.shape = (numb_nodes, episodes)
+        self.path = path
+        self.done = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._arrays = {
+                name: np.lib.format.open_memmap(
+                    os.path.join(path, f"{name}.npy"), "w+", dtype, self.shape
+                )
+                for name, dtype in self.files.items()
+            }
+            self._write_meta()
+        else:
+            self._arrays = {
+                name: np.empty(self.shape, dtype) for name, dtype in self.files.items()
+            }
+        chunk = max(min(chunk, episodes), 1)
+        self._buffers = {
+            name: np.empty((numb_nodes, chunk), dtype) for name, dtype in self.files.items()
+        }
+        self._filled = 0
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        history = cls.__new__(cls)
+        history.path = path
+        history._arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in cls.files
+        }
+        history.shape = history._arrays["probs"].shape
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as file:
+            history.done = json.load(file)["done"]
+        history._buffers = None
+        history._filled = 0
+        return history
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump({"shape": list(self.shape), "done": self.done}, file)
+
+    def record(self, actions, outcomes, probs):
+        column = self._filled
+        self._buffers["actions"][:, column] = actions
+        self._buffers["outcomes"][:, column] = outcomes
+        self._buffers["probs"][:, column] = probs
+        self._filled += 1
+        if self._filled == self._buffers["probs"].shape[1]:
+            self.flush()
+
+    def flush(self):
+        if self._filled:
+            stop = self.done + self._filled
+            for name, array in self._arrays.items():
+                array[:, self.done : stop] = self._buffers[name][:, : self._filled]
+            self.done = stop
+            self._filled = 0
+        if self.path and self._buffers is not None:
+            for array in self._arrays.values():
+                array.flush()
+            self._write_meta()
+
+    @property
+    def actions(self):
+        return self._arrays["actions"][:, : self.done]
+
+    @property
+    def outcomes(self):
+        return self._arrays["outcomes"][:, : self.done]
+
+    @property
+    def probs(self):
+        return self._arrays["probs"][:, : self.done]
+
+    def node(self, index):
+        """
+        :return: dict of per node views in the layout train_bandit used to
+            keep as lists on graph nodes
+        """
+        return {
+            "actions": CodedView(self.actions[index]),
+            "outcomes": self.outcomes[index],
+            "probs": self.probs[index],
+        }
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
@@ -0,0 +1,133 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    Handle passed to a background function. The function reports progress
+    through checkpoint(), which also raises JobCancelled once the job has
+    been cancelled, so long loops stop at the next checkpoint.
+    """
+
+    def __init__(self, job_id, key=None):
+        self.id = job_id
+        self.key = key
+        self.state = "queued"
+        self.progress = 0.0
+        self.data = None
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def checkpoint(self, progress, data=None):
+        if self.cancelled:
+            raise JobCancelled(self.id)
+        with self._lock:
+            self.progress = progress
+            if data is not None:
+                self.data = data
+
+    def status(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "state": self.state,
+                "progress": self.progress,
+                "data": self.data,
+                "result": self.result,
+                "error": self.error,
+                "started": self.started,
+                "finished": self.finished,
+            }
+
+
+class JobQueue:
+    """
+    Local queue running heavy work (simulations, analyses) on background
+    threads so Dash callbacks only submit and poll.
+
+    Jobs submitted with the same key supersede each other: the older job is
+    cancelled, which is how parameter changes abort stale runs.
+    """
+
+    def __init__(self, max_workers=1, keep=32):
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="net-job")
+        self._jobs = {}
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._keep = keep
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, key=None, **kwargs):
+        with self._lock:
+            job = Job(f"job-{next(self._ids)}", key)
+            if key is not None:
+                previous = self._by_key.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._by_key[key] = job
+            self._jobs[job.id] = job
+            self._forget_finished()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.started = time.time()
+        state, result, error = "done", None, None
+        if job.cancelled:
+            state = "cancelled"
+        else:
+            job.state = "running"
+            try:
+                result = fn(job, *args, **kwargs)
+            except JobCancelled:
+                state = "cancelled"
+            except Exception as exc:  # reported to the caller through status()
+                state, error = "failed", repr(exc)
+        with job._lock:
+            job.state, job.result, job.error = state, result, error
+            if state == "done":
+                job.progress = 1.0
+            job.finished = time.time()
+
+    def _forget_finished(self):
+        finished = [
+            x for x in self._jobs.values() if x.finished and self._by_key.get(x.key) is not x
+        ]
+        for job in finished[: max(len(self._jobs) - self._keep, 0)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return job.status()
+
+    def cancel(self, job_id=None, key=None):
+        job = self.get(job_id) if job_id is not None else self._by_key.get(key)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._pool.shutdown(wait=False)
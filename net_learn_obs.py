@@ -1,13 +1,28 @@
+import os
 import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse
 import networkx as nx
 import dash
 from dash import html
 from dash import dcc
+from dash import ctx
 from dash.dependencies import Input, Output, State
 
 import plotly.graph_objects as go
+from plotly.colors import DEFAULT_PLOTLY_COLORS
+
+from net_downsample import bucket_envelope, data_window, lttb_indices, point_budget
+from net_history import ACTIONS, BanditHistory
+from net_jobs import JobQueue
+from net_metrics import instrument_from_env, phase
+from net_streaming import StreamSummary
 
 graph = None
+jobs = JobQueue()
 
 
 def bg98_bandit(action, prob):
@@ -20,49 +35,196 @@ def bg98_bandit(action, prob):
     raise ValueError("Unknown action")
 
 
-def train_bandit(prob, graph, node_params, episodes=1000):
+def _node_param_arrays(node_params):
+    beliefs = np.array([float(x["1"]) for x in node_params])
+    greedy = np.array([float(x["2"]) for x in node_params])
+    return beliefs, greedy
+
+
+def _observation_matrix(graph, numb_nodes):
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=range(numb_nodes))
+    return (adjacency + scipy.sparse.identity(numb_nodes)).tocsr()
+
+
+def simulate_bandit(
+    prob,
+    observe,
+    beliefs,
+    greedy,
+    episodes=1000,
+    rng=None,
+    checkpoint=None,
+    checkpoint_every=100,
+    history=None,
+):
+    """
+    Array version of the observational learning dynamics behind
+    train_bandit: every node plays, then averages its own outcome and the
+    outcomes of its neighbors per action.
+
+    :param observe: sparse matrix, row i marks whose outcomes node i sees
+        (adjacency plus identity)
+    :param rng: numpy Generator, SeedSequence or seed
+    :param checkpoint: optional callable(done, history) invoked every
+        checkpoint_every episodes with the history recorded so far
+    :param history: BanditHistory to record into, or a directory for a
+        memory-mapped one; in memory when omitted
+    :return: dict with actions (1 = "B"), outcomes and probs as
+        (nodes, episodes) arrays, the BanditHistory holding them and the
+        final tries and rewards
+    """
+    if prob > 1 or prob < 0:
+        raise ValueError("Invalid probability")
+    rng = np.random.default_rng(rng)
+    numb_nodes = len(beliefs)
+
+    tries = np.zeros((numb_nodes, 2))
+    totals = np.zeros((numb_nodes, 2))
+    initial = np.column_stack([np.ones(numb_nodes), 2 * beliefs])
+    reward = initial.copy()
+
+    if not isinstance(history, BanditHistory):
+        history = BanditHistory(numb_nodes, episodes, path=history)
+
+    for t in range(episodes):
+        explore = rng.random(numb_nodes) < greedy
+        random_action = rng.integers(0, 2, numb_nodes)
+        success = rng.random(numb_nodes) < prob
+        # ties go to "A", as max() over the reward dict did
+        action = np.where(explore, random_action, reward[:, 1] > reward[:, 0])
+        outcome = np.where(action == 1, 2 * success, 1)
+
+        is_b = action.astype(float)
+        tries[:, 1] += observe @ is_b
+        tries[:, 0] += observe @ (1 - is_b)
+        totals[:, 1] += observe @ (is_b * outcome)
+        totals[:, 0] += observe @ ((1 - is_b) * outcome)
+        np.divide(totals, tries, out=reward, where=tries > 0)
+
+        history.record(action, outcome, reward[:, 1] / 2)
+
+        if checkpoint and ((t + 1) % checkpoint_every == 0 or t + 1 == episodes):
+            history.flush()
+            checkpoint(
+                t + 1,
+                {
+                    "actions": history.actions,
+                    "outcomes": history.outcomes,
+                    "probs": history.probs,
+                },
+            )
+
+    history.flush()
+    return {
+        "actions": history.actions,
+        "outcomes": history.outcomes,
+        "probs": history.probs,
+        "history": history,
+        "tries": tries,
+        "reward": reward,
+    }
+
+
+def train_bandit(
+    prob, graph, node_params, episodes=1000, rng=None, checkpoint=None, store=None
+):
     numb_nodes = len(node_params)
+    beliefs, greedy = _node_param_arrays(node_params)
+    history = simulate_bandit(
+        prob,
+        _observation_matrix(graph, numb_nodes),
+        beliefs,
+        greedy,
+        episodes=episodes,
+        rng=rng,
+        checkpoint=checkpoint,
+        history=store,
+    )
+
     for i in range(numb_nodes):
-        graph.nodes[i]["reward"] = {"A": 1, "B": 2 * node_params[i]["1"]}
-        graph.nodes[i]["tries"] = {"A": 0, "B": 0}
-        graph.nodes[i]["outcomes"] = []
-        graph.nodes[i]["actions"] = []
-        graph.nodes[i]["probs"] = []
-
-    for _ in range(episodes):
-        for i in range(numb_nodes):
-            response_type = random.random()
-            if response_type < node_params[i]["2"]:
-                action = random.choice(["A", "B"])
-            else:
-                reward = graph.nodes[i]["reward"]
-                action = max(reward, key=reward.get)
-
-            graph.nodes[i]["actions"].append(action)
-            graph.nodes[i]["outcomes"].append(bg98_bandit(action, prob))
-
-        for i in graph.nodes:
-            action = graph.nodes[i]["actions"][-1]
-            graph.nodes[i]["tries"][action] = graph.nodes[i]["tries"][action] + 1
-            graph.nodes[i]["reward"][action] = (
-                graph.nodes[i]["reward"][action]
-                + (graph.nodes[i]["outcomes"][-1] - graph.nodes[i]["reward"][action])
-                / graph.nodes[i]["tries"][action]
-            )
+        graph.nodes[i]["reward"] = dict(zip(ACTIONS, history["reward"][i].tolist()))
+        graph.nodes[i]["tries"] = dict(
+            zip(ACTIONS, history["tries"][i].astype(int).tolist())
+        )
+        # actions, outcomes and probs are views into the compact history
+        graph.nodes[i].update(history["history"].node(i))
 
-            for j in graph.neighbors(i):
-                action = graph.nodes[j]["actions"][-1]
-                graph.nodes[i]["tries"][action] = graph.nodes[i]["tries"][action] + 1
-                graph.nodes[i]["reward"][action] = (
-                    graph.nodes[i]["reward"][action]
-                    + (
-                        graph.nodes[j]["outcomes"][-1]
-                        - graph.nodes[i]["reward"][action]
-                    )
-                    / graph.nodes[i]["tries"][action]
-                )
+    return history
+
+
+def _bandit_probs(args):
+    return simulate_bandit(*args)["probs"]
+
+
+def replicate_bandit(
+    prob,
+    graph,
+    node_params,
+    runs=100,
+    episodes=1000,
+    seed=None,
+    processes=None,
+    quantiles=(0.05, 0.5, 0.95),
+    checkpoint=None,
+):
+    """
+    Runs independent realizations of the learning dynamics and aggregates
+    per node mean and quantile bands of probs as the runs complete.
+
+    Every run gets its own stream spawned from SeedSequence(seed), and runs
+    are folded into the summary in run order, so the result depends only on
+    the master seed, not on the number of processes.
+
+    :param checkpoint: optional callable(done, summary) invoked after every
+        folded run with the summary so far
+    :return: dict with seed (master entropy), runs, episodes, mean, std and
+        quantiles ({p: (nodes, episodes) array})
+    """
+    numb_nodes = len(node_params)
+    beliefs, greedy = _node_param_arrays(node_params)
+    observe = _observation_matrix(graph, numb_nodes)
+    seed_seq = np.random.SeedSequence(seed)
+    tasks = (
+        (prob, observe, beliefs, greedy, episodes, child)
+        for child in seed_seq.spawn(runs)
+    )
+    summary = StreamSummary((numb_nodes, episodes), quantiles)
+
+    def fold(probs):
+        summary.update(probs)
+        if checkpoint:
+            checkpoint(
+                summary.count,
+                {"seed": seed_seq.entropy, "runs": runs, "episodes": episodes, **summary.result()},
+            )
 
-            graph.nodes[i]["probs"].append(graph.nodes[i]["reward"]["B"] / 2)
+    if processes == 1:
+        for task in tasks:
+            fold(_bandit_probs(task))
+    else:
+        window_size = 2 * (processes or os.cpu_count() or 1)
+        with ProcessPoolExecutor(processes) as pool:
+            # keep a bounded window of runs in flight, consumed in run order
+            window = deque()
+            try:
+                for task in tasks:
+                    window.append(pool.submit(_bandit_probs, task))
+                    if len(window) >= window_size:
+                        fold(window.popleft().result())
+                while window:
+                    fold(window.popleft().result())
+            except BaseException:
+                # a checkpoint raising (JobCancelled) only waits for the
+                # runs already executing, not the whole queued window
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    return {
+        "seed": seed_seq.entropy,
+        "runs": runs,
+        "episodes": episodes,
+        **summary.result(),
+    }
 
 
 def plotly_network(graph):
@@ -128,27 +290,175 @@ def plotly_network(graph):
     return fig
 
 
-def plotly_results(graph):
+def _results_layout(x_range):
+    return go.Layout(
+        margin=dict(b=10, l=10, r=10, t=10),
+        xaxis=dict(range=list(x_range)) if x_range else dict(),
+        uirevision="results",
+    )
+
+
+def plotly_results(graph, x_range=None, max_bytes=1_000_000):
+    probs = np.array([graph.nodes[node]["probs"] for node in graph.nodes()])
+    return plotly_probs(probs, x_range, max_bytes)
+
+
+def plotly_probs(probs, x_range=None, max_bytes=1_000_000):
+    """
+    Learning curves downsampled (LTTB) to a point budget that keeps the
+    figure payload under max_bytes; x_range re-fetches a zoomed window at
+    full budget. Too many nodes for a line each are drawn as one band
+    from the lowest to the highest node around their mean.
+    """
+    probs = np.atleast_2d(probs)
+    budget = point_budget(len(probs), max_bytes)
+    if budget < 3:
+        summary = {
+            "episodes": probs.shape[1],
+            "mean": probs.mean(axis=0, keepdims=True),
+            "quantiles": {
+                0: probs.min(axis=0, keepdims=True),
+                1: probs.max(axis=0, keepdims=True),
+            },
+        }
+        return plotly_result_bands(summary, x_range, max_bytes, names=["all nodes"])
+    start, stop = data_window(x_range, probs.shape[1])
+    episodes = np.arange(start, stop)
+    window = probs[:, start:stop]
+    idx = lttb_indices(episodes, window, budget)
+
     data = [
         go.Scatter(
             name=node,
-            x=list(range(1000)),
-            y=graph.nodes[node]["probs"],
+            x=episodes[idx[node]],
+            y=window[node, idx[node]],
             mode="lines",
         )
-        for node in graph.nodes()
+        for node in range(len(window))
     ]
 
     fig = go.Figure(
         data=data,
+        layout=_results_layout(x_range),
+    )
+
+    return fig
+
+
+def plotly_empty_results(episodes):
+    return go.Figure(
+        data=go.Scatter(x=[0, episodes], y=[0, 0], mode="lines"),
         layout=go.Layout(
             margin=dict(b=10, l=10, r=10, t=10),
         ),
     )
 
+
+def plotly_result_bands(summary, x_range=None, max_bytes=1_000_000, names=None):
+    """
+    Mean line and outer quantile band of every node, downsampled like
+    plotly_probs; too many nodes share one band over all of them.
+
+    :param names: trace names, default the node numbers
+    """
+    low, high = min(summary["quantiles"]), max(summary["quantiles"])
+    # a band costs two traces' worth of points, the mean line one
+    budget = point_budget(3 * len(summary["mean"]), max_bytes)
+    if budget < 3:
+        summary = {
+            "episodes": summary["episodes"],
+            "mean": summary["mean"].mean(axis=0, keepdims=True),
+            "quantiles": {
+                0: summary["quantiles"][low].min(axis=0, keepdims=True),
+                1: summary["quantiles"][high].max(axis=0, keepdims=True),
+            },
+        }
+        return plotly_result_bands(summary, x_range, max_bytes, names=["all nodes"])
+    names = range(len(summary["mean"])) if names is None else names
+    start, stop = data_window(x_range, summary["episodes"])
+    episodes = np.arange(start, stop)
+    mean = summary["mean"][:, start:stop]
+    idx = lttb_indices(episodes, mean, budget)
+    band_x, upper = bucket_envelope(summary["quantiles"][high][:, start:stop], budget)
+    _, lower = bucket_envelope(summary["quantiles"][low][:, start:stop], budget, upper=False)
+    band_x = np.concatenate([band_x, band_x[::-1]]) + start
+
+    data = []
+    for node in range(len(mean)):
+        color = DEFAULT_PLOTLY_COLORS[node % len(DEFAULT_PLOTLY_COLORS)]
+        data += [
+            go.Scatter(
+                x=band_x,
+                y=np.concatenate([upper[node], lower[node][::-1]]),
+                fill="toself",
+                fillcolor=color.replace("rgb", "rgba").replace(")", ", 0.2)"),
+                line=dict(width=0),
+                hoverinfo="skip",
+                showlegend=False,
+                legendgroup=str(node),
+            ),
+            go.Scatter(
+                name=names[node],
+                x=episodes[idx[node]],
+                y=mean[node, idx[node]],
+                mode="lines",
+                line=dict(color=color),
+                legendgroup=str(node),
+            ),
+        ]
+
+    fig = go.Figure(
+        data=data,
+        layout=_results_layout(x_range),
+    )
+
     return fig
 
 
+def relayout_x_range(relayout):
+    """
+    :return: [x0, x1] from a dcc.Graph relayoutData zoom event, None when
+        the axis was reset
+    """
+    if not relayout or relayout.get("xaxis.autorange"):
+        return None
+    if "xaxis.range" in relayout:
+        return relayout["xaxis.range"]
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        return [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]]
+    return None
+
+
+def _train_job(job, prob, graph, node_params, episodes, seed):
+    history = train_bandit(
+        prob,
+        graph,
+        node_params,
+        episodes=episodes,
+        rng=seed,
+        checkpoint=lambda done, x: job.checkpoint(done / episodes, {"probs": x["probs"]}),
+    )
+    return {"probs": history["probs"]}
+
+
+def _replicate_job(job, prob, graph, node_params, runs, episodes, seed):
+    return replicate_bandit(
+        prob,
+        graph,
+        node_params,
+        runs=runs,
+        episodes=episodes,
+        seed=seed,
+        checkpoint=lambda done, summary: job.checkpoint(done / runs, summary),
+    )
+
+
+def plotly_job_results(data, x_range=None):
+    if "quantiles" in data:
+        return plotly_result_bands(data, x_range)
+    return plotly_probs(data["probs"], x_range)
+
+
 def description_card():
     """
     :return: A Div containing dashboard title & descriptions.
@@ -205,7 +515,19 @@ def generate_control_card():
                 ],
             ),
             html.Br(),
+            html.P("Episodes"),
+            dcc.Input(id="episodes", type="number", min=1, step=1, value=1000),
+            html.Br(),
+            html.P("Replications"),
+            dcc.Input(id="runs", type="number", min=1, step=1, value=1),
+            html.Br(),
+            html.P("Random seed"),
+            dcc.Input(id="seed", type="number", min=0, step=1),
+            html.Br(),
             html.Button("Run simulation", id="button-run", n_clicks=0),
+            html.P(id="job-status"),
+            dcc.Store(id="job-id"),
+            dcc.Interval(id="job-poll", interval=500, disabled=True),
         ],
     )
 
@@ -258,32 +580,96 @@ def create_net_learn_app(app):
     )
     def update_graph_chart(numb_nodes, prob_edge):
         global graph
-        graph = nx.gnp_random_graph(numb_nodes, prob_edge)
-        return plotly_network(graph)
+        with phase("graph"):
+            graph = nx.gnp_random_graph(numb_nodes, prob_edge)
+        with phase("figure"):
+            return plotly_network(graph)
 
     @app.callback(
-        # Output("network", "figure"),
-        Output("results", "figure"),
+        [
+            Output("results", "figure"),
+            Output("job-id", "data"),
+            Output("job-poll", "disabled"),
+            Output("job-status", "children"),
+        ],
         [
             Input("button-run", "n_clicks"),
+            Input("job-poll", "n_intervals"),
+            Input("prob", "value"),
+            Input("nodes_param", "data"),
+            Input("runs", "value"),
+            Input("seed", "value"),
+            Input("episodes", "value"),
+            Input("nodes", "value"),
+            Input("prob_edge", "value"),
+            Input("results", "relayoutData"),
         ],
         [
-            State("prob", "value"),
-            State("nodes_param", "data"),
-            State("results", "figure"),
+            State("job-id", "data"),
         ],
     )
-    def update_result_chart(n_clicks, prob, node_params, figure):
-        if n_clicks > 0:
-            train_bandit(prob, graph, node_params, episodes=1000)
-            return plotly_results(graph)
-
-        return go.Figure(
-            data=go.Scatter(x=[0, 1000], y=[0, 0], mode="lines"),
-            layout=go.Layout(
-                margin=dict(b=10, l=10, r=10, t=10),
-            ),
-        )
+    def update_result_chart(
+        n_clicks,
+        n_intervals,
+        prob,
+        node_params,
+        runs,
+        seed,
+        episodes,
+        numb_nodes,
+        prob_edge,
+        relayout,
+        job_id,
+    ):
+        ctx_id = ctx.triggered_id
+        episodes = episodes or 1000
+        if ctx_id == "button-run" and n_clicks > 0:
+            if runs and runs > 1:
+                job_id = jobs.submit(
+                    _replicate_job,
+                    prob,
+                    graph,
+                    node_params,
+                    runs,
+                    episodes,
+                    seed,
+                    key="results",
+                )
+            else:
+                job_id = jobs.submit(
+                    _train_job, prob, graph, node_params, episodes, seed, key="results"
+                )
+            return plotly_empty_results(episodes), job_id, False, "queued"
+
+        if ctx_id in ["job-poll", "results"] and job_id:
+            status = jobs.status(job_id)
+            if status is None:
+                return dash.no_update, None, True, ""
+            data = status["result"] if status["state"] == "done" else status["data"]
+            figure = dash.no_update
+            if data is not None:
+                # zooming re-fetches the visible window at full resolution
+                with phase("figure"):
+                    figure = plotly_job_results(data, relayout_x_range(relayout))
+            if ctx_id == "results":
+                return figure, job_id, dash.no_update, dash.no_update
+            finished = status["state"] in ["done", "cancelled", "failed"]
+            return (
+                figure,
+                job_id,
+                finished,
+                status["error"] or f"{status['state']} {status['progress']:.0%}",
+            )
+
+        if ctx_id is None:
+            return plotly_empty_results(episodes), None, True, ""
+        if ctx_id == "results":
+            return dash.no_update, job_id, dash.no_update, dash.no_update
+
+        # parameters changed, a run still in flight is stale
+        if job_id:
+            jobs.cancel(job_id)
+        return dash.no_update, job_id, dash.no_update, dash.no_update
 
     @app.callback(
         Output("nodes_param", "data"),
@@ -313,5 +699,6 @@ if __name__ == "__main__":
             {"name": "viewport", "content": "width=device-width, initial-scale=1"}
         ],
     )
+    instrument_from_env(app)
     create_net_learn_app(app)
     app.run_server(debug=True)
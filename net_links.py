@@ -0,0 +1,252 @@
+import re
+
+import dash
+import numpy as np
+from dash import ctx, dash_table, html
+from dash.dependencies import Input, Output
+from dash.exceptions import PreventUpdate
+
+from net_edges import store_cache
+
+KINDS = ("exist_edges", "added_edges")
+NUMERIC = ("total_diff", "u_diff", "v_diff")
+COLUMNS = [
+    {"name": "Pair", "id": "pair"},
+    {"name": "Net utility diff", "id": "total_diff", "type": "numeric"},
+    {"name": "Node u diff", "id": "u_diff", "type": "numeric"},
+    {"name": "Node v diff", "id": "v_diff", "type": "numeric"},
+    {"name": "Pair supported", "id": "pair_supported"},
+    {"name": "Net supported", "id": "net_supported"},
+    {"name": "Status", "id": "status"},
+]
+
+# DataTable's relational operators, each with an optional i (case
+# insensitive) or s (case sensitive) prefix, and datestartswith
+_TERM = re.compile(
+    r"\{(\w+)\}\s*((?:i|s)?(?:eq|ne|gt|ge|lt|le|contains|=|!=|>=|<=|>|<)|datestartswith)"
+    r"(?:\s+|(?<=[=<>])\s*)(.*)",
+    re.IGNORECASE,
+)
+_OPS = {"=": "eq", "!=": "ne", ">": "gt", ">=": "ge", "<": "lt", "<=": "le"}
+
+
+def link_arrays(graph_stat, kind):
+    """
+    Columns of analyze_network's exist_edges or added_edges as arrays, one
+    entry per link: u, v, total_diff, u_diff, v_diff, pair_supported,
+    net_supported and status (unstable existing links, blocking new ones).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown link kind {kind}")
+    links = graph_stat[kind]
+    size = len(links)
+    u = np.fromiter((edge[0] for edge in links), dtype=np.int64, count=size)
+    v = np.fromiter((edge[1] for edge in links), dtype=np.int64, count=size)
+    stats = list(links.values())
+    pair = np.fromiter((s["pair_supported"] for s in stats), dtype=bool, count=size)
+    if kind == "exist_edges":
+        status = np.where(pair, "stable", "unstable")
+    else:
+        status = np.where(pair, "blocking", "")
+    return {
+        "u": u,
+        "v": v,
+        "total_diff": np.fromiter((s["total_diff"] for s in stats), dtype=float, count=size),
+        "u_diff": np.fromiter(
+            (s["nodes_diff"][a] for s, a in zip(stats, u.tolist())), dtype=float, count=size
+        ),
+        "v_diff": np.fromiter(
+            (s["nodes_diff"][b] for s, b in zip(stats, v.tolist())), dtype=float, count=size
+        ),
+        "pair_supported": pair,
+        "net_supported": np.fromiter(
+            (s["net_supported"] for s in stats), dtype=bool, count=size
+        ),
+        "status": status,
+    }
+
+
+def _column(arrays, name):
+    if name == "pair":
+        return arrays["u"] * (arrays["v"].max(initial=0) + 1) + arrays["v"]
+    values = arrays[name]
+    return np.where(values, "yes", "no") if values.dtype == bool else values
+
+
+def _term_mask(arrays, column, op, value):
+    value = value.strip().strip("\"'`")
+    op = op.lower()
+    insensitive = op.startswith("i")
+    op = op[1:] if op[0] in "is" else op
+    op = _OPS.get(op, op)
+    if column == "pair":
+        # a node number selects the links touching that node
+        if not value.isdigit():
+            raise ValueError(f"Filter pairs by a node number, got {value}")
+        return (arrays["u"] == int(value)) | (arrays["v"] == int(value))
+    if column not in arrays or column in ("u", "v"):
+        raise ValueError(f"Unknown column {column}")
+    values = _column(arrays, column)
+    if column in NUMERIC and op not in ("contains", "datestartswith"):
+        number = float(value)
+        compare = {
+            "eq": np.equal,
+            "ne": np.not_equal,
+            "gt": np.greater,
+            "ge": np.greater_equal,
+            "lt": np.less,
+            "le": np.less_equal,
+        }[op]
+        return compare(values, number)
+    text = values.astype(str)
+    if insensitive:
+        text, value = np.char.lower(text), value.lower()
+    if op in ("contains", "datestartswith"):
+        return np.char.find(text, value) >= 0
+    if op == "eq":
+        return text == value
+    if op == "ne":
+        return text != value
+    raise ValueError(f"Operator {op} does not apply to {column}")
+
+
+def filter_mask(arrays, query):
+    """
+    :param query: DataTable filter_query, terms like {total_diff} > 0 or
+        {status} contains blocking joined by &&
+    :return: bool mask of the links matching every term
+    :raises ValueError: for terms that cannot be applied
+    """
+    mask = np.ones(len(arrays["u"]), dtype=bool)
+    for term in (query or "").split("&&"):
+        if not term.strip():
+            continue
+        match = _TERM.fullmatch(term.strip())
+        if match is None:
+            raise ValueError(f"Cannot parse filter {term}")
+        mask &= _term_mask(arrays, *match.groups())
+    return mask
+
+
+def sort_order(arrays, index, sort_by):
+    """
+    :param index: positions of the links to sort
+    :param sort_by: DataTable sort_by, list of {column_id, direction}
+    :return: index reordered, stable for ties
+    """
+    keys = []
+    for spec in reversed(sort_by or []):
+        values = _column(arrays, spec["column_id"])[index]
+        _, rank = np.unique(values, return_inverse=True)
+        keys.append(-rank if spec["direction"] == "desc" else rank)
+    if not keys:
+        return index
+    return index[np.lexsort(keys)]
+
+
+def link_page(arrays, page_current=0, page_size=10, sort_by=None, query=None):
+    """
+    Filters and sorts the link arrays and renders only one page of rows,
+    page_current clamped to the last page.
+
+    :return: (rows of the page, number of pages, page shown)
+    """
+    index = np.flatnonzero(filter_mask(arrays, query))
+    index = sort_order(arrays, index, sort_by)
+    pages = max(-(-len(index) // page_size), 1)
+    page_current = min(page_current, pages - 1)
+    start = page_current * page_size
+    page = index[start : start + page_size]
+    rows = []
+    for i in page.tolist():
+        rows.append(
+            {
+                "pair": f"({arrays['u'][i]}, {arrays['v'][i]})",
+                **{name: round(float(arrays[name][i]), 2) for name in NUMERIC},
+                "pair_supported": "yes" if arrays["pair_supported"][i] else "no",
+                "net_supported": "yes" if arrays["net_supported"][i] else "no",
+                "status": str(arrays["status"][i]),
+            }
+        )
+    return rows, pages, page_current
+
+
+def link_table(table_id, page_size=10):
+    """
+    :return: Div of a DataTable paginated, sorted and filtered on the
+        server and a line for filter errors (id table_id-status)
+    """
+    return html.Div(
+        [
+            dash_table.DataTable(
+                id=table_id,
+                columns=COLUMNS,
+                page_action="custom",
+                page_current=0,
+                page_size=page_size,
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
+            ),
+            html.P(id=f"{table_id}-status"),
+        ]
+    )
+
+
+@store_cache(maxsize=32)
+def cached_links(analysis, numb_nodes, keys, params, kind):
+    """
+    link_arrays of analysis(numb_nodes, keys, *params), the app's cached
+    analyze_network of an edge store, kept for paging and sorting.
+    """
+    return link_arrays(analysis(numb_nodes, keys, *params), kind)
+
+
+def register_link_tables(app, analysis, params=(), tables=None):
+    """
+    One callback per table serving its visible page from the cached link
+    arrays, whatever the number of links. A new edge store or parameter
+    goes back to the first page; a filter that cannot be applied keeps
+    the table as it is and shows why.
+
+    :param analysis: callable(numb_nodes, keys, *params) -> analyze_network
+        result, cached with net_edges.store_cache
+    :param params: Inputs of the analysis parameters, e.g. delta and cost
+    :param tables: dict {table id: kind}
+    """
+    tables = tables or {"activelinks": "exist_edges", "newlinks": "added_edges"}
+    restart = {"edge-store"} | {param.component_id for param in params}
+    for table_id, kind in tables.items():
+
+        @app.callback(
+            [
+                Output(table_id, "data"),
+                Output(table_id, "page_count"),
+                Output(table_id, "page_current"),
+                Output(f"{table_id}-status", "children"),
+            ],
+            [
+                Input(table_id, "page_current"),
+                Input(table_id, "page_size"),
+                Input(table_id, "sort_by"),
+                Input(table_id, "filter_query"),
+                Input("edge-store", "data"),
+            ]
+            + list(params),
+        )
+        def update_links(page_current, page_size, sort_by, query, edges, *values, kind=kind):
+            if not edges:
+                raise PreventUpdate
+            arrays = cached_links(analysis, edges["n"], edges["keys"], values, kind)
+            if ctx.triggered_id in restart:
+                page_current = 0
+            try:
+                rows, pages, page_current = link_page(
+                    arrays, page_current or 0, page_size or 10, sort_by, query
+                )
+            except ValueError as error:
+                message = f"Cannot apply the filter: {error}"
+                return dash.no_update, dash.no_update, dash.no_update, message
+            return rows, pages, page_current, ""
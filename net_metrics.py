@@ -0,0 +1,322 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from dash.dependencies import Output
+from dash.exceptions import PreventUpdate
+from plotly.io.json import to_json_plotly
+
+PHASES = ("graph", "analysis", "figure", "serialization")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_CALL = contextvars.ContextVar("net_metrics_call", default=None)
+
+
+class _Call:
+    def __init__(self):
+        self.phases = collections.defaultdict(float)
+        self.active = None
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Attributes the time spent in the block to one of PHASES of the
+    instrumented callback running in this context; nested phases count
+    towards the outer one. A no-op outside instrumented callbacks.
+    """
+    call = _CALL.get()
+    if call is None or call.active is not None:
+        yield
+        return
+    call.active = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        call.phases[name] += time.perf_counter() - start
+        call.active = None
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every interval seconds from a daemon
+    thread and counts the collapsed stacks ("outer;inner" frames), the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frames(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _sample(self, ident):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            if frame is not None:
+                self.stacks[self._frames(frame)] += 1
+
+    def start(self, ident=None):
+        ident = threading.get_ident() if ident is None else ident
+        self._thread = threading.Thread(target=self._sample, args=(ident,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class _Stats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.phases = collections.defaultdict(float)
+        self.payload_bytes = 0
+        self.max_payload_bytes = 0
+
+    def add(self, seconds, phases, payload, failed):
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        for name, value in phases.items():
+            self.phases[name] += value
+        self.phases["other"] += max(seconds - sum(phases.values()), 0.0)
+        self.payload_bytes += payload
+        self.max_payload_bytes = max(self.max_payload_bytes, payload)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "phases": dict(self.phases),
+            "payload_bytes": self.payload_bytes,
+            "max_payload_bytes": self.max_payload_bytes,
+            "buckets": dict(zip(map(str, BUCKETS), self.buckets)),
+        }
+
+
+def _outputs_name(args, options):
+    """
+    :return: the Output ids of an app.callback registration, "id.property"
+        joined by commas, None when there are none
+    """
+    found = []
+    for value in list(args) + list(options.values()):
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            if isinstance(item, Output):
+                found.append(str(item))
+    return ",".join(found) or None
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class CallbackMetrics:
+    """
+    Per callback call counts, wall time histogram, time per phase and
+    payload sizes. Payloads are measured by serializing the return value
+    the way Dash does, so the serialization phase costs one extra
+    encoding per call.
+
+    With profile_dir, callbacks slower than slow seconds leave a collapsed
+    stack file there (callback-milliseconds-timestamp.folded).
+    """
+
+    def __init__(self, profile_dir=None, slow=1.0, interval=0.005, keep=20):
+        self.profile_dir = profile_dir
+        self.slow = slow
+        self.interval = interval
+        self.profiles = collections.deque(maxlen=keep)
+        self._stats = collections.defaultdict(_Stats)
+        self._lock = threading.Lock()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def wrap(self, fn, name=None):
+        name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            call = _Call()
+            token = _CALL.set(call)
+            profiler = SamplingProfiler(self.interval).start() if self.profile_dir else None
+            start = time.perf_counter()
+            failed, payload = False, 0
+            try:
+                result = fn(*args, **kwargs)
+                with phase("serialization"):
+                    try:
+                        payload = len(to_json_plotly(result).encode("utf-8"))
+                    except (TypeError, ValueError):
+                        payload = 0
+                return result
+            except PreventUpdate:
+                # Dash's way of leaving the outputs as they are
+                raise
+            except Exception:
+                failed = True
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                _CALL.reset(token)
+                if profiler is not None:
+                    profiler.stop()
+                    if seconds >= self.slow:
+                        self._save_profile(name, seconds, profiler)
+                self.record(name, seconds, call.phases, payload, failed)
+
+        return wrapper
+
+    def _save_profile(self, name, seconds, profiler):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(
+            self.profile_dir, f"{name}-{seconds * 1e3:.0f}ms-{stamp}.folded"
+        )
+        profiler.write(path)
+        self.profiles.append({"callback": name, "seconds": seconds, "path": path})
+
+    def record(self, name, seconds, phases=None, payload=0, failed=False):
+        with self._lock:
+            self._stats[name].add(seconds, phases or {}, payload, failed)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "callbacks": {name: s.to_dict() for name, s in self._stats.items()},
+                "profiles": list(self.profiles),
+            }
+
+    def dump(self, path):
+        """
+        Writes the metrics as JSON to path.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def prometheus(self):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        lines = []
+
+        def family(metric, kind, text):
+            lines.append(f"# HELP {metric} {text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        stats = self.to_dict()["callbacks"]
+        family("dash_callback_seconds", "histogram", "Callback wall time.")
+        for name, s in stats.items():
+            label = f'callback="{_label(name)}"'
+            for bound, count in s["buckets"].items():
+                lines.append(f'dash_callback_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'dash_callback_seconds_bucket{{{label},le="+Inf"}} {s["calls"]}')
+            lines.append(f"dash_callback_seconds_sum{{{label}}} {s['seconds']}")
+            lines.append(f"dash_callback_seconds_count{{{label}}} {s['calls']}")
+        family("dash_callback_errors_total", "counter", "Callbacks that raised.")
+        for name, s in stats.items():
+            lines.append(f'dash_callback_errors_total{{callback="{_label(name)}"}} {s["errors"]}')
+        family("dash_callback_phase_seconds_total", "counter", "Callback wall time per phase.")
+        for name, s in stats.items():
+            for key, value in s["phases"].items():
+                lines.append(
+                    f'dash_callback_phase_seconds_total{{callback="{_label(name)}",'
+                    f'phase="{_label(key)}"}} {value}'
+                )
+        family("dash_callback_payload_bytes_total", "counter", "Serialized output size.")
+        for name, s in stats.items():
+            lines.append(
+                f'dash_callback_payload_bytes_total{{callback="{_label(name)}"}} {s["payload_bytes"]}'
+            )
+        family("dash_callback_payload_bytes_max", "gauge", "Largest serialized output.")
+        for name, s in stats.items():
+            lines.append(
+                f'dash_callback_payload_bytes_max{{callback="{_label(name)}"}} {s["max_payload_bytes"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def instrument(app, metrics=None, route="/metrics", **kwargs):
+    """
+    Wraps every callback registered on app from now on, so call it before
+    the create_*_app factory, and serves the metrics on the app's Flask
+    server at route (Prometheus text) and route.json. Callbacks are named
+    by their Output ids.
+
+    :param kwargs: CallbackMetrics options (profile_dir, slow, interval)
+    :return: the CallbackMetrics
+    """
+    metrics = metrics or CallbackMetrics(**kwargs)
+    register = app.callback
+
+    @functools.wraps(register)
+    def callback(*args, **options):
+        decorate = register(*args, **options)
+        # callbacks registered in a loop share their function's name
+        name = _outputs_name(args, options)
+        return lambda fn: decorate(metrics.wrap(fn, name))
+
+    app.callback = callback
+    server = app.server
+    server.add_url_rule(
+        route,
+        "net_metrics_prometheus",
+        lambda: (metrics.prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}),
+    )
+    server.add_url_rule(
+        f"{route}.json",
+        "net_metrics_json",
+        lambda: (json.dumps(metrics.to_dict()), 200, {"Content-Type": "application/json"}),
+    )
+    return metrics
+
+
+def instrument_from_env(app):
+    """
+    Opt-in instrumentation for the apps' __main__ blocks: nothing unless
+    NET_METRICS is set. NET_PROFILE_DIR enables slow-callback profiles,
+    NET_PROFILE_SLOW sets their threshold in seconds (default 1).
+
+    :return: the CallbackMetrics or None
+    """
+    if not os.environ.get("NET_METRICS"):
+        return None
+    return instrument(
+        app,
+        profile_dir=os.environ.get("NET_PROFILE_DIR") or None,
+        slow=float(os.environ.get("NET_PROFILE_SLOW", 1.0)),
+    )
@@ -0,0 +1,240 @@
+import heapq
+import json
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from net_csr import to_csr
+
+# landmark distance standing for "unreachable", and the bound beyond which
+# a pair is known to be disconnected
+_UNREACHED = 1e300
+_FAR = 1e299
+
+
+class DistanceOracle:
+    """
+    Shortest path distances on a static weighted graph, answered by
+    bidirectional A* with ALT (landmark, triangle inequality) lower bounds.
+
+    Preprocessing runs one C-level Dijkstra per landmark in each direction;
+    a query then settles only the nodes the landmark bounds cannot rule
+    out, usually a small corridor around the shortest path.
+    """
+
+    eager_limit = 200_000
+
+    def __init__(self, graph, landmarks=16, weight="distance", seed=None):
+        if graph is not None:
+            matrix, nodes = to_csr(graph, weight=weight)
+            if (matrix.data < 0).any():
+                raise ValueError("Negative weights")
+            self._setup(matrix, nodes)
+            self._pick_landmarks(landmarks, np.random.default_rng(seed))
+
+    def _setup(self, matrix, nodes):
+        self.forward = scipy.sparse.csr_array(matrix)
+        self.backward = scipy.sparse.csr_array(matrix.T)
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+    def _dijkstra(self, indices, reverse=False):
+        return scipy.sparse.csgraph.dijkstra(
+            self.backward if reverse else self.forward, directed=True, indices=indices
+        )
+
+    def _pick_landmarks(self, count, rng):
+        """
+        Farthest-point selection: each new landmark is the node farthest
+        from the landmarks so far (in either direction), restarting in
+        another component when everything reachable is covered.
+        """
+        size = len(self.nodes)
+        count = min(count, size)
+        landmarks, dist_from, dist_to = [], [], []
+        covered = np.full(size, np.inf)
+        candidate = int(rng.integers(size)) if size else 0
+        for _ in range(count):
+            landmarks.append(candidate)
+            dist_from.append(self._dijkstra([candidate])[0])
+            dist_to.append(self._dijkstra([candidate], reverse=True)[0])
+            reach = np.minimum(dist_from[-1], dist_to[-1])
+            covered = np.minimum(covered, reach)
+            unreached = np.isinf(covered)
+            if unreached.any():
+                candidate = int(rng.choice(np.flatnonzero(unreached)))
+            else:
+                candidate = int(np.argmax(covered))
+        self.landmarks = np.array(landmarks, dtype=np.int64)
+        # node-major so the bounds of one node are a contiguous row;
+        # unreachable is a large finite value so differences stay defined
+        self.dist_from = np.minimum(np.array(dist_from).reshape(count, size).T, _UNREACHED)
+        self.dist_to = np.minimum(np.array(dist_to).reshape(count, size).T, _UNREACHED)
+
+    def node_index(self, node):
+        return self.index[node]
+
+    def lower_bound(self, source, target):
+        """
+        :return: ALT lower bound on dist(source, target), inf when the
+            landmarks prove target unreachable
+        """
+        bound = self._bounds(self.node_index(source), self.node_index(target)).max()
+        return np.inf if bound >= _FAR else max(float(bound), 0.0)
+
+    def _bounds(self, u, v):
+        # d(u, v) >= d(L, v) - d(L, u) and d(u, v) >= d(u, L) - d(v, L),
+        # one value per landmark
+        return np.maximum(
+            self.dist_from[v] - self.dist_from[u], self.dist_to[u] - self.dist_to[v]
+        )
+
+    def query(self, source, target, path=False, active=4):
+        """
+        :param active: number of landmarks, the best ones for this pair,
+            used for the search potentials
+        :return: shortest distance (inf when unreachable), or with path a
+            (distance, node list) tuple
+        """
+        s, t = self.node_index(source), self.node_index(target)
+        distance, meet, parents = self._search(s, t, active)
+        if not path:
+            return distance
+        if meet is None:
+            return distance, []
+        forward, backward = parents
+        route = [meet]
+        while route[-1] != s:
+            route.append(forward[route[-1]])
+        route.reverse()
+        while route[-1] != t:
+            route.append(backward[route[-1]])
+        return distance, [self.nodes[i] for i in route]
+
+    def _search(self, s, t, active):
+        if s == t:
+            return 0.0, s, ({s: s}, {t: t})
+        pair = self._bounds(s, t)
+        if pair.max() >= _FAR:
+            return np.inf, None, ({}, {})
+
+        use = np.argsort(pair)[::-1][:active]
+        from_s, to_s = self.dist_from[s, use], self.dist_to[s, use]
+        from_t, to_t = self.dist_from[t, use], self.dist_to[t, use]
+
+        def potentials(nodes):
+            # average of the forward and reverse ALT potentials, consistent
+            # for both searches; unreachable nodes get keys beyond _FAR
+            d_from, d_to = self.dist_from[nodes][:, use], self.dist_to[nodes][:, use]
+            to_target = np.maximum(d_to - to_t, from_t - d_from).max(axis=1)
+            from_source = np.maximum(d_from - from_s, to_s - d_to).max(axis=1)
+            return (np.maximum(to_target, 0) - np.maximum(from_source, 0)) / 2
+
+        # small graphs get every potential in one vectorized pass, large
+        # ones per settled neighborhood
+        size = len(self.nodes)
+        eager = potentials(np.arange(size)) if size <= self.eager_limit else None
+
+        graphs = (self.forward, self.backward)
+        signs = (1.0, -1.0)
+        dist = ({s: 0.0}, {t: 0.0})
+        parents = ({s: s}, {t: t})
+        settled = (set(), set())
+        start_keys = potentials(np.array([s, t]))
+        heaps = ([(start_keys[0], s)], [(-start_keys[1], t)])
+        best, meet = np.inf, None
+
+        while heaps[0] and heaps[1]:
+            # keys are reduced distances; the searches may stop once the two
+            # smallest keys together reach the best meeting distance
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, u = heapq.heappop(heaps[side])
+            if u in settled[side]:
+                continue
+            settled[side].add(u)
+            graph, sign = graphs[side], signs[side]
+            seen, other = dist[side], dist[1 - side]
+            du = seen[u]
+            begin, end = graph.indptr[u], graph.indptr[u + 1]
+            if begin == end:
+                continue
+            neighbors = graph.indices[begin:end]
+            potential = eager[neighbors] if eager is not None else potentials(neighbors)
+            keys = (du + graph.data[begin:end] + sign * potential).tolist()
+            for v, w, key in zip(neighbors.tolist(), graph.data[begin:end].tolist(), keys):
+                dv = du + w
+                if dv < seen.get(v, np.inf):
+                    seen[v] = dv
+                    parents[side][v] = u
+                    heapq.heappush(heaps[side], (key, v))
+                    if v in other and dv + other[v] < best:
+                        best, meet = dv + other[v], v
+        return best, meet, parents
+
+    def distances(self, sources, targets=None):
+        """
+        Many-to-many distances with one C-level Dijkstra per distinct
+        source, for bulk workloads where per-query search would not pay.
+
+        :return: (sources, targets) array
+        """
+        rows = [self.node_index(s) for s in sources]
+        unique, inverse = np.unique(rows, return_inverse=True)
+        dist = self._dijkstra(unique)[inverse]
+        if targets is not None:
+            dist = dist[:, [self.node_index(t) for t in targets]]
+        return dist
+
+    def save(self, path):
+        np.savez(
+            path,
+            indptr=self.forward.indptr,
+            indices=self.forward.indices,
+            data=self.forward.data,
+            nodes=_encode_nodes(self.nodes),
+            landmarks=self.landmarks,
+            dist_from=self.dist_from,
+            dist_to=self.dist_to,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            oracle = cls(None)
+            nodes = _decode_nodes(arrays["nodes"])
+            size = len(nodes)
+            matrix = scipy.sparse.csr_array(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=(size, size)
+            )
+            oracle._setup(matrix, nodes)
+            oracle.landmarks = arrays["landmarks"]
+            oracle.dist_from = arrays["dist_from"]
+            oracle.dist_to = arrays["dist_to"]
+        return oracle
+
+
+def _label(value):
+    # JSON has no tuples: grid nodes go as lists and come back as tuples
+    if isinstance(value, list):
+        return tuple(_label(item) for item in value)
+    return value
+
+
+def _encode_nodes(nodes):
+    """
+    :return: the node labels as JSON bytes in a uint8 array, so loading
+        needs no pickle
+    :raises ValueError: for labels JSON cannot hold
+    """
+    try:
+        text = json.dumps(list(nodes), default=lambda value: value.item())
+    except (TypeError, AttributeError) as error:
+        raise ValueError(f"Cannot store node labels: {error}") from None
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_nodes(array):
+    return [_label(node) for node in json.loads(array.tobytes().decode("utf-8"))]
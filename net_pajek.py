@@ -0,0 +1,292 @@
+import os
+import re
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+from net_csr import from_edges
+
+_VERTEX = re.compile(r'\s*(\d+)(?:\s+(?:"([^"]*)"|(\S+)))?\s*(.*)')
+_FLOAT = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$")
+
+
+class PajekNetwork:
+    """
+    A Pajek network as arrays: vertex labels and coordinates, and its lines
+    as (src, dst, weights) with arcs flagging the directed ones (edges are
+    undirected). Nodes are numbered from 0 in Pajek order.
+    """
+
+    def __init__(self, labels, coords, src, dst, weights, arcs, name=None):
+        self.name = name
+        self.labels = np.asarray(labels, dtype=str)
+        self.coords = np.asarray(coords, dtype=float)
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=float)
+        self.arcs = np.asarray(arcs, dtype=bool)
+        self._matrix = None
+
+    @property
+    def numb_nodes(self):
+        return len(self.labels)
+
+    @property
+    def directed(self):
+        return bool(self.arcs.any())
+
+    @property
+    def matrix(self):
+        """
+        CSR adjacency with weights; undirected edges appear in both
+        directions when the network also has arcs.
+        """
+        if self._matrix is None:
+            if self.directed:
+                mirror = ~self.arcs & (self.src != self.dst)
+                self._matrix = from_edges(
+                    self.numb_nodes,
+                    np.concatenate([self.src, self.dst[mirror]]),
+                    np.concatenate([self.dst, self.src[mirror]]),
+                    np.concatenate([self.weights, self.weights[mirror]]),
+                    directed=True,
+                )
+            else:
+                self._matrix = from_edges(
+                    self.numb_nodes, self.src, self.dst, self.weights
+                )
+        return self._matrix
+
+    def to_networkx(self):
+        """
+        :return: nx.Graph, or nx.DiGraph when there are arcs, keyed by label
+            with x, y coordinates and weight attributes
+        """
+        graph = nx.DiGraph() if self.directed else nx.Graph()
+        labels = self.labels.tolist()
+        for label, coord in zip(labels, self.coords.tolist()):
+            graph.add_node(label, **dict(zip(("x", "y", "z"), coord)))
+        mirror = ~self.arcs & (self.src != self.dst) if self.directed else np.zeros(len(self.src), bool)
+        for u, v, w, both in zip(self.src.tolist(), self.dst.tolist(), self.weights.tolist(), mirror.tolist()):
+            graph.add_edge(labels[u], labels[v], weight=w)
+            if both:
+                graph.add_edge(labels[v], labels[u], weight=w)
+        return graph
+
+    def _arrays(self):
+        return {
+            "labels": self.labels,
+            "coords": self.coords,
+            "src": self.src,
+            "dst": self.dst,
+            "weights": self.weights,
+            "arcs": self.arcs,
+            "indptr": self.matrix.indptr,
+            "indices": self.matrix.indices,
+            "data": self.matrix.data,
+        }
+
+    def save(self, path, **meta):
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, name=np.array(self.name or ""), **self._arrays(), **meta)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            network = cls(
+                arrays["labels"],
+                arrays["coords"],
+                arrays["src"],
+                arrays["dst"],
+                arrays["weights"],
+                arrays["arcs"],
+                str(arrays["name"]) or None,
+            )
+            size = len(network.labels)
+            network._matrix = scipy.sparse.csr_array(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=(size, size)
+            )
+        return network
+
+
+class _Lines:
+    """
+    Growing (src, dst, weight, arc) columns. Raw lines of an *Arcs/*Edges
+    section are buffered and converted a chunk at a time, with numpy's C
+    parser when every line of the chunk has the same plain columns.
+    """
+
+    def __init__(self, chunk=1 << 16):
+        self.chunk = chunk
+        self.parts = []
+        self._buffer = []
+        self._arc = False
+
+    def add_line(self, line, arc):
+        if arc != self._arc:
+            self.flush()
+            self._arc = arc
+        self._buffer.append(line)
+        if len(self._buffer) >= self.chunk:
+            self.flush()
+
+    def add_rows(self, rows):
+        self.flush()
+        self.parts.append(np.array(rows, dtype=float).reshape(-1, 4))
+
+    def flush(self):
+        if not self._buffer:
+            return
+        try:
+            table = np.loadtxt(self._buffer, ndmin=2)
+            if table.shape[1] not in (2, 3):
+                raise ValueError
+            weights = table[:, 2] if table.shape[1] == 3 else np.ones(len(table))
+            rows = np.column_stack(
+                [table[:, 0], table[:, 1], weights, np.full(len(table), float(self._arc))]
+            )
+        except ValueError:
+            # labels, colors or missing weights: parse line by line
+            rows = []
+            for line in self._buffer:
+                tokens = line.split()
+                rows.append((int(tokens[0]), int(tokens[1]), _weight(tokens[2:]), self._arc))
+            rows = np.array(rows, dtype=float).reshape(-1, 4)
+        self.parts.append(rows)
+        self._buffer = []
+
+    def arrays(self):
+        self.flush()
+        rows = np.concatenate(self.parts) if self.parts else np.zeros((0, 4))
+        return (
+            rows[:, 0].astype(np.int64) - 1,
+            rows[:, 1].astype(np.int64) - 1,
+            rows[:, 2],
+            rows[:, 3].astype(bool),
+        )
+
+
+def _weight(tokens):
+    return float(tokens[0]) if tokens and _FLOAT.match(tokens[0]) else 1.0
+
+
+def parse_pajek(lines):
+    """
+    Streams Pajek lines (*Network, *Vertices, *Arcs, *Edges, *Arcslist,
+    *Edgeslist) into a PajekNetwork without building a networkx graph.
+    Vertex lines are optional; missing labels default to the vertex number.
+    """
+    name = None
+    numb_nodes = 0
+    labels = {}
+    coords = {}
+    section = None
+    lines_out = _Lines()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("%"):
+            continue
+        if line.startswith("*"):
+            head, _, rest = line.partition(" ")
+            section = head.lower()
+            if section == "*network":
+                name = rest.strip() or None
+            elif section == "*vertices":
+                numb_nodes = int(rest.split()[0])
+            elif section not in ("*arcs", "*edges", "*arcslist", "*edgeslist"):
+                raise ValueError(f"Unsupported Pajek section {head}")
+            continue
+
+        if section == "*vertices":
+            match = _VERTEX.match(line)
+            vertex = int(match.group(1))
+            labels[vertex] = match.group(2) if match.group(2) is not None else (match.group(3) or str(vertex))
+            values = []
+            for token in match.group(4).split()[:3]:
+                if not _FLOAT.match(token):
+                    break
+                values.append(float(token))
+            if values:
+                coords[vertex] = values
+        elif section in ("*arcs", "*edges"):
+            lines_out.add_line(line, section == "*arcs")
+        elif section in ("*arcslist", "*edgeslist"):
+            tokens = line.split()
+            lines_out.add_rows(
+                [(int(tokens[0]), int(target), 1.0, section == "*arcslist") for target in tokens[1:]]
+            )
+        else:
+            raise ValueError("Pajek data outside of a section")
+
+    src, dst, weights, arcs = lines_out.arrays()
+    if len(src):
+        numb_nodes = max(numb_nodes, int(src.max()) + 1, int(dst.max()) + 1)
+    if (len(src) and min(src.min(), dst.min()) < 0) or (labels and min(labels) < 1):
+        raise ValueError("Pajek vertices are numbered from 1")
+    label_array = np.array([labels.get(i, str(i)) for i in range(1, numb_nodes + 1)], dtype=str)
+    width = max((len(c) for c in coords.values()), default=0)
+    coord_array = np.full((numb_nodes, width), np.nan)
+    for vertex, values in coords.items():
+        coord_array[vertex - 1, : len(values)] = values
+    return PajekNetwork(label_array, coord_array, src, dst, weights, arcs, name)
+
+
+def cache_path(path):
+    return f"{path}.npz"
+
+
+def read_pajek(path, cache=True):
+    """
+    Reads a Pajek file into a PajekNetwork. With cache the arrays (CSR
+    included) are stored in a path.npz sidecar and reused while the source
+    keeps the same mtime and size.
+    """
+    stat = os.stat(path)
+    stamp = np.array([stat.st_mtime_ns, stat.st_size])
+    sidecar = cache_path(path)
+    if cache and os.path.exists(sidecar):
+        try:
+            with np.load(sidecar) as arrays:
+                fresh = np.array_equal(arrays["source_stamp"], stamp)
+            if fresh:
+                return PajekNetwork.load(sidecar)
+        except (OSError, KeyError, ValueError):
+            pass
+
+    with open(path, encoding="utf-8", errors="replace") as file:
+        network = parse_pajek(file)
+    if cache:
+        try:
+            network.save(sidecar, source_stamp=stamp)
+        except OSError:
+            # read-only data directories still get the parsed network
+            pass
+    return network
+
+
+def read_edge_list(path):
+    """
+    Whitespace or comma separated "u v [weight]" lines, # comments and an
+    optional "source, target, weight" style header; node labels can be any
+    strings and are numbered in order of appearance.
+
+    :param path: file path or text buffer
+    :return: (CSR adjacency, labels)
+    """
+    table = pd.read_csv(
+        path,
+        sep=r"[\s,]+",
+        names=["u", "v", "weight"],
+        comment="#",
+        engine="python",
+        dtype=str,
+    )
+    weights = pd.to_numeric(table["weight"], errors="coerce")
+    if len(table) and pd.notna(table["weight"].iloc[0]) and pd.isna(weights.iloc[0]):
+        table, weights = table.iloc[1:], weights.iloc[1:]
+    codes, labels = pd.factorize(pd.concat([table["u"], table["v"]], ignore_index=True))
+    src, dst = codes[: len(table)], codes[len(table) :]
+    return from_edges(len(labels), src, dst, weights.fillna(1.0).to_numpy()), list(labels)
@@ -0,0 +1,352 @@
+import networkx as nx
+import numpy as np
+import scipy.cluster.vq
+import scipy.sparse
+import scipy.sparse.linalg
+import scipy.special
+
+from net_bootstrap import _pair_index
+from net_csr import to_csr
+
+
+def membership(sizes):
+    """
+    :return: block of every node, blocks numbered in order and nodes listed
+        block after block (networkx's nodelist order)
+    """
+    return np.repeat(np.arange(len(sizes)), sizes)
+
+
+def _pair_counts(sizes, directed):
+    sizes = np.asarray(sizes, dtype=np.int64)
+    pairs = np.outer(sizes, sizes)
+    np.fill_diagonal(pairs, sizes * (sizes - 1) if directed else sizes * (sizes - 1) // 2)
+    return pairs
+
+
+def sbm_edges(sizes, probs, rng=None, directed=False):
+    """
+    Stochastic block model as edge arrays in O(n + m): the edge count of
+    every block pair is drawn from its binomial, then that many distinct
+    node pairs are sampled without replacement and decoded to nodes.
+
+    :param sizes: number of nodes of every block
+    :param probs: (blocks, blocks) link probabilities, symmetric unless
+        directed
+    :return: (src, dst) int64 arrays, each edge once, no self-loops
+    """
+    rng = np.random.default_rng(rng)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    probs = np.asarray(probs, dtype=float)
+    if probs.shape != (len(sizes), len(sizes)):
+        raise ValueError("probs must be a blocks x blocks matrix")
+    if ((probs < 0) | (probs > 1)).any():
+        raise ValueError("Probabilities must lie in [0, 1]")
+    if not directed and not np.allclose(probs, probs.T):
+        raise ValueError("Undirected block models need symmetric probs")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    pairs = _pair_counts(sizes, directed)
+
+    src, dst = [], []
+    for r in range(len(sizes)):
+        for s in range(len(sizes)) if directed else range(r, len(sizes)):
+            total = int(pairs[r, s])
+            count = rng.binomial(total, probs[r, s]) if total else 0
+            if not count:
+                continue
+            picked = rng.choice(total, count, replace=False, shuffle=False)
+            if r != s:
+                u, v = np.divmod(picked, sizes[s])
+            elif directed:
+                u, v = np.divmod(picked, sizes[r] - 1)
+                v += v >= u
+            else:
+                u, v = _pair_index(picked)
+            src.append(starts[r] + u)
+            dst.append(starts[s] + v)
+    if not src:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    return np.concatenate(src), np.concatenate(dst)
+
+
+def stochastic_block_model(sizes, p, seed=None, directed=False):
+    """
+    Drop-in for nx.stochastic_block_model (default arguments): nodes carry
+    their "block" and graph["partition"] lists the node sets.
+    """
+    src, dst = sbm_edges(sizes, p, seed, directed)
+    graph = nx.DiGraph() if directed else nx.Graph()
+    blocks = membership(sizes)
+    graph.add_nodes_from((node, {"block": int(b)}) for node, b in enumerate(blocks.tolist()))
+    graph.add_edges_from(zip(src.tolist(), dst.tolist()))
+    graph.graph["partition"] = [set(np.flatnonzero(blocks == b).tolist()) for b in range(len(sizes))]
+    graph.graph["name"] = "stochastic_block_model"
+    return graph
+
+
+def _edges(graph):
+    """
+    :return: (numb nodes, src, dst, node labels) with every undirected edge
+        once and self-loops dropped
+    """
+    matrix, nodes = to_csr(graph, weight=None)
+    coo = matrix.tocoo()
+    upper = coo.row < coo.col
+    lower = coo.row > coo.col
+    # edges stored in one direction only still count
+    src = np.concatenate([coo.row[upper], coo.col[lower]]).astype(np.int64)
+    dst = np.concatenate([coo.col[upper], coo.row[lower]]).astype(np.int64)
+    keys = np.unique(src * len(nodes) + dst)
+    return len(nodes), keys // len(nodes), keys % len(nodes), nodes
+
+
+def _bernoulli(edges, pairs):
+    # profile log-likelihood of a block pair at its MLE density
+    with np.errstate(divide="ignore", invalid="ignore"):
+        density = np.where(pairs > 0, edges / np.where(pairs > 0, pairs, 1), 0)
+    return scipy.special.xlogy(edges, density) + scipy.special.xlog1py(pairs - edges, -density)
+
+
+def block_counts(src, dst, blocks, numb_blocks):
+    """
+    :param blocks: (n,) or (replicates, n) memberships
+    :return: (edges, sizes): symmetric (..., k, k) edge counts between
+        blocks (edges inside a block on the diagonal) and (..., k) sizes
+    """
+    blocks = np.asarray(blocks, dtype=np.int64)
+    squeeze = blocks.ndim == 1
+    blocks = np.atleast_2d(blocks)
+    replicates, k = len(blocks), numb_blocks
+    offset = (np.arange(replicates) * k * k)[:, None]
+    a, b = blocks[:, src], blocks[:, dst]
+    cell = np.minimum(a, b) * k + np.maximum(a, b) + offset
+    edges = np.bincount(cell.ravel(), minlength=replicates * k * k).reshape(replicates, k, k)
+    edges = edges + np.triu(edges, 1).transpose(0, 2, 1)
+    sizes = np.bincount(
+        (blocks + (np.arange(replicates) * k)[:, None]).ravel(), minlength=replicates * k
+    ).reshape(replicates, k)
+    return (edges[0], sizes[0]) if squeeze else (edges, sizes)
+
+
+def log_likelihood(graph, blocks, probs=None, numb_blocks=None):
+    """
+    Bernoulli SBM log-likelihood of an undirected graph, vectorized over
+    many memberships at once.
+
+    :param blocks: (n,) or (replicates, n) block of every node, in the
+        graph's node order
+    :param probs: (k, k) link probabilities, None for their maximum
+        likelihood values (the profile likelihood)
+    :return: float, or (replicates,) array
+    """
+    _, src, dst, _ = _edges(graph)
+    blocks = np.asarray(blocks, dtype=np.int64)
+    k = int(blocks.max()) + 1 if numb_blocks is None else numb_blocks
+    edges, sizes = block_counts(src, dst, blocks, k)
+    pairs = np.einsum("...i,...j->...ij", sizes, sizes)
+    index = np.arange(k)
+    pairs[..., index, index] = sizes * (sizes - 1) // 2
+    if probs is None:
+        terms = _bernoulli(edges, pairs)
+    else:
+        probs = np.asarray(probs, dtype=float)
+        terms = scipy.special.xlogy(edges, probs) + scipy.special.xlog1py(pairs - edges, -probs)
+    upper = np.triu(np.ones((k, k), dtype=bool))
+    result = terms[..., upper].sum(axis=-1)
+    return float(result) if np.ndim(result) == 0 else result
+
+
+def _profile(edges, sizes):
+    return float(np.triu(_bernoulli(edges, _pair_counts(sizes, directed=False))).sum())
+
+
+def _distinct_rows(rows):
+    """
+    :return: (distinct rows, inverse); rows are packed into one int64 key
+        when their value ranges allow, much faster than np.unique(axis=0)
+    """
+    radix = rows.max(axis=0).astype(np.int64) + 1
+    if np.log2(radix.astype(float)).sum() < 62:
+        weights = np.concatenate([np.cumprod(radix[::-1])[::-1][1:], [1]])
+        _, first, inverse = np.unique(rows @ weights, return_index=True, return_inverse=True)
+        return rows[first], inverse
+    return np.unique(rows, axis=0, return_inverse=True)
+
+
+def _move_gains(neighbors, blocks, edges, sizes, chunk=1 << 22):
+    """
+    Exact change of the profile log-likelihood when a single node moves to
+    each block, for all nodes at once against the current block counts:
+    only the pairs (r, t) and (s, t) of the old block r and new block s
+    change. Nodes with the same block and neighbor counts share their
+    gains, so the work scales with the distinct (block, counts) rows.
+
+    :param neighbors: (n, k) number of neighbors of every node per block
+    :return: (n, k) gains, 0 for the node's own block
+    """
+    k = neighbors.shape[1]
+    rows, inverse = _distinct_rows(np.column_stack([blocks, neighbors]))
+    index = np.arange(k)
+    inside = np.diagonal(edges)[None, :]
+    pairs = np.outer(sizes, sizes)
+    # the unchanged terms depend on the blocks only
+    before = _bernoulli(edges, pairs)
+    gains = np.zeros((len(rows), k))
+    step = max(1, chunk // (k * k))
+    for start in range(0, len(rows), step):
+        r = rows[start : start + step, 0]
+        d = rows[start : start + step, 1:]
+        n_r = sizes[r][:, None, None]
+        n_s = sizes[None, :, None]
+        n_t = sizes[None, None, :]
+        t = index[None, None, :]
+        other = (t != r[:, None, None]) & (t != index[None, :, None])
+        change = (
+            _bernoulli(edges[r][:, None, :] - d[:, None, :], (n_r - 1) * n_t)
+            + _bernoulli(edges[None] + d[:, None, :], (n_s + 1) * n_t)
+            - before[r][:, None, :]
+            - before[None]
+        )
+        gain = np.where(other, change, 0).sum(axis=2)
+
+        # the pairs (r, r), (s, s) and (r, s)
+        d_r = d[np.arange(len(r)), r][:, None]
+        e_rr = edges[r, r][:, None]
+        e_rs = edges[r]
+        n_r, n_s = sizes[r][:, None], sizes[None, :]
+        gain += (
+            _bernoulli(e_rr - d_r, (n_r - 1) * (n_r - 2) // 2)
+            - _bernoulli(e_rr, n_r * (n_r - 1) // 2)
+            + _bernoulli(inside + d, (n_s + 1) * n_s // 2)
+            - _bernoulli(inside, n_s * (n_s - 1) // 2)
+            + _bernoulli(e_rs + d_r - d, (n_r - 1) * (n_s + 1))
+            - _bernoulli(e_rs, n_r * n_s)
+        )
+        gain[r[:, None] == index[None, :]] = 0
+        gains[start : start + step] = gain
+    return gains[inverse.ravel()]
+
+
+def _apply_moves(adjacency, neighbors, blocks, edges, sizes, movers, target):
+    """
+    Block counts after moving movers to target[movers] at once, from the
+    movers' neighbor counts: each mover shifts its edges from its old block
+    row to the new one, and the edges between two movers, which that
+    shifts against the old block of the other end, are corrected. The work
+    is O(len(movers) k) plus the movers' degrees.
+
+    :param adjacency: symmetric CSR adjacency of the graph
+    :param neighbors: (n, k) neighbor counts per block under blocks
+    :return: (edges, sizes) as block_counts would give them
+    """
+    k = len(sizes)
+    old, new = blocks[movers], target[movers]
+    # ordered (a, b) contributions, a cell {a, b} counted once
+    change = np.zeros((k, k), dtype=np.int64)
+    np.add.at(change, old, -neighbors[movers])
+    np.add.at(change, new, neighbors[movers])
+    inner = scipy.sparse.triu(adjacency[movers][:, movers], k=1).tocoo()
+    r_x, r_y = old[inner.row], old[inner.col]
+    s_x, s_y = new[inner.row], new[inner.col]
+    for a, b, sign in ((r_x, r_y, 1), (s_x, r_y, -1), (r_x, s_y, -1), (s_x, s_y, 1)):
+        np.add.at(change, (a, b), sign)
+    edges = edges + change + change.T - np.diag(np.diagonal(change))
+    sizes = sizes - np.bincount(old, minlength=k) + np.bincount(new, minlength=k)
+    return edges, sizes
+
+
+def _spectral(n, src, dst, k, rng):
+    """
+    Starting blocks from k-means on the leading eigenvectors of the
+    degree-regularized normalized adjacency, which stays informative on
+    sparse graphs where the plain one localizes on low degree nodes.
+    """
+    adjacency = scipy.sparse.coo_array(
+        (np.ones(2 * len(src)), (np.r_[src, dst], np.r_[dst, src])), shape=(n, n)
+    ).tocsr()
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    scale = scipy.sparse.diags_array(1 / np.sqrt(degree + max(degree.mean(), 1)))
+    _, vectors = scipy.sparse.linalg.eigsh(scale @ adjacency @ scale, k=k, which="LA", tol=1e-6)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+    _, blocks = scipy.cluster.vq.kmeans2(vectors, k, minit="++", seed=rng)
+    return blocks.astype(np.int64)
+
+
+def fit_sbm(
+    graph, numb_blocks, init="spectral", starts=1, max_sweeps=100, seed=None, tol=1e-9
+):
+    """
+    Block inference for an undirected graph by maximizing the profile
+    log-likelihood with batched greedy node moves. Every sweep computes the
+    exact gain of moving each node to each block against the current block
+    counts (O(n k^2) after one O(m) count), then applies the best moves,
+    largest gains first; the share of moves applied shrinks while the
+    likelihood, updated from the movers' neighbor counts, does not
+    improve, down to the single best move, which always does.
+
+    :param init: "spectral" (regularized spectral clustering), "random" or
+        an (n,) starting membership; restarts after the first are random
+    :param starts: number of starts, the best fit is kept
+    :return: dict with blocks (n,), probs (k, k), log_likelihood, sweeps
+        and nodes (labels in the order of blocks)
+    """
+    n, src, dst, nodes = _edges(graph)
+    rng = np.random.default_rng(seed)
+    k = numb_blocks
+    adjacency = scipy.sparse.csr_array(
+        (np.ones(2 * len(src), dtype=np.int64), (np.r_[src, dst], np.r_[dst, src])),
+        shape=(n, n),
+    )
+    best = None
+    for start in range(starts):
+        if start == 0 and isinstance(init, str) and init == "spectral" and n > k + 1:
+            blocks = _spectral(n, src, dst, k, rng)
+        elif start == 0 and not isinstance(init, str):
+            blocks = np.asarray(init, dtype=np.int64).copy()
+        else:
+            blocks = rng.permutation(np.arange(n) % k)
+        edges, sizes = block_counts(src, dst, blocks, k)
+        current = _profile(edges, sizes)
+        share = 1.0
+        sweep = 0
+        for sweep in range(1, max_sweeps + 1):
+            neighbors = np.bincount(
+                np.concatenate([src * k + blocks[dst], dst * k + blocks[src]]), minlength=n * k
+            ).reshape(n, k)
+            gains = _move_gains(neighbors, blocks, edges, sizes)
+            # a block keeps at least one node
+            gains[sizes[blocks] <= 1] = 0
+            target = gains.argmax(axis=1)
+            gain = gains[np.arange(n), target]
+            movers = np.flatnonzero(gain > tol)
+            movers = movers[np.argsort(-gain[movers], kind="stable")]
+            improved = False
+            while len(movers):
+                count = max(1, int(len(movers) * share))
+                trial_edges, trial_sizes = _apply_moves(
+                    adjacency, neighbors, blocks, edges, sizes, movers[:count], target
+                )
+                value = _profile(trial_edges, trial_sizes)
+                if value > current + tol and trial_sizes.min() > 0:
+                    blocks = blocks.copy()
+                    blocks[movers[:count]] = target[movers[:count]]
+                    edges, sizes, current = trial_edges, trial_sizes, value
+                    share = min(1.0, share * 2)
+                    improved = True
+                    break
+                if count == 1:
+                    break
+                share /= 4
+            if not improved:
+                break
+        if best is None or current > best["log_likelihood"]:
+            pairs = _pair_counts(sizes, directed=False)
+            best = {
+                "blocks": blocks,
+                "probs": np.divide(edges, pairs, out=np.zeros((k, k)), where=pairs > 0),
+                "log_likelihood": current,
+                "sweeps": sweep,
+                "nodes": nodes,
+            }
+    return best
@@ -0,0 +1,290 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from net_csr import symmetrize, to_csr
+from net_distance import average_path_length, diameter
+
+GRAPH_STAT = (
+    "number_of_nodes",
+    "number_connected_components",
+    "number_of_nodes_in_largest_component",
+    "diameter",
+    "numb_cycles",
+    "average_shortest_path_length",
+    "average_degree",
+    "average_clustering",
+    "overall_clustering",
+)
+
+STATISTICS = GRAPH_STAT + (
+    "number_of_edges",
+    "degree_second_moment",
+    "degree_variance",
+    "max_degree",
+    "number_of_triangles",
+    "average_support",
+)
+
+
+class GraphKernel:
+    """
+    Statistics of an undirected graph computed from one CSR adjacency.
+    Intermediate results (components, the triangle pass) are computed once
+    and shared by every statistic asking for them.
+
+    Distances are taken on the largest component: the diameter exactly with
+    iFUB, the average shortest path length exactly, or from path_samples
+    sampled BFS sources when the component is larger than that.
+
+    :param path_samples: sources sampled for the average path length, None
+        for the exact value
+    :param processes: worker processes for the BFS sweeps
+    :param seed: seed of the sampled sources
+    """
+
+    def __init__(self, graph, path_samples=None, processes=1, seed=None):
+        self.path_samples = path_samples
+        self.processes = processes
+        self.seed = seed
+        if isinstance(graph, GraphKernel):
+            graph = graph.adjacency
+        matrix, self.nodes = to_csr(graph, weight=None)
+        self.loops = (matrix.diagonal() != 0).astype(np.int64)
+        self.adjacency = symmetrize(matrix)
+        self.numb_nodes = self.adjacency.shape[0]
+        self.degree = np.diff(self.adjacency.indptr)
+        self._cache = {}
+
+    def _cached(self, name, fn):
+        if name not in self._cache:
+            self._cache[name] = fn()
+        return self._cache[name]
+
+    @property
+    def number_of_edges(self):
+        return int(self.adjacency.nnz // 2 + self.loops.sum())
+
+    @property
+    def nx_degree(self):
+        # networkx counts a self-loop twice in the degree
+        return self.degree + 2 * self.loops
+
+    def components(self):
+        return self._cached(
+            "components",
+            lambda: scipy.sparse.csgraph.connected_components(
+                self.adjacency, directed=False
+            ),
+        )
+
+    def largest_component(self):
+        def compute():
+            _, labels = self.components()
+            if not len(labels):
+                return np.array([], dtype=np.int64)
+            return np.flatnonzero(labels == np.bincount(labels).argmax())
+
+        return self._cached("largest_component", compute)
+
+    def triangle_pass(self, chunk=1 << 22):
+        """
+        Triangles per node and per edge in one pass: edges are oriented from
+        lower to higher (degree, id) rank, every wedge of out-neighbors
+        (v, w) of u is checked against the sorted edge keys, and each closed
+        wedge is a triangle found exactly once.
+
+        :return: (node triangles, edge triangles, (edge src, edge dst)) with
+            edges listed once, src < dst
+        """
+        return self._cached("triangles", lambda: self._triangle_pass(chunk))
+
+    def _triangle_pass(self, chunk):
+        n = self.numb_nodes
+        adjacency = self.adjacency
+        # canonical CSR, so the upper edges come out sorted by key
+        rows = np.repeat(np.arange(n, dtype=np.int64), self.degree)
+        upper = rows < adjacency.indices
+        eu, ev = rows[upper], adjacency.indices[upper].astype(np.int64)
+        keys = eu * n + ev
+        node_tri = np.zeros(n, dtype=np.int64)
+        edge_tri = np.zeros(len(keys), dtype=np.int64)
+        if not len(keys):
+            return node_tri, edge_tri, (eu, ev)
+
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.lexsort((np.arange(n), self.degree))] = np.arange(n)
+        forward = rank[eu] < rank[ev]
+        # grouped by source with the counting sort of the CSR conversion,
+        # edge ids shifted by one so none is a stored zero
+        oriented = scipy.sparse.coo_array(
+            (
+                np.arange(1, len(keys) + 1),
+                (np.where(forward, eu, ev), np.where(forward, ev, eu)),
+            ),
+            shape=(n, n),
+        ).tocsr()
+        src = np.repeat(np.arange(n, dtype=np.int64), np.diff(oriented.indptr))
+        dst, eid = oriented.indices.astype(np.int64), oriented.data - 1
+
+        pairs = oriented.indptr[src + 1] - np.arange(len(src)) - 1
+        cum = np.concatenate([[0], np.cumsum(pairs)])
+        start = 0
+        while start < len(src):
+            # positions whose wedges fit in one chunk
+            stop = np.searchsorted(cum, cum[start] + chunk, side="right") - 1
+            stop = min(max(stop, start + 1), len(src))
+            counts = pairs[start:stop]
+            first = np.repeat(np.arange(start, stop), counts)
+            offset = np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+            second = first + 1 + offset
+            v, w = dst[first], dst[second]
+            wedge = np.minimum(v, w) * n + np.maximum(v, w)
+            # sorted lookups walk the keys in order, much kinder to the cache
+            by_key = np.argsort(wedge)
+            hit = np.empty(len(wedge), dtype=np.int64)
+            hit[by_key] = np.searchsorted(keys, wedge[by_key])
+            closed = hit < len(keys)
+            closed[closed] = keys[hit[closed]] == wedge[closed]
+            first, second, hit = first[closed], second[closed], hit[closed]
+
+            node_tri += np.bincount(src[first], minlength=n)
+            node_tri += np.bincount(dst[first], minlength=n)
+            node_tri += np.bincount(dst[second], minlength=n)
+            edge_tri += np.bincount(eid[first], minlength=len(keys))
+            edge_tri += np.bincount(eid[second], minlength=len(keys))
+            edge_tri += np.bincount(hit, minlength=len(keys))
+            start = stop
+
+        return node_tri, edge_tri, (eu, ev)
+
+    def triangles(self):
+        return self.triangle_pass()[0]
+
+    def clustering(self):
+        degree = self.degree
+        wedges = degree * (degree - 1)
+        return np.divide(
+            2.0 * self.triangles(),
+            wedges,
+            out=np.zeros(self.numb_nodes),
+            where=wedges > 0,
+        )
+
+    def edge_support(self):
+        """
+        :return: (src, dst, support) with support 1 when the endpoints share
+            a neighbor, self-loops listed last
+        """
+        _, edge_tri, (eu, ev) = self.triangle_pass()
+        # as in the notebook, a self-loop makes a node its own neighbor:
+        # its links share it, and the loop itself is a supported link
+        support = (edge_tri > 0) | (self.loops[eu] > 0) | (self.loops[ev] > 0)
+        looped = np.flatnonzero(self.loops)
+        return (
+            np.concatenate([eu, looped]),
+            np.concatenate([ev, looped]),
+            np.concatenate([support, np.ones(len(looped), dtype=bool)]).astype(np.int64),
+        )
+
+    def _component_graph(self):
+        def compute():
+            members = self.largest_component()
+            return self.adjacency[members][:, members]
+
+        return self._cached("component_graph", compute)
+
+    def diameter(self):
+        return self._cached(
+            "diameter", lambda: diameter(self._component_graph(), self.processes)[0]
+        )
+
+    def path_length(self, confidence=0.95):
+        """
+        :return: dict with the average shortest path length estimate, its
+            standard error and confidence interval (see average_path_length)
+        """
+        return self._cached(
+            ("path_length", confidence),
+            lambda: average_path_length(
+                self._component_graph(),
+                self.path_samples,
+                confidence,
+                self.seed,
+                self.processes,
+            ),
+        )
+
+    def stat(self, name):
+        n = self.numb_nodes
+        if name == "number_of_nodes":
+            return n
+        if name == "number_of_edges":
+            return self.number_of_edges
+        if name == "number_connected_components":
+            return int(self.components()[0])
+        if name == "number_of_nodes_in_largest_component":
+            return len(self.largest_component())
+        if name == "diameter":
+            return self.diameter()
+        if name == "average_shortest_path_length":
+            return self.path_length()["estimate"]
+        if name == "numb_cycles":
+            # cycle basis size: E - N + C, self-loops are cycles of their own
+            return int(self.adjacency.nnz // 2 - n + self.components()[0] + self.loops.sum())
+        if name == "average_degree":
+            return float(self.nx_degree.mean()) if n else float("nan")
+        if name == "degree_second_moment":
+            return float((self.nx_degree.astype(float) ** 2).mean()) if n else float("nan")
+        if name == "degree_variance":
+            return float(self.nx_degree.var()) if n else float("nan")
+        if name == "max_degree":
+            return int(self.nx_degree.max()) if n else 0
+        if name == "number_of_triangles":
+            return int(self.triangles().sum() // 3)
+        if name == "average_clustering":
+            return float(self.clustering().mean()) if n else 0.0
+        if name == "overall_clustering":
+            degree = self.nx_degree
+            wedges = (degree * (degree - 1)).sum() / 2
+            return float(self.triangles().sum() / wedges) if wedges else 0
+        if name == "average_support":
+            support = self.edge_support()[2]
+            return float(support.mean()) if len(support) else float("nan")
+        raise ValueError(f"Unknown statistic {name}")
+
+
+def graph_stat(graph, stats=GRAPH_STAT, **options):
+    """
+    The notebooks' graph_stat on a networkx graph, CSR or dense adjacency.
+
+    :param stats: names from STATISTICS to compute
+    :param options: GraphKernel options (path_samples, processes, seed)
+    :return: dict {statistic: value}
+    """
+    kernel = graph if isinstance(graph, GraphKernel) else GraphKernel(graph, **options)
+    return {name: kernel.stat(name) for name in stats}
+
+
+def average_degree(graph):
+    return graph_stat(graph, ["average_degree"])["average_degree"]
+
+
+def overall_clustering(graph):
+    return graph_stat(graph, ["overall_clustering"])["overall_clustering"]
+
+
+def average_support(graph):
+    return graph_stat(graph, ["average_support"])["average_support"]
+
+
+def triangles(graph):
+    kernel = GraphKernel(graph)
+    return dict(zip(kernel.nodes, kernel.triangles().tolist()))
+
+
+def edge_support(graph):
+    kernel = GraphKernel(graph)
+    eu, ev, support = kernel.edge_support()
+    nodes = kernel.nodes
+    return {(nodes[u], nodes[v]): int(s) for u, v, s in zip(eu, ev, support)}
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class RunningMoments:
+    """
+    Element-wise running mean and variance (Welford) over a stream of
+    equally shaped arrays.
+    """
+
+    def __init__(self, shape=()):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def var(self):
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+class P2Quantile:
+    """
+    Element-wise streaming quantile estimator (Jain & Chlamtac P-square).
+
+    Keeps five markers per element regardless of the number of
+    observations, so memory does not grow with the stream length.
+    """
+
+    def __init__(self, prob, shape=()):
+        if prob <= 0 or prob >= 1:
+            raise ValueError("Invalid probability")
+        self.prob = prob
+        self.shape = tuple(shape)
+        self.count = 0
+        self._init = []
+        self._q = None
+        self._n = None
+        self._np = np.array([1, 1 + 2 * prob, 1 + 4 * prob, 3 + 2 * prob, 5.0])
+        self._dn = np.array([0, prob / 2, prob, (1 + prob) / 2, 1.0])
+
+    def update(self, x):
+        x = np.broadcast_to(np.asarray(x, dtype=float), self.shape)
+        self.count += 1
+        if self._q is None:
+            self._init.append(x.copy())
+            if len(self._init) == 5:
+                self._q = np.sort(np.stack(self._init), axis=0)
+                self._n = np.broadcast_to(
+                    np.arange(1, 6, dtype=float).reshape((5,) + (1,) * len(self.shape)),
+                    self._q.shape,
+                ).copy()
+                self._init = []
+            return
+
+        q, n = self._q, self._n
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        cell = (x >= q[1]).astype(int) + (x >= q[2]) + (x >= q[3])
+        for i in range(1, 5):
+            n[i] += cell < i
+        self._np += self._dn
+
+        for i in range(1, 4):
+            d = self._np[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | (
+                (d <= -1) & (n[i - 1] - n[i] < -1)
+            )
+            if not move.any():
+                continue
+            s = np.sign(d) * move
+            parabolic = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            linear = np.where(
+                s > 0,
+                q[i] + (q[i + 1] - q[i]) / (n[i + 1] - n[i]),
+                q[i] - (q[i - 1] - q[i]) / (n[i - 1] - n[i]),
+            )
+            ok = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(ok, parabolic, linear), q[i])
+            n[i] += s
+
+    @property
+    def value(self):
+        if self.count == 0:
+            return np.full(self.shape, np.nan)
+        if self._q is None:
+            return np.quantile(np.stack(self._init), self.prob, axis=0)
+        return self._q[2].copy()
+
+
+class StreamSummary:
+    """
+    Running mean plus a set of P-square quantiles over a stream of arrays.
+    """
+
+    def __init__(self, shape=(), quantiles=(0.05, 0.5, 0.95)):
+        self.moments = RunningMoments(shape)
+        self.quantiles = {p: P2Quantile(p, shape) for p in quantiles}
+
+    def update(self, x):
+        self.moments.update(x)
+        for estimator in self.quantiles.values():
+            estimator.update(x)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    def result(self):
+        return {
+            "count": self.count,
+            "mean": self.moments.mean.copy(),
+            "std": self.moments.std,
+            "quantiles": {p: q.value for p, q in self.quantiles.items()},
+        }
@@ -0,0 +1,182 @@
+import csv
+
+import numpy as np
+
+SCHEDULES = "data/schedules.csv"
+
+
+def parse_time(value):
+    """
+    Timetable times are written as hours.minutes ("7.45", "6.3" for 6:30,
+    "11" for 11:00).
+
+    :return: minutes after midnight, None for an empty value
+    """
+    value = str(value).strip()
+    if not value:
+        return None
+    hours, _, minutes = value.partition(".")
+    return int(hours) * 60 + int((minutes + "00")[:2])
+
+
+class Timetable:
+    """
+    Connections (dep_station, arr_station, dep_time, arr_time, trip) sorted
+    by departure, times in minutes after midnight, for Connection Scan
+    queries. Every query runs one pass over the connection array and is
+    batched over many sources / departure times at once.
+    """
+
+    def __init__(self, stations, dep_station, arr_station, dep_time, arr_time, trip, row=None):
+        order = np.lexsort((arr_time, dep_time))
+        self.stations = list(stations)
+        self.index = {name: i for i, name in enumerate(self.stations)}
+        self.dep_station = np.asarray(dep_station, dtype=np.int64)[order]
+        self.arr_station = np.asarray(arr_station, dtype=np.int64)[order]
+        self.dep_time = np.asarray(dep_time, dtype=float)[order]
+        self.arr_time = np.asarray(arr_time, dtype=float)[order]
+        self.trip = np.asarray(trip, dtype=np.int64)[order]
+        self.row = None if row is None else np.asarray(row)[order]
+
+    @classmethod
+    def from_csv(cls, path=SCHEDULES, keep=None):
+        """
+        Every schedules.csv line is a trip from_station -> to_station plus,
+        when return times are given, the return trip. Arrivals before the
+        departure are taken to be after midnight.
+
+        :param keep: optional callable(record) selecting lines, e.g. by the
+            "Information" operating days column
+        """
+        stations = {}
+        columns = {"dep": [], "arr": [], "dep_time": [], "arr_time": [], "row": []}
+
+        def add(row, origin, destination, departure, arrival):
+            if departure is None or arrival is None:
+                return
+            if arrival < departure:
+                arrival += 24 * 60
+            columns["dep"].append(stations.setdefault(origin, len(stations)))
+            columns["arr"].append(stations.setdefault(destination, len(stations)))
+            columns["dep_time"].append(departure)
+            columns["arr_time"].append(arrival)
+            columns["row"].append(row)
+
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            reader = csv.reader(file)
+            next(reader)  # Bulgarian header
+            fields = next(reader)
+            for row, values in enumerate(reader):
+                record = dict(zip(fields, values))
+                if keep is not None and not keep(record):
+                    continue
+                origin, destination = record["from_station"].strip(), record["to_station"].strip()
+                add(row, origin, destination, parse_time(record["departure"]), parse_time(record["arrival"]))
+                add(
+                    row,
+                    destination,
+                    origin,
+                    parse_time(record["return_departure"]),
+                    parse_time(record["return_arrival"]),
+                )
+
+        return cls(
+            list(stations),
+            columns["dep"],
+            columns["arr"],
+            columns["dep_time"],
+            columns["arr_time"],
+            # every line is its own vehicle trip
+            np.arange(len(columns["dep"])),
+            columns["row"],
+        )
+
+    @property
+    def numb_stations(self):
+        return len(self.stations)
+
+    def _station(self, station):
+        return station if isinstance(station, (int, np.integer)) else self.index[station]
+
+    def earliest_arrivals(self, sources, departs=0, min_transfer=0):
+        """
+        Batched earliest-arrival Connection Scan: query q leaves sources[q]
+        at departs[q] and every connection is scanned once for all queries.
+
+        :param sources: station names or indices
+        :param departs: departure time(s) in minutes, broadcast over sources
+        :param min_transfer: minutes needed to change vehicles at a station
+        :return: (queries, stations) earliest arrival times, inf when
+            unreachable
+        """
+        sources = np.array([self._station(s) for s in np.atleast_1d(sources)], dtype=np.int64)
+        departs = np.broadcast_to(np.asarray(departs, dtype=float), sources.shape)
+        queries = np.arange(len(sources))
+        arrival = np.full((len(sources), self.numb_stations), np.inf)
+        arrival[queries, sources] = departs
+        # earliest time a passenger can board at each station
+        ready = arrival.copy()
+        on_trip = np.zeros((len(sources), self.trip.max() + 1 if len(self.trip) else 0), dtype=bool)
+
+        first = np.searchsorted(self.dep_time, departs.min()) if len(sources) else len(self.dep_time)
+        for c in range(first, len(self.dep_time)):
+            u, v, t = self.dep_station[c], self.arr_station[c], self.trip[c]
+            boards = on_trip[:, t] | (ready[:, u] <= self.dep_time[c])
+            if not boards.any():
+                continue
+            on_trip[:, t] = boards
+            improved = boards & (self.arr_time[c] < arrival[:, v])
+            arrival[improved, v] = self.arr_time[c]
+            ready[improved, v] = self.arr_time[c] + min_transfer
+        return arrival
+
+    def earliest_arrival(self, source, depart=0, min_transfer=0):
+        """
+        :return: dict {station name: earliest arrival} of the reachable
+            stations
+        """
+        arrival = self.earliest_arrivals([source], depart, min_transfer)[0]
+        return {self.stations[i]: float(arrival[i]) for i in np.flatnonzero(np.isfinite(arrival))}
+
+    def profile(self, source, min_transfer=0):
+        """
+        Profile query: earliest arrivals for every departure from source,
+        all departures run as one batched scan.
+
+        :return: dict with departures (k,) and arrivals (k, stations); an
+            arrival is nan when a later departure from source arrives as
+            early (the pair is dominated)
+        """
+        source = self._station(source)
+        departures = np.unique(self.dep_time[self.dep_station == source])
+        arrivals = self.earliest_arrivals(np.full(len(departures), source), departures, min_transfer)
+        # keep a departure only if it arrives strictly before every later one
+        later = np.minimum.accumulate(arrivals[::-1], axis=0)[::-1]
+        dominated = np.zeros(arrivals.shape, dtype=bool)
+        dominated[:-1] = arrivals[:-1] >= later[1:]
+        dominated[:, source] = False
+        return {
+            "departures": departures,
+            "arrivals": np.where(dominated | np.isinf(arrivals), np.nan, arrivals),
+        }
+
+    def travel_times(self, sources=None, targets=None, depart=0, min_transfer=0):
+        """
+        Many-to-many travel times leaving every source at depart.
+
+        :return: (sources, targets) minutes, inf when unreachable
+        """
+        sources = range(self.numb_stations) if sources is None else sources
+        arrival = self.earliest_arrivals(list(sources), depart, min_transfer)
+        if targets is not None:
+            arrival = arrival[:, [self._station(t) for t in targets]]
+        return arrival - depart
+
+    def accessibility(self, depart=0, horizon=np.inf, min_transfer=0):
+        """
+        :return: (stations,) number of other stations each station reaches
+            within horizon minutes of depart
+        """
+        times = self.travel_times(depart=depart, min_transfer=min_transfer)
+        np.fill_diagonal(times, np.inf)
+        return (times <= horizon).sum(axis=1)